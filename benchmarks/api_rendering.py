@@ -0,0 +1,117 @@
+"""
+Benchmark response rendering of the book and borrowing list endpoints.
+
+Compares the browsable API (what browsers get by default), DRF's
+JSONRenderer and the orjson renderer of the production settings.
+Pages are raised to --page-size items so rendering dominates.
+
+Usage:
+    python -m benchmarks.api_rendering --requests 200 --page-size 100
+"""
+
+import argparse
+import datetime
+from contextlib import ExitStack
+from unittest.mock import patch
+
+from benchmarks.utils import benchmark_database, setup_django, timed
+
+ENDPOINTS = ("/api/books/", "/api/borrowings/")
+
+
+def create_dataset(items: int):
+    from book_service.models import Book
+    from borrowing_service.models import Borrowing
+    from payment_service.models import Payment
+    from user.models import User
+
+    admin = User.objects.create_superuser(email="admin@example.com", password="x")
+    books = Book.objects.bulk_create(
+        Book(
+            title=f"Book {index}",
+            author=f"Author {index}",
+            cover=Book.CoverType.SOFT,
+            inventory=10,
+            daily_fee="1.50",
+        )
+        for index in range(items)
+    )
+    borrowings = Borrowing.objects.bulk_create(
+        Borrowing(
+            user=admin,
+            book=book,
+            expected_return_date=datetime.date.today() + datetime.timedelta(days=7),
+        )
+        for book in books
+    )
+    Payment.objects.bulk_create(
+        Payment(
+            borrowing=borrowing,
+            money_to_pay="10.50",
+            session_id=f"session_{borrowing.pk}",
+            session_url="https://checkout.example.com",
+            status=Payment.Status.PAID,
+        )
+        for borrowing in borrowings
+    )
+    return admin
+
+
+def measure(label, client, url, accept, requests, renderer_classes=None) -> None:
+    from book_service.views import BookViewSet
+    from borrowing_service.views import BorrowingViewSet
+
+    with ExitStack() as stack:
+        if renderer_classes:
+            for view in (BookViewSet, BorrowingViewSet):
+                stack.enter_context(
+                    patch.object(view, "renderer_classes", renderer_classes)
+                )
+        client.get(url, HTTP_ACCEPT=accept)
+        with timed(f"{url} {label}", requests):
+            for _ in range(requests):
+                response = client.get(url, HTTP_ACCEPT=accept)
+                assert response.status_code == 200, response.status_code
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--page-size", type=int, default=100)
+    args = parser.parse_args()
+
+    setup_django()
+
+    from django.test import override_settings
+    from django.test.utils import setup_test_environment
+    from rest_framework.pagination import CursorPagination, PageNumberPagination
+    from rest_framework.test import APIClient
+
+    from core.renderers import ORJSONRenderer
+
+    setup_test_environment()
+
+    # DEBUG would add the debug toolbar panels to every request
+    with benchmark_database(), ExitStack() as stack:
+        stack.enter_context(override_settings(DEBUG=False))
+        for pagination in (CursorPagination, PageNumberPagination):
+            stack.enter_context(patch.object(pagination, "page_size", args.page_size))
+
+        client = APIClient()
+        client.force_authenticate(create_dataset(args.page_size))
+
+        for url in ENDPOINTS:
+            measure("browsable API", client, url, "text/html", args.requests)
+            measure("JSONRenderer", client, url, "application/json", args.requests)
+            measure(
+                "ORJSONRenderer",
+                client,
+                url,
+                "application/json",
+                args.requests,
+                renderer_classes=[ORJSONRenderer],
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+"""
+Benchmark book catalog search on a synthetic dataset.
+
+Compares filtering the books with plain icontains lookups, which scan
+the whole table, with search_books(), which uses the FTS5 table on
+SQLite and the trigram indexes on PostgreSQL (run with
+DJANGO_SETTINGS_MODULE=core.settings.build to measure the latter).
+
+Usage:
+    python -m benchmarks.book_search --books 1000000
+"""
+
+import argparse
+
+from benchmarks.utils import benchmark_database, setup_django, timed
+
+WORDS = (
+    "shadow river silent garden iron winter crown glass storm hollow "
+    "ember raven distant golden broken secret forest mirror stone ocean"
+).split()
+
+QUERIES = ("raven", "golden mirror", "storm hollow", "author 4217", "zephyr")
+
+
+def create_dataset(books: int) -> None:
+    from book_service.models import Book
+
+    Book.objects.bulk_create(
+        (
+            Book(
+                title=" ".join(
+                    WORDS[(index // 20**power) % len(WORDS)] for power in range(3)
+                ),
+                author=f"Author {index % 10000}",
+                cover=Book.CoverType.HARD,
+                inventory=index % 5,
+                daily_fee=1,
+            )
+            for index in range(books)
+        ),
+        batch_size=10000,
+    )
+
+
+def icontains_search(queryset, query):
+    from django.db.models import Q
+
+    for term in query.split():
+        queryset = queryset.filter(Q(title__icontains=term) | Q(author__icontains=term))
+    return queryset
+
+
+def measure(label, search, repeat) -> None:
+    from book_service.models import Book
+
+    with timed(label, repeat * len(QUERIES)):
+        for _ in range(repeat):
+            for query in QUERIES:
+                # first catalog page, the way the list endpoint fetches it
+                list(search(Book.objects.order_by("title", "id"), query)[:6])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--books", type=int, default=1000000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    setup_django()
+
+    from django.db import connection
+
+    from book_service.search import search_books
+
+    with benchmark_database():
+        create_dataset(args.books)
+        with connection.cursor() as cursor:
+            cursor.execute("ANALYZE")
+        measure("icontains scan", icontains_search, args.repeat)
+        measure(f"search_books ({connection.vendor})", search_books, args.repeat)
+
+
+if __name__ == "__main__":
+    main()
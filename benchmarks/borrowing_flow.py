@@ -0,0 +1,247 @@
+"""
+Load test the payment flow end to end against the fake Stripe server.
+
+Every request goes through the WSGI handler with a JWT, like under
+gunicorn, from --threads concurrent clients: users borrow a book
+(POST /api/borrowings/), return it late, which creates a fine
+(POST /api/borrowings/<id>/return/), and renew the session of the
+expired fine (POST /api/payments/renew/). Each step opens a Checkout
+Session on the fake Stripe API, answering after --latency seconds.
+
+With --lazy (STRIPE_LAZY_CHECKOUT) borrowings open no session, only
+the --checkout-share of users who go on to pay open one
+(POST /api/payments/<id>/checkout/).
+
+Requests per second, latency percentiles and the number of payments
+left without a session by Stripe errors are reported per step. The
+Stripe client retries failed requests (stripe.max_network_retries),
+so --error-rate mostly shows up as latency. Run it
+with DJANGO_SETTINGS_MODULE=core.settings.build to measure PostgreSQL,
+SQLite serializes the writes of the threads.
+
+Usage:
+    python -m benchmarks.borrowing_flow --borrowings 500 --threads 16 \\
+        --latency 0.3 --error-rate 0.01 [--lazy --checkout-share 0.3]
+"""
+
+import argparse
+import io
+import json
+import os
+import statistics
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, timedelta
+
+from benchmarks.fake_stripe import start_fake_stripe
+from benchmarks.utils import benchmark_database, setup_django
+
+
+def request_environ(path: str, token: str, data: dict) -> dict:
+    body = json.dumps(data).encode()
+    return {
+        "REQUEST_METHOD": "POST",
+        "PATH_INFO": path,
+        "QUERY_STRING": "",
+        "CONTENT_TYPE": "application/json",
+        "CONTENT_LENGTH": str(len(body)),
+        "SERVER_NAME": "127.0.0.1",
+        "SERVER_PORT": "8000",
+        "HTTP_HOST": "127.0.0.1",
+        "HTTP_ACCEPT": "application/json",
+        "HTTP_AUTHORIZATION": f"Bearer {token}",
+        "REMOTE_ADDR": "127.0.0.1",
+        "wsgi.url_scheme": "http",
+        "wsgi.input": io.BytesIO(body),
+        "wsgi.errors": io.StringIO(),
+    }
+
+
+def post(application, path: str, token: str, data: dict) -> tuple[float, int, dict]:
+    """
+    Returns:
+        tuple: (latency, status code, JSON body) of the response
+    """
+    statuses = []
+    start = time.perf_counter()
+    response = application(
+        request_environ(path, token, data),
+        lambda status, headers: statuses.append(int(status.split()[0])),
+    )
+    body = b"".join(response)
+    response.close()
+    latency = time.perf_counter() - start
+    return latency, statuses[0], json.loads(body or b"{}")
+
+
+def run_step(label, application, requests, threads, opens_sessions=True) -> list[dict]:
+    """
+    Send the (path, token, data) requests from a pool of threads
+    and print their throughput and latency.
+
+    Args:
+        opens_sessions: Whether a successful response has a session_url
+
+    Returns:
+        list: JSON bodies of the responses
+    """
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as executor:
+        results = list(
+            executor.map(lambda request: post(application, *request), requests)
+        )
+    elapsed = time.perf_counter() - start
+
+    latencies = [latency for latency, _, _ in results]
+    failed = sum(status >= 400 for _, status, _ in results)
+    without_session = sum(
+        opens_sessions and status < 400 and not body.get("session_url")
+        for _, status, body in results
+    )
+    quantiles = statistics.quantiles(latencies, n=100)
+    print(
+        f"{label:<12} {len(results) / elapsed:8.1f} req/s  "
+        f"p50 {quantiles[49] * 1000:7.1f}ms  p99 {quantiles[98] * 1000:7.1f}ms  "
+        f"{failed} failed, {without_session} without a Stripe session "
+        f"({len(results)} requests)"
+    )
+    return [body for _, _, body in results]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--borrowings", type=int, default=200)
+    parser.add_argument("--threads", type=int, default=8)
+    parser.add_argument("--latency", type=float, default=0.3, help="seconds")
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--session-ttl", type=int, default=1800, help="seconds")
+    parser.add_argument("--lazy", action="store_true", help="STRIPE_LAZY_CHECKOUT")
+    parser.add_argument(
+        "--checkout-share",
+        type=float,
+        default=0.3,
+        help="share of borrowers opening the checkout with --lazy",
+    )
+    args = parser.parse_args()
+
+    stripe_server = start_fake_stripe(args.latency, args.error_rate, args.session_ttl)
+
+    setup_django()
+
+    from django.conf import settings
+    from django.core.wsgi import get_wsgi_application
+    from django.db import connection
+
+    settings.ALLOWED_HOSTS = ["127.0.0.1"]
+    settings.DEBUG = False
+    settings.STRIPE_SECRET_KEY = "sk_test_fake"
+    settings.STRIPE_API_BASE = f"http://127.0.0.1:{stripe_server.server_address[1]}"
+    settings.STRIPE_LAZY_CHECKOUT = args.lazy
+    if connection.vendor == "sqlite":
+        # an in-memory database would be gone with the first closed connection
+        handle, name = tempfile.mkstemp(suffix=".sqlite3")
+        os.close(handle)
+        connection.settings_dict["TEST"]["NAME"] = name
+
+    with benchmark_database():
+        from rest_framework_simplejwt.tokens import AccessToken
+
+        from book_service.models import Book
+        from borrowing_service.models import Borrowing
+        from payment_service.models import Payment
+        from user.models import User
+
+        book = Book.objects.create(
+            title="Book",
+            author="Author",
+            cover="hard",
+            inventory=args.borrowings,
+            daily_fee=1,
+        )
+        User.objects.bulk_create(
+            User(email=f"reader{index}@example.com") for index in range(args.borrowings)
+        )
+        tokens = [str(AccessToken.for_user(user)) for user in User.objects.all()]
+
+        application = get_wsgi_application()
+        print(
+            f"Stripe latency {args.latency * 1000:.0f}ms, "
+            f"error rate {args.error_rate:.1%}, {args.threads} threads "
+            f"({connection.vendor}{', lazy checkout' if args.lazy else ''})"
+        )
+
+        expected_return_date = (date.today() + timedelta(days=7)).isoformat()
+        borrowings = run_step(
+            "borrow",
+            application,
+            [
+                (
+                    "/api/borrowings/",
+                    token,
+                    {"book": book.pk, "expected_return_date": expected_return_date},
+                )
+                for token in tokens
+            ],
+            args.threads,
+            opens_sessions=not args.lazy,
+        )
+        if args.lazy:
+            payers = [
+                (token, borrowing["payment_id"])
+                for token, borrowing in zip(tokens, borrowings)
+                if "payment_id" in borrowing
+            ]
+            run_step(
+                "checkout",
+                application,
+                [
+                    (f"/api/payments/{payment_id}/checkout/", token, {})
+                    for token, payment_id in payers[
+                        : int(len(payers) * args.checkout_share)
+                    ]
+                ],
+                args.threads,
+            )
+
+        # returned a day late, so every return opens a fine session
+        Borrowing.objects.update(
+            borrow_date=date.today() - timedelta(days=8),
+            expected_return_date=date.today() - timedelta(days=1),
+        )
+        Payment.objects.update(status=Payment.Status.PAID)
+        borrowers = [
+            (token, borrowing["id"])
+            for token, borrowing in zip(tokens, borrowings)
+            if "id" in borrowing
+        ]
+        fines = run_step(
+            "return late",
+            application,
+            [
+                (f"/api/borrowings/{borrowing_id}/return/", token, {})
+                for token, borrowing_id in borrowers
+            ],
+            args.threads,
+            opens_sessions=not args.lazy,
+        )
+
+        Payment.objects.filter(type=Payment.Type.FINE).update(
+            status=Payment.Status.EXPIRED
+        )
+        run_step(
+            "renew",
+            application,
+            [
+                ("/api/payments/renew/", token, {"payment_id": fine["payment_id"]})
+                for (token, _), fine in zip(borrowers, fines)
+                if "payment_id" in fine
+            ],
+            args.threads,
+        )
+
+    stripe_server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+"""
+Benchmark request latency with and without persistent connections.
+
+Requests go through the WSGI handler, so connections are closed or
+kept at the end of each request exactly as under gunicorn, and fetch a
+book from the detail endpoint. Run it with
+DJANGO_SETTINGS_MODULE=core.settings.build to measure PostgreSQL, where
+connecting costs a TCP round trip and authentication, SQLite only
+opens a file.
+
+Usage:
+    python -m benchmarks.db_connections --requests 2000
+"""
+
+import argparse
+import io
+import os
+import statistics
+import tempfile
+import time
+
+from benchmarks.utils import benchmark_database, setup_django
+
+
+def request_environ(path: str) -> dict:
+    return {
+        "REQUEST_METHOD": "GET",
+        "PATH_INFO": path,
+        "QUERY_STRING": "",
+        "SERVER_NAME": "127.0.0.1",
+        "SERVER_PORT": "8000",
+        "HTTP_HOST": "127.0.0.1",
+        "HTTP_ACCEPT": "application/json",
+        "REMOTE_ADDR": "127.0.0.1",
+        "wsgi.url_scheme": "http",
+        "wsgi.input": io.BytesIO(),
+        "wsgi.errors": io.StringIO(),
+    }
+
+
+def measure(label, application, path, requests) -> None:
+    latencies = []
+    for _ in range(requests):
+        start = time.perf_counter()
+        response = application(request_environ(path), lambda status, headers: None)
+        b"".join(response)
+        response.close()
+        latencies.append(time.perf_counter() - start)
+
+    quantiles = statistics.quantiles(latencies, n=100)
+    print(
+        f"{label:<32} mean {statistics.mean(latencies) * 1000:7.3f}ms  "
+        f"p50 {quantiles[49] * 1000:7.3f}ms  p99 {quantiles[98] * 1000:7.3f}ms  "
+        f"({requests} requests)"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--requests", type=int, default=2000)
+    args = parser.parse_args()
+
+    setup_django()
+
+    from django.conf import settings
+    from django.core.wsgi import get_wsgi_application
+    from django.db import connection
+
+    settings.ALLOWED_HOSTS = ["127.0.0.1"]
+    settings.DEBUG = False
+    if connection.vendor == "sqlite":
+        # an in-memory database would be gone with the first closed connection
+        handle, name = tempfile.mkstemp(suffix=".sqlite3")
+        os.close(handle)
+        connection.settings_dict["TEST"]["NAME"] = name
+
+    with benchmark_database():
+        from book_service.models import Book
+
+        book = Book.objects.create(
+            title="Book", author="Author", cover="hard", inventory=1, daily_fee=1
+        )
+        path = f"/api/books/{book.pk}/"
+        application = get_wsgi_application()
+
+        for conn_max_age in (0, 60):
+            connection.settings_dict["CONN_MAX_AGE"] = conn_max_age
+            connection.close()
+            measure(
+                f"CONN_MAX_AGE={conn_max_age} ({connection.vendor})",
+                application,
+                path,
+                args.requests,
+            )
+
+
+if __name__ == "__main__":
+    main()
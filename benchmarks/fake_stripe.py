@@ -0,0 +1,159 @@
+"""
+Local stand-in for the Stripe Checkout Sessions API.
+
+Creates and retrieves Checkout Sessions in memory, answering after a
+configurable latency and failing a configurable share of the requests
+with Stripe's error format. Point the app at it with STRIPE_API_BASE
+and any STRIPE_SECRET_KEY to exercise the payment flow offline.
+
+Usage:
+    python -m benchmarks.fake_stripe --port 12111 --latency 0.3 \\
+        --error-rate 0.01 --session-ttl 1800
+    STRIPE_API_BASE=http://127.0.0.1:12111 STRIPE_SECRET_KEY=sk_test_fake ...
+"""
+
+import argparse
+import json
+import random
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs
+
+SESSIONS_PATH = "/v1/checkout/sessions"
+
+
+def amount_total(params: dict) -> int:
+    """
+    Returns:
+        int: Sum of the line items of form encoded session parameters
+    """
+    total = 0
+    index = 0
+    while f"line_items[{index}][price_data][unit_amount]" in params:
+        prefix = f"line_items[{index}]"
+        total += int(params[f"{prefix}[price_data][unit_amount]"][0]) * int(
+            params.get(f"{prefix}[quantity]", [1])[0]
+        )
+        index += 1
+    return total
+
+
+class FakeStripeHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive
+    disable_nagle_algorithm = True
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        if self.path != SESSIONS_PATH:
+            return self.respond_error(404, "invalid_request_error", "Unknown path")
+        if self.wait_and_fail():
+            return self.respond_error(500, "api_error", "Fake Stripe failure")
+
+        params = parse_qs(body.decode())
+        session_id = f"cs_test_{uuid.uuid4().hex}"
+        session = {
+            "id": session_id,
+            "object": "checkout.session",
+            "amount_total": amount_total(params),
+            "currency": params.get("line_items[0][price_data][currency]", ["usd"])[0],
+            "expires_at": int(time.time()) + self.server.session_ttl,
+            "mode": params.get("mode", ["payment"])[0],
+            "payment_status": "unpaid",
+            "status": "open",
+            "success_url": params.get("success_url", [""])[0],
+            "cancel_url": params.get("cancel_url", [""])[0],
+            "url": f"http://{self.headers.get('Host')}/pay/{session_id}",
+        }
+        with self.server.lock:
+            self.server.sessions[session_id] = session
+        self.respond(200, session)
+
+    def do_GET(self):
+        prefix = f"{SESSIONS_PATH}/"
+        if not self.path.startswith(prefix):
+            return self.respond_error(404, "invalid_request_error", "Unknown path")
+        if self.wait_and_fail():
+            return self.respond_error(500, "api_error", "Fake Stripe failure")
+
+        session_id = self.path.partition("?")[0].removeprefix(prefix)
+        with self.server.lock:
+            session = self.server.sessions.get(session_id)
+            if session is not None and session["expires_at"] <= time.time():
+                session["status"] = "expired"
+        if session is None:
+            return self.respond_error(
+                404, "invalid_request_error", f"No such checkout.session: {session_id}"
+            )
+        self.respond(200, session)
+
+    def wait_and_fail(self) -> bool:
+        time.sleep(self.server.latency)
+        return random.random() < self.server.error_rate
+
+    def respond_error(self, status: int, error_type: str, message: str) -> None:
+        self.respond(status, {"error": {"type": error_type, "message": message}})
+
+    def respond(self, status: int, data: dict) -> None:
+        body = json.dumps(data).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.send_header("Request-Id", f"req_{uuid.uuid4().hex[:14]}")
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_fake_stripe(
+    latency: float = 0.0,
+    error_rate: float = 0.0,
+    session_ttl: int = 1800,
+    port: int = 0,
+) -> ThreadingHTTPServer:
+    """
+    Serve the fake Stripe API from a background thread.
+
+    Args:
+        latency: Seconds every response is delayed by
+        error_rate: Share of requests answered with a 500 api_error
+        session_ttl: Seconds until a created session expires
+        port: Port to listen on, 0 for any free port
+
+    Returns:
+        ThreadingHTTPServer: The running server, shutdown() stops it
+    """
+    server = ThreadingHTTPServer(("127.0.0.1", port), FakeStripeHandler)
+    server.daemon_threads = True
+    server.latency = latency
+    server.error_rate = error_rate
+    server.session_ttl = session_ttl
+    server.sessions = {}
+    server.lock = threading.Lock()
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--port", type=int, default=12111)
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds")
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--session-ttl", type=int, default=1800, help="seconds")
+    args = parser.parse_args()
+
+    server = start_fake_stripe(
+        args.latency, args.error_rate, args.session_ttl, port=args.port
+    )
+    print(f"STRIPE_API_BASE=http://127.0.0.1:{server.server_address[1]}")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
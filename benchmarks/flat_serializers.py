@@ -0,0 +1,110 @@
+"""
+Benchmark the list serializers against their flat values() projections.
+
+Each measurement loads and renders every row, queries included: the
+serializer from eager loaded model instances, the projection from
+values() rows. Both outputs are checked to render the same JSON.
+
+Usage:
+    python -m benchmarks.flat_serializers --rows 10000
+"""
+
+import argparse
+import datetime
+
+from benchmarks.utils import benchmark_database, setup_django, timed
+
+
+def create_dataset(rows: int) -> None:
+    from book_service.models import Book
+    from borrowing_service.models import Borrowing
+    from payment_service.models import Payment
+    from user.models import User
+
+    users = User.objects.bulk_create(
+        User(email=f"reader{index}@example.com", first_name="Reader")
+        for index in range(100)
+    )
+    books = Book.objects.bulk_create(
+        (
+            Book(
+                title=f"Book {index}",
+                author=f"Author {index % 500}",
+                cover=Book.CoverType.HARD,
+                inventory=10,
+                daily_fee="1.25",
+            )
+            for index in range(rows)
+        ),
+        batch_size=5000,
+    )
+    borrowings = Borrowing.objects.bulk_create(
+        (
+            Borrowing(
+                user=users[index % len(users)],
+                book=book,
+                expected_return_date=datetime.date.today()
+                + datetime.timedelta(days=index % 30),
+            )
+            for index, book in enumerate(books)
+        ),
+        batch_size=5000,
+    )
+    Payment.objects.bulk_create(
+        (
+            Payment(
+                borrowing=borrowing,
+                money_to_pay="12.50",
+                session_id=f"session_{borrowing.pk}",
+                session_url="https://checkout.example.com",
+            )
+            for borrowing in borrowings
+        ),
+        batch_size=5000,
+    )
+
+
+def measure(serializer_class, rows: int) -> None:
+    from rest_framework.renderers import JSONRenderer
+
+    from core.projections import FlatProjection
+
+    queryset = serializer_class.Meta.model.objects.all()
+    if hasattr(serializer_class, "setup_eager_loading"):
+        queryset = serializer_class.setup_eager_loading(queryset)
+    name = serializer_class.__name__
+
+    with timed(f"{name} serializer", rows):
+        expected = serializer_class(queryset.all(), many=True).data
+
+    projection = FlatProjection(serializer_class)
+    with timed(f"{name} flat projection", rows):
+        data = projection.render(projection.values(queryset.all()))
+
+    renderer = JSONRenderer()
+    assert renderer.render(data) == renderer.render(expected), name
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--rows", type=int, default=10000)
+    args = parser.parse_args()
+
+    setup_django()
+
+    from book_service.serializers import BookListSerializer
+    from borrowing_service.serializers import BorrowingListSerializer
+    from payment_service.serializers import PaymentListSerializer
+
+    with benchmark_database():
+        create_dataset(args.rows)
+        for serializer_class in (
+            BookListSerializer,
+            BorrowingListSerializer,
+            PaymentListSerializer,
+        ):
+            measure(serializer_class, args.rows)
+
+
+if __name__ == "__main__":
+    main()
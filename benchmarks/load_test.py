@@ -0,0 +1,132 @@
+"""
+Load test a running server with keep-alive HTTP/1.1 connections.
+
+A built-in asyncio load generator: every connection sends GET requests
+back to back for the given duration, then requests per second, RPS per
+server core and latency percentiles are reported per path. Point it at
+the gunicorn entrypoint (SERVER_MODE=wsgi or asgi) and pass the number
+of cores given to the server.
+
+Usage:
+    python -m benchmarks.load_test --url http://127.0.0.1:8000 \\
+        --path /health/ --path /api/books/ --connections 32 --duration 10
+"""
+
+import argparse
+import asyncio
+import os
+import statistics
+import time
+from urllib.parse import urlsplit
+
+
+async def read_response(reader) -> int:
+    """
+    Returns:
+        int: Status code of the response, its body is read and discarded
+    """
+    head = await reader.readuntil(b"\r\n\r\n")
+    lines = head.decode("latin-1").split("\r\n")
+    status = int(lines[0].split()[1])
+    headers = {
+        name.strip().lower(): value.strip()
+        for name, _, value in (line.partition(":") for line in lines[1:] if line)
+    }
+
+    if headers.get("transfer-encoding") == "chunked":
+        while True:
+            size = int((await reader.readline()).strip(), 16)
+            await reader.readexactly(size + 2)
+            if size == 0:
+                break
+    else:
+        await reader.readexactly(int(headers.get("content-length", 0)))
+
+    if headers.get("connection", "").lower() == "close":
+        raise ConnectionResetError("server closed the connection")
+    return status
+
+
+async def connection_loop(url, path, headers, deadline, latencies, errors) -> None:
+    request = (
+        f"GET {path} HTTP/1.1\r\nHost: {url.netloc}\r\n"
+        f"Accept: application/json\r\n{headers}\r\n"
+    ).encode()
+    reader = writer = None
+
+    while time.perf_counter() < deadline:
+        try:
+            if writer is None:
+                reader, writer = await asyncio.open_connection(
+                    url.hostname, url.port or 80
+                )
+            start = time.perf_counter()
+            writer.write(request)
+            status = await read_response(reader)
+            latencies.append(time.perf_counter() - start)
+            if status >= 400:
+                errors.append(status)
+        except (OSError, asyncio.IncompleteReadError, ValueError) as exc:
+            errors.append(type(exc).__name__)
+            if writer is not None:
+                writer.close()
+            reader = writer = None
+
+    if writer is not None:
+        writer.close()
+
+
+async def run(url, path, headers, connections, duration) -> tuple[list, list]:
+    latencies, errors = [], []
+    deadline = time.perf_counter() + duration
+    await asyncio.gather(
+        *(
+            connection_loop(url, path, headers, deadline, latencies, errors)
+            for _ in range(connections)
+        )
+    )
+    return latencies, errors
+
+
+def report(path, latencies, errors, duration, cores) -> None:
+    rps = len(latencies) / duration
+    if len(latencies) > 1:
+        quantiles = statistics.quantiles(latencies, n=100)
+        p50, p95, p99 = (quantiles[index] * 1000 for index in (49, 94, 98))
+    else:
+        p50 = p95 = p99 = float("nan")
+    print(
+        f"{path:<30} {rps:9.1f} req/s  {rps / cores:9.1f} req/s/core  "
+        f"p50 {p50:7.1f}ms  p95 {p95:7.1f}ms  p99 {p99:7.1f}ms  "
+        f"errors {len(errors)}"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--url", default="http://127.0.0.1:8000")
+    parser.add_argument("--path", action="append", dest="paths")
+    parser.add_argument("--connections", type=int, default=32)
+    parser.add_argument("--duration", type=float, default=10)
+    parser.add_argument(
+        "--server-cores",
+        type=int,
+        default=os.cpu_count(),
+        help="cores available to the server, defaults to the local count",
+    )
+    parser.add_argument(
+        "--token", help="JWT access token, sent as a Bearer Authorization header"
+    )
+    args = parser.parse_args()
+
+    url = urlsplit(args.url)
+    headers = f"Authorization: Bearer {args.token}\r\n" if args.token else ""
+    for path in args.paths or ["/health/"]:
+        latencies, errors = asyncio.run(
+            run(url, path, headers, args.connections, args.duration)
+        )
+        report(path, latencies, errors, args.duration, args.server_cores)
+
+
+if __name__ == "__main__":
+    main()
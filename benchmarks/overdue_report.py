@@ -0,0 +1,110 @@
+"""
+Benchmark the daily overdue borrowings report on a synthetic dataset.
+
+Compares building the whole report in memory from model instances (the
+previous implementation) with streaming values_list() rows into
+size-bounded pages. Telegram is replaced by a function that only
+collects message sizes.
+
+Usage:
+    python -m benchmarks.overdue_report --borrowings 50000
+"""
+
+import argparse
+import datetime
+import tracemalloc
+
+from benchmarks.utils import benchmark_database, setup_django, timed
+
+
+def create_dataset(borrowings: int) -> None:
+    from book_service.models import Book
+    from borrowing_service.models import Borrowing
+    from user.models import User
+
+    users = User.objects.bulk_create(
+        User(email=f"reader{index}@example.com", first_name="Reader")
+        for index in range(100)
+    )
+    books = Book.objects.bulk_create(
+        Book(
+            title=f"Book {index}",
+            author="Author",
+            cover=Book.CoverType.HARD,
+            inventory=10,
+            daily_fee=1,
+        )
+        for index in range(100)
+    )
+    today = datetime.date.today()
+    Borrowing.objects.bulk_create(
+        (
+            Borrowing(
+                user=users[index % len(users)],
+                book=books[index % len(books)],
+                expected_return_date=today - datetime.timedelta(days=index % 30 + 1),
+            )
+            for index in range(borrowings)
+        ),
+        batch_size=5000,
+    )
+
+
+def legacy_report(today, overdue_borrowings, send) -> None:
+    overdue_list = []
+    for borrowing in overdue_borrowings:
+        overdue_list.append(
+            f"- Borrowing ID: {borrowing.id}\n"
+            f"  User: {borrowing.user.email}\n"
+            f"  Book: {borrowing.book.title}\n"
+            f"  Expected Return Date: {borrowing.expected_return_date}\n"
+            f"  Days Overdue: {(today - borrowing.expected_return_date).days}"
+        )
+    send("Overdue Borrowings Alert!\n\n" + "\n\n".join(overdue_list))
+    overdue_borrowings.count()
+    overdue_borrowings.count()
+
+
+def streamed_report(today, overdue_borrowings, send) -> None:
+    from django.conf import settings
+
+    from borrowing_service.utils import overdue_report_pages, overdue_report_rows
+
+    rows = overdue_report_rows(overdue_borrowings, settings.OVERDUE_REPORT_CHUNK_SIZE)
+    for page, _, _ in overdue_report_pages(today, rows):
+        send(page)
+
+
+def measure(label, report, borrowings) -> None:
+    from borrowing_service.utils import today_overdue_borrowings
+
+    sizes = []
+    tracemalloc.start()
+    with timed(label, borrowings):
+        today, overdue_borrowings = today_overdue_borrowings()
+        report(today, overdue_borrowings, lambda message: sizes.append(len(message)))
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    print(
+        f"{'':<40} peak memory {peak / 2**20:.1f} MiB, "
+        f"{len(sizes)} messages, largest {max(sizes)} chars"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--borrowings", type=int, default=50000)
+    args = parser.parse_args()
+
+    setup_django()
+
+    with benchmark_database():
+        create_dataset(args.borrowings)
+        measure("model instances, single message", legacy_report, args.borrowings)
+        # the new task stops after OVERDUE_REPORT_MAX_PAGES, the full report
+        # is paged here to compare the cost of the same amount of work
+        measure("values_list stream, paged", streamed_report, args.borrowings)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+"""
+Benchmark Telegram delivery against a local stub of the Bot API.
+
+Compares opening a new connection for every message (plain requests.post)
+with the pooled keep-alive session used by send_telegram_message.
+The stub speaks plain HTTP, so the real gain against api.telegram.org is
+larger: every new connection there also pays a TLS handshake.
+
+Usage:
+    python -m benchmarks.telegram_delivery --messages 500 --threads 4
+"""
+
+import argparse
+import json
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from benchmarks.utils import setup_django, timed
+
+
+class TelegramStubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive
+    disable_nagle_algorithm = True
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        body = json.dumps({"ok": True, "result": {"message_id": 1}}).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_stub_server() -> ThreadingHTTPServer:
+    server = ThreadingHTTPServer(("127.0.0.1", 0), TelegramStubHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def run(send, messages: int, threads: int) -> None:
+    with ThreadPoolExecutor(max_workers=threads) as executor:
+        results = list(executor.map(send, (f"Message {i}" for i in range(messages))))
+    if not all(results):
+        raise RuntimeError("Some messages were not delivered")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--messages", type=int, default=500)
+    parser.add_argument("--threads", type=int, default=4)
+    args = parser.parse_args()
+
+    server = start_stub_server()
+    api_url = f"http://127.0.0.1:{server.server_address[1]}"
+
+    setup_django()
+
+    import requests
+    from django.conf import settings
+
+    settings.TELEGRAM_API_URL = api_url
+    settings.TELEGRAM_BOT_TOKEN = "benchmark"
+    settings.TELEGRAM_CHAT_ID = "1"
+
+    from notifications_service.utils import send_telegram_message
+
+    def send_with_new_connection(message: str) -> bool:
+        response = requests.post(
+            f"{api_url}/botbenchmark/sendMessage",
+            json={"chat_id": "1", "text": message, "parse_mode": "Markdown"},
+        )
+        return response.status_code == 200
+
+    with timed("new connection per message", args.messages):
+        run(send_with_new_connection, args.messages, args.threads)
+
+    with timed("pooled keep-alive session", args.messages):
+        run(send_telegram_message, args.messages, args.threads)
+
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
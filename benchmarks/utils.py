@@ -0,0 +1,40 @@
+import os
+import time
+from contextlib import contextmanager
+
+
+def setup_django(settings_module: str = "core.settings.dev") -> None:
+    """Configure Django for a standalone benchmark script."""
+    os.environ.setdefault("DJANGO_SETTINGS_MODULE", settings_module)
+
+    import django
+
+    django.setup()
+
+
+@contextmanager
+def timed(label: str, operations: int):
+    """Print wall time and throughput of the wrapped block."""
+    start = time.perf_counter()
+    yield
+    elapsed = time.perf_counter() - start
+    print(
+        f"{label:<40} {elapsed:8.3f}s  {operations / elapsed:10.1f} ops/s "
+        f"({operations} ops)"
+    )
+
+
+@contextmanager
+def benchmark_database():
+    """
+    Run the wrapped block against a freshly migrated throwaway database,
+    created the same way as the test database.
+    """
+    from django.db import connection
+
+    old_name = connection.settings_dict["NAME"]
+    connection.creation.create_test_db(verbosity=0, autoclobber=True)
+    try:
+        yield connection
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0)
@@ -0,0 +1,66 @@
+from urllib.parse import urlencode
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+CATALOG_VERSION_KEY = "book_catalog:version"
+CATALOG_QUERY_PARAMS = ("cursor", "q", "author", "cover", "in_stock")
+
+
+def get_catalog_version() -> int:
+    """
+    Current version of the book catalog. Cached catalog pages are stored
+    under the version they were rendered for, so bumping it invalidates
+    all of them at once without deleting keys one by one.
+    """
+    cache.add(CATALOG_VERSION_KEY, 1, timeout=None)
+    return cache.get(CATALOG_VERSION_KEY, 1)
+
+
+def bump_catalog_version() -> None:
+    """
+    Invalidate cached catalog pages once the current transaction commits.
+    A reader still has to fetch the version once and use it for both the
+    lookup and the store: a page rendered before the bump then lands under
+    the old version and is never served again.
+    """
+    transaction.on_commit(_incr_catalog_version)
+
+
+def _incr_catalog_version() -> None:
+    try:
+        cache.incr(CATALOG_VERSION_KEY)
+    except ValueError:
+        # the key got evicted, any version other than the old one will do
+        cache.add(CATALOG_VERSION_KEY, 2, timeout=None)
+
+
+def catalog_page_key(url: str, params) -> str | None:
+    """
+    Args:
+        url: absolute request URL without the query string, the cached
+            page holds absolute next/previous links
+        params: request query params
+
+    Returns:
+        str: key of the page regardless of the param order, None when the
+        request has params the catalog doesn't know or repeats one, so
+        made-up query strings can't grow the cache
+    """
+    if not set(params) <= set(CATALOG_QUERY_PARAMS):
+        return None
+    if any(len(values) > 1 for _, values in params.lists()):
+        return None
+    query = urlencode(sorted(params.items()))
+    return f"{url}?{query}"
+
+
+def get_catalog_page(version: int, key: str):
+    return cache.get(f"book_catalog:{version}:{key}")
+
+
+def set_catalog_page(version: int, key: str, data) -> None:
+    cache.set(
+        f"book_catalog:{version}:{key}", data, settings.BOOK_CATALOG_CACHE_TIMEOUT
+    )
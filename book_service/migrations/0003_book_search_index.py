@@ -0,0 +1,68 @@
+from django.db import migrations
+
+POSTGRESQL_FORWARD = [
+    "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+    "CREATE INDEX book_title_trgm_idx ON book_service_book "
+    "USING gin ((UPPER(title::text)) gin_trgm_ops)",
+    "CREATE INDEX book_author_trgm_idx ON book_service_book "
+    "USING gin ((UPPER(author::text)) gin_trgm_ops)",
+]
+
+POSTGRESQL_BACKWARD = [
+    "DROP INDEX IF EXISTS book_title_trgm_idx",
+    "DROP INDEX IF EXISTS book_author_trgm_idx",
+]
+
+SQLITE_FORWARD = [
+    "CREATE VIRTUAL TABLE book_service_book_fts USING fts5("
+    "title, author, content='book_service_book', content_rowid='id', "
+    "tokenize='unicode61 remove_diacritics 2')",
+    "CREATE TRIGGER IF NOT EXISTS book_service_book_fts_insert "
+    "AFTER INSERT ON book_service_book BEGIN "
+    "INSERT INTO book_service_book_fts(rowid, title, author) "
+    "VALUES (new.id, new.title, new.author); END",
+    "CREATE TRIGGER IF NOT EXISTS book_service_book_fts_delete "
+    "AFTER DELETE ON book_service_book BEGIN "
+    "INSERT INTO book_service_book_fts(book_service_book_fts, rowid, title, author) "
+    "VALUES ('delete', old.id, old.title, old.author); END",
+    "CREATE TRIGGER IF NOT EXISTS book_service_book_fts_update "
+    "AFTER UPDATE OF title, author ON book_service_book BEGIN "
+    "INSERT INTO book_service_book_fts(book_service_book_fts, rowid, title, author) "
+    "VALUES ('delete', old.id, old.title, old.author); "
+    "INSERT INTO book_service_book_fts(rowid, title, author) "
+    "VALUES (new.id, new.title, new.author); END",
+    "INSERT INTO book_service_book_fts(book_service_book_fts) VALUES ('rebuild')",
+]
+
+SQLITE_BACKWARD = [
+    "DROP TRIGGER IF EXISTS book_service_book_fts_insert",
+    "DROP TRIGGER IF EXISTS book_service_book_fts_delete",
+    "DROP TRIGGER IF EXISTS book_service_book_fts_update",
+    "DROP TABLE IF EXISTS book_service_book_fts",
+]
+
+
+def run_for_vendor(statements):
+    def run(apps, schema_editor):
+        for statement in statements.get(schema_editor.connection.vendor, []):
+            schema_editor.execute(statement)
+
+    return run
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("book_service", "0002_alter_book_options"),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            run_for_vendor(
+                {"postgresql": POSTGRESQL_FORWARD, "sqlite": SQLITE_FORWARD}
+            ),
+            run_for_vendor(
+                {"postgresql": POSTGRESQL_BACKWARD, "sqlite": SQLITE_BACKWARD}
+            ),
+        ),
+    ]
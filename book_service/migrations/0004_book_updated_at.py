@@ -0,0 +1,44 @@
+# Generated by Django 5.1.6 on 2026-10-17 06:29
+
+from django.db import migrations, models
+
+SQLITE_SEARCH_TRIGGERS = [
+    "CREATE TRIGGER IF NOT EXISTS book_service_book_fts_insert "
+    "AFTER INSERT ON book_service_book BEGIN "
+    "INSERT INTO book_service_book_fts(rowid, title, author) "
+    "VALUES (new.id, new.title, new.author); END",
+    "CREATE TRIGGER IF NOT EXISTS book_service_book_fts_delete "
+    "AFTER DELETE ON book_service_book BEGIN "
+    "INSERT INTO book_service_book_fts(book_service_book_fts, rowid, title, author) "
+    "VALUES ('delete', old.id, old.title, old.author); END",
+    "CREATE TRIGGER IF NOT EXISTS book_service_book_fts_update "
+    "AFTER UPDATE OF title, author ON book_service_book BEGIN "
+    "INSERT INTO book_service_book_fts(book_service_book_fts, rowid, title, author) "
+    "VALUES ('delete', old.id, old.title, old.author); "
+    "INSERT INTO book_service_book_fts(rowid, title, author) "
+    "VALUES (new.id, new.title, new.author); END",
+    "INSERT INTO book_service_book_fts(book_service_book_fts) VALUES ('rebuild')",
+]
+
+
+def restore_search_triggers(apps, schema_editor):
+    # adding the column rebuilds the table on SQLite, dropping its triggers
+    if schema_editor.connection.vendor == "sqlite":
+        for statement in SQLITE_SEARCH_TRIGGERS:
+            schema_editor.execute(statement)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("book_service", "0003_book_search_index"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="book",
+            name="updated_at",
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.RunPython(restore_search_triggers, migrations.RunPython.noop),
+    ]
@@ -1,5 +1,9 @@
 from django.core.exceptions import ValidationError
-from django.db import models
+from django.db import models, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from book_service.cache import bump_catalog_version
 
 
 class Book(models.Model):
@@ -12,6 +16,7 @@ class Book(models.Model):
     cover = models.CharField(max_length=10, choices=CoverType.choices)
     inventory = models.PositiveIntegerField()
     daily_fee = models.DecimalField(max_digits=6, decimal_places=2)
+    updated_at = models.DateTimeField(auto_now=True)
 
     class Meta:
         ordering = ["title"]
@@ -26,3 +31,52 @@ class Book(models.Model):
     def save(self, *args, **kwargs):
         self.clean()
         super().save(*args, **kwargs)
+
+    def reserve(self) -> bool:
+        """
+        Take one copy out of stock with a single conditional UPDATE,
+        so concurrent borrowings can never oversell the book.
+
+        Returns:
+            bool: False if the book is out of stock
+        """
+        reserved = Book.objects.filter(pk=self.pk, inventory__gt=0).update(
+            inventory=F("inventory") - 1, updated_at=timezone.now()
+        )
+        if reserved:
+            self.inventory -= 1
+            bump_catalog_version()
+        return bool(reserved)
+
+    @classmethod
+    def reserve_all(cls, books) -> bool:
+        """
+        Take one copy of each of the books out of stock with a single
+        conditional UPDATE. Either all of them are reserved or none.
+
+        Args:
+            books: Distinct Book objects
+
+        Returns:
+            bool: False if any of the books is out of stock
+        """
+        with transaction.atomic():
+            reserved = cls.objects.filter(
+                pk__in=[book.pk for book in books], inventory__gt=0
+            ).update(inventory=F("inventory") - 1, updated_at=timezone.now())
+            if reserved != len(books):
+                transaction.set_rollback(True)
+                return False
+
+        for book in books:
+            book.inventory -= 1
+        bump_catalog_version()
+        return True
+
+    def release(self) -> None:
+        """Put one copy back in stock."""
+        Book.objects.filter(pk=self.pk).update(
+            inventory=F("inventory") + 1, updated_at=timezone.now()
+        )
+        self.inventory += 1
+        bump_catalog_version()
@@ -0,0 +1,10 @@
+from rest_framework.pagination import CursorPagination
+
+
+class BookCursorPagination(CursorPagination):
+    """
+    Keyset pagination over (title, id), seeks straight to the next page
+    instead of counting and offsetting through the whole catalog.
+    """
+
+    ordering = ("title", "id")
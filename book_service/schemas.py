@@ -0,0 +1,53 @@
+from drf_spectacular.utils import (
+    extend_schema,
+    extend_schema_view,
+    OpenApiParameter,
+)
+
+from book_service.models import Book
+from book_service.serializers import BookListSerializer
+
+
+book_viewset_schema = extend_schema_view(
+    list=extend_schema(
+        description=(
+            "Retrieve the book catalog ordered by title, one cursor page at a time. "
+            "Supports searching by words of the title or author with 'q', "
+            "and filtering by 'author', 'cover' and 'in_stock'. "
+            "Words match the start of a title or author word on SQLite "
+            "and any part of the text on PostgreSQL."
+        ),
+        parameters=[
+            OpenApiParameter(
+                name="q",
+                location=OpenApiParameter.QUERY,
+                description="Words to look up in the title or author",
+                required=False,
+                type=str,
+            ),
+            OpenApiParameter(
+                name="author",
+                location=OpenApiParameter.QUERY,
+                description="Words to look up in the author",
+                required=False,
+                type=str,
+            ),
+            OpenApiParameter(
+                name="cover",
+                location=OpenApiParameter.QUERY,
+                description="Filter by cover type",
+                required=False,
+                type=str,
+                enum=Book.CoverType.values,
+            ),
+            OpenApiParameter(
+                name="in_stock",
+                location=OpenApiParameter.QUERY,
+                description="Filter by availability of copies to borrow",
+                required=False,
+                type=bool,
+            ),
+        ],
+        responses=BookListSerializer(many=True),
+    ),
+)
@@ -0,0 +1,60 @@
+import re
+
+from django.db import connection
+from django.db.models import Q, QuerySet
+from django.db.models.expressions import RawSQL
+
+FTS_TABLE = "book_service_book_fts"
+SEARCH_FIELDS = ("title", "author")
+
+# The FTS5 table is kept in sync with the books by triggers created in
+# migration 0003. SQLite drops them whenever a migration rebuilds the book
+# table, so such migrations have to create them again, see 0004.
+
+
+def search_terms(query: str) -> list[str]:
+    return re.findall(r"\w+", query)
+
+
+def search_books(
+    queryset: QuerySet, query: str, fields: tuple[str, ...] = SEARCH_FIELDS
+) -> QuerySet:
+    """
+    Filter books matching every word of the query in any of the fields.
+
+    The backends don't match quite the same books. On SQLite each word
+    has to start a word of the field: "silm" finds "The Silmarillion",
+    "marill" doesn't. The FTS5 table also folds diacritics, so "eowyn"
+    finds "Éowyn". Elsewhere each word is matched as a case-insensitive
+    substring with icontains, which PostgreSQL serves from the trigram
+    indexes on UPPER(title) and UPPER(author), so "marill" matches too
+    and "eowyn" doesn't.
+
+    Args:
+        queryset: Books to search in
+        query: Search text typed by the user
+        fields: Book columns the words are looked up in
+
+    Returns:
+        QuerySet: Books matching all the words
+    """
+    terms = search_terms(query)
+    if not terms:
+        return queryset
+
+    if connection.vendor == "sqlite":
+        match = " ".join(f'"{term}"*' for term in terms)
+        match = "{%s} : (%s)" % (" ".join(fields), match)
+        return queryset.filter(
+            pk__in=RawSQL(
+                f"SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s",
+                [match],
+            )
+        )
+
+    for term in terms:
+        condition = Q()
+        for field in fields:
+            condition |= Q(**{f"{field}__icontains": term})
+        queryset = queryset.filter(condition)
+    return queryset
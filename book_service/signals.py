@@ -0,0 +1,11 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from book_service.cache import bump_catalog_version
+from book_service.models import Book
+
+
+@receiver(post_save, sender=Book)
+@receiver(post_delete, sender=Book)
+def invalidate_book_catalog(sender, **kwargs):
+    bump_catalog_version()
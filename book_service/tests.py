@@ -1,18 +1,29 @@
+import threading
+import time
+from datetime import date, timedelta
 from decimal import Decimal
+from unittest import skipUnless
+from unittest.mock import patch
 
 from django.contrib.auth import get_user_model
+from django.core.cache import cache
 from django.core.exceptions import ValidationError
-from django.test import TestCase
+from django.db import OperationalError, connection
+from django.test import TestCase, TransactionTestCase
 from django.urls import reverse
 from rest_framework import status
+from rest_framework.renderers import JSONRenderer
 from rest_framework.test import APIClient, APITestCase
 
+from book_service import cache as catalog_cache
 from book_service.models import Book
+from borrowing_service.models import Borrowing
 from book_service.serializers import (
     BookSerializer,
     BookListSerializer,
     BookDetailSerializer,
 )
+from book_service.views import BookViewSet
 
 User = get_user_model()
 
@@ -51,6 +62,111 @@ class BookModelTest(TestCase):
         )
         self.assertEqual(str(book), "Sample Book by John Doe")
 
+    def test_reserve_decrements_inventory(self):
+        book = Book.objects.create(
+            title="Reserved Book",
+            author="John Doe",
+            cover=Book.CoverType.HARD,
+            inventory=1,
+            daily_fee=Decimal("5.00"),
+        )
+
+        self.assertTrue(book.reserve())
+        self.assertEqual(book.inventory, 0)
+        self.assertFalse(book.reserve())
+
+        book.refresh_from_db()
+        self.assertEqual(book.inventory, 0)
+
+    def test_reserve_uses_database_inventory(self):
+        book = Book.objects.create(
+            title="Stale Book",
+            author="John Doe",
+            cover=Book.CoverType.HARD,
+            inventory=1,
+            daily_fee=Decimal("5.00"),
+        )
+        Book.objects.filter(pk=book.pk).update(inventory=0)
+
+        self.assertFalse(book.reserve())
+
+    def test_release_increments_inventory(self):
+        book = Book.objects.create(
+            title="Released Book",
+            author="John Doe",
+            cover=Book.CoverType.HARD,
+            inventory=0,
+            daily_fee=Decimal("5.00"),
+        )
+
+        book.release()
+
+        book.refresh_from_db()
+        self.assertEqual(book.inventory, 1)
+
+
+class BookReservationConcurrencyTest(TransactionTestCase):
+    threads = 8
+    attempts_per_thread = 5
+
+    def setUp(self):
+        self.book = Book.objects.create(
+            title="Popular Book",
+            author="Popular Author",
+            cover=Book.CoverType.SOFT,
+            inventory=10,
+            daily_fee=Decimal("1.00"),
+        )
+        self.users = [
+            User.objects.create_user(email=f"reader{index}@example.com")
+            for index in range(self.threads)
+        ]
+
+    def attempt_borrowing(self, user):
+        while True:
+            try:
+                book = Book.objects.get(pk=self.book.pk)
+                Borrowing.objects.create(
+                    book=book,
+                    user=user,
+                    expected_return_date=date.today() + timedelta(days=7),
+                )
+                return True
+            except ValidationError:
+                return False
+            except OperationalError as e:
+                # the shared-cache in-memory SQLite test database rejects
+                # concurrent writers instead of waiting, retry like a client
+                if "locked" not in str(e):
+                    raise
+                time.sleep(0.001)
+
+    def borrow(self, user, barrier, results):
+        barrier.wait()
+        try:
+            for _ in range(self.attempts_per_thread):
+                results.append(self.attempt_borrowing(user))
+        finally:
+            connection.close()
+
+    def test_concurrent_borrowings_never_oversell(self):
+        barrier = threading.Barrier(self.threads)
+        results = []
+        workers = [
+            threading.Thread(target=self.borrow, args=(user, barrier, results))
+            for user in self.users
+        ]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+
+        self.book.refresh_from_db()
+        self.assertEqual(len(results), self.threads * self.attempts_per_thread)
+        self.assertEqual(results.count(True), 10)
+        self.assertEqual(self.book.inventory, 0)
+        self.assertEqual(Borrowing.objects.filter(book=self.book).count(), 10)
+
 
 class SerializersTest(TestCase):
     def setUp(self):
@@ -90,6 +206,7 @@ class SerializersTest(TestCase):
 
 class BookViewSetTest(APITestCase):
     def setUp(self):
+        cache.clear()
         self.admin = User.objects.create_superuser(
             email="admin@example.com", password="adminpass"
         )
@@ -127,6 +244,10 @@ class BookViewSetTest(APITestCase):
         self.assertEqual(response.status_code, status.HTTP_200_OK)
         self.assertEqual(response.data["title"], "Existing Book")
 
+    def test_retrieve_book_malformed_id(self):
+        response = self.client.get(self.get_url("abc"))
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
     def test_create_book_as_admin(self):
         self.client.force_authenticate(user=self.admin)
         response = self.client.post(self.get_url(), data=self.valid_payload)
@@ -160,3 +281,176 @@ class BookViewSetTest(APITestCase):
 
         response = self.client.get(self.get_url(self.book.pk))
         self.assertIn("cover", response.data)
+
+
+class BookCatalogCacheTest(APITestCase):
+    def setUp(self):
+        cache.clear()
+        for number in range(7):
+            Book.objects.create(
+                title=f"Book {number % 3}",
+                author="Author",
+                cover=Book.CoverType.SOFT,
+                inventory=2,
+                daily_fee=Decimal("1.00"),
+            )
+        self.url = reverse("book_service:book_service-list")
+
+    def get_catalog(self, url=None):
+        return self.client.get(url or self.url, HTTP_ACCEPT="application/json")
+
+    def test_cursor_pages_cover_catalog_in_order(self):
+        titles = []
+        url = None
+        with self.assertNumQueries(2):
+            while True:
+                response = self.get_catalog(url)
+                titles += [
+                    (book["title"], book["id"]) for book in response.data["results"]
+                ]
+                url = response.data["next"]
+                if url is None:
+                    break
+
+        self.assertNotIn("count", response.data)
+        self.assertEqual(
+            titles,
+            list(Book.objects.order_by("title", "id").values_list("title", "id")),
+        )
+
+    def test_flat_page_matches_list_serializer(self):
+        response = self.get_catalog()
+        books = Book.objects.order_by("title", "id")[:5]
+        self.assertEqual(
+            JSONRenderer().render(response.data["results"]),
+            JSONRenderer().render(BookListSerializer(books, many=True).data),
+        )
+
+    def test_cached_page_served_without_queries(self):
+        first = self.get_catalog()
+        with self.assertNumQueries(0):
+            second = self.get_catalog()
+        self.assertEqual(first.data, second.data)
+
+    def test_book_update_invalidates_catalog(self):
+        self.get_catalog()
+        book = Book.objects.order_by("title", "id").first()
+        book.title = "A New Title"
+        with self.captureOnCommitCallbacks(execute=True):
+            book.save()
+
+        response = self.get_catalog()
+        self.assertEqual(response.data["results"][0]["title"], "A New Title")
+
+    def test_catalog_not_modified_without_queries(self):
+        etag = self.get_catalog()["ETag"]
+        with self.assertNumQueries(0):
+            response = self.client.get(
+                self.url, HTTP_ACCEPT="application/json", HTTP_IF_NONE_MATCH=etag
+            )
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Book.objects.order_by("title", "id").first().reserve()
+
+        response = self.client.get(
+            self.url, HTTP_ACCEPT="application/json", HTTP_IF_NONE_MATCH=etag
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_param_order_shares_cached_page(self):
+        self.get_catalog(f"{self.url}?cover=SOFT&in_stock=true")
+        with self.assertNumQueries(0):
+            self.get_catalog(f"{self.url}?in_stock=true&cover=SOFT")
+
+    def test_unknown_params_not_cached(self):
+        with patch.object(catalog_cache.cache, "set") as cache_set:
+            response = self.get_catalog(f"{self.url}?utm_source=mail")
+            self.get_catalog(f"{self.url}?cover=SOFT&cover=HARD")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data["results"]), 5)
+        cache_set.assert_not_called()
+
+    def test_version_read_once_per_request(self):
+        with patch(
+            "book_service.views.get_catalog_version",
+            wraps=catalog_cache.get_catalog_version,
+        ) as get_version:
+            self.get_catalog()
+        get_version.assert_called_once_with()
+
+    def test_page_rendered_before_bump_not_served(self):
+        def render_during_bump(view):
+            data = flat_list_data(view)
+            catalog_cache._incr_catalog_version()
+            return data
+
+        flat_list_data = BookViewSet.get_flat_list_data
+        with patch.object(BookViewSet, "get_flat_list_data", render_during_bump):
+            stale_etag = self.get_catalog()["ETag"]
+
+        response = self.get_catalog()
+        self.assertNotEqual(response["ETag"], stale_etag)
+        with self.assertNumQueries(0):
+            self.get_catalog()
+
+    def test_reservation_invalidates_catalog(self):
+        self.get_catalog()
+        book = Book.objects.order_by("title", "id").first()
+        with self.captureOnCommitCallbacks(execute=True):
+            book.reserve()
+
+        response = self.get_catalog()
+        self.assertEqual(response.data["results"][0]["inventory"], 1)
+
+
+class BookSearchTest(APITestCase):
+    def setUp(self):
+        cache.clear()
+        books = [
+            ("The Hobbit", "J. R. R. Tolkien", Book.CoverType.HARD, 3),
+            ("The Silmarillion", "J. R. R. Tolkien", Book.CoverType.SOFT, 0),
+            ("Dune", "Frank Herbert", Book.CoverType.SOFT, 2),
+            ("Children of Dune", "Frank Herbert", Book.CoverType.HARD, 1),
+        ]
+        for title, author, cover, inventory in books:
+            Book.objects.create(
+                title=title,
+                author=author,
+                cover=cover,
+                inventory=inventory,
+                daily_fee=Decimal("1.00"),
+            )
+        self.url = reverse("book_service:book_service-list")
+
+    def get_titles(self, **params):
+        response = self.client.get(self.url, params, HTTP_ACCEPT="application/json")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return [book["title"] for book in response.data["results"]]
+
+    def test_search_matches_title_and_author_words(self):
+        self.assertEqual(self.get_titles(q="dune"), ["Children of Dune", "Dune"])
+        self.assertEqual(self.get_titles(q="tolkien hobbit"), ["The Hobbit"])
+
+    def test_search_matches_word_prefixes(self):
+        self.assertEqual(self.get_titles(q="Silm"), ["The Silmarillion"])
+
+    @skipUnless(connection.vendor == "sqlite", "FTS5 search")
+    def test_search_skips_word_middles_on_sqlite(self):
+        self.assertEqual(self.get_titles(q="marill"), [])
+
+    def test_filters(self):
+        self.assertEqual(
+            self.get_titles(author="herbert", cover="hard"), ["Children of Dune"]
+        )
+        self.assertEqual(self.get_titles(in_stock="false"), ["The Silmarillion"])
+        self.assertEqual(self.get_titles(q="tolkien", in_stock="true"), ["The Hobbit"])
+
+    def test_search_index_follows_book_changes(self):
+        book = Book.objects.get(title="Dune")
+        book.title = "Dune Messiah"
+        book.save()
+        Book.objects.get(title="Children of Dune").delete()
+
+        self.assertEqual(self.get_titles(q="messiah"), ["Dune Messiah"])
+        self.assertEqual(self.get_titles(q="children"), [])
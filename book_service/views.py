@@ -1,12 +1,60 @@
 from rest_framework import viewsets
 from rest_framework.permissions import AllowAny, IsAdminUser
+from rest_framework.response import Response
 
+from book_service.cache import (
+    catalog_page_key,
+    get_catalog_page,
+    get_catalog_version,
+    set_catalog_page,
+)
 from book_service.models import Book
+from book_service.pagination import BookCursorPagination
+from book_service.schemas import book_viewset_schema
+from book_service.search import search_books
 from book_service.serializers import BookListSerializer, BookDetailSerializer
+from core.conditional import ConditionalGetMixin
+from core.db_routers import ReplicaReadViewMixin
+from core.projections import FlatListViewMixin
 
 
-class BookViewSet(viewsets.ModelViewSet):
+@book_viewset_schema
+class BookViewSet(
+    ReplicaReadViewMixin,
+    ConditionalGetMixin,
+    FlatListViewMixin,
+    viewsets.ModelViewSet,
+):
     queryset = Book.objects.all()
+    pagination_class = BookCursorPagination
+    # A catalog page read from a lagging replica would be cached under
+    # the version bumped by the change it misses, so pages come from default
+    replica_actions = ("retrieve",)
+
+    def get_queryset(self):
+        qs = super().get_queryset()
+        if self.action != "list":
+            return qs
+
+        query = self.request.query_params.get("q")
+        if query:
+            qs = search_books(qs, query)
+
+        author = self.request.query_params.get("author")
+        if author:
+            qs = search_books(qs, author, fields=("author",))
+
+        cover = self.request.query_params.get("cover")
+        if cover:
+            qs = qs.filter(cover=cover)
+
+        in_stock = self.request.query_params.get("in_stock")
+        if in_stock is not None:
+            if in_stock.lower() in ["true", "1", "yes"]:
+                qs = qs.filter(inventory__gt=0)
+            elif in_stock.lower() in ["false", "0", "no"]:
+                qs = qs.filter(inventory=0)
+        return qs
 
     def get_serializer_class(self):
         if self.action == "list":
@@ -19,3 +67,30 @@ class BookViewSet(viewsets.ModelViewSet):
         else:
             permission_classes = [IsAdminUser]
         return [permission() for permission in permission_classes]
+
+    def get_conditional_validators(self):
+        if self.action == "list":
+            # catalog pages change only along with the catalog version
+            return self.make_etag(self.catalog_version), None
+        return super().get_conditional_validators()
+
+    def list(self, request, *args, **kwargs):
+        # Read once, so the ETag, the lookup and the store agree even
+        # when the catalog changes halfway through the request
+        self.catalog_version = get_catalog_version()
+        return self.conditional_response(
+            self.list_catalog_page, request, *args, **kwargs
+        )
+
+    def list_catalog_page(self, request, *args, **kwargs):
+        key = catalog_page_key(
+            request.build_absolute_uri(request.path), request.query_params
+        )
+        if key is None:
+            return Response(self.get_flat_list_data())
+
+        data = get_catalog_page(self.catalog_version, key)
+        if data is None:
+            data = self.get_flat_list_data()
+            set_catalog_page(self.catalog_version, key, data)
+        return Response(data)
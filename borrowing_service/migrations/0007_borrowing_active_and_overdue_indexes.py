@@ -0,0 +1,32 @@
+# Generated by Django 5.1.6 on 2026-10-17 06:16
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("book_service", "0002_alter_book_options"),
+        ("borrowing_service", "0006_alter_borrowing_options"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="borrowing",
+            index=models.Index(
+                condition=models.Q(("actual_return_date__isnull", True)),
+                fields=["user", "-borrow_date"],
+                name="borrowing_active_user_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="borrowing",
+            index=models.Index(
+                condition=models.Q(("actual_return_date__isnull", True)),
+                fields=["expected_return_date"],
+                name="borrowing_overdue_idx",
+            ),
+        ),
+    ]
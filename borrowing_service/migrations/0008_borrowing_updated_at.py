@@ -0,0 +1,18 @@
+# Generated by Django 5.1.6 on 2026-10-17 06:29
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("borrowing_service", "0007_borrowing_active_and_overdue_indexes"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="borrowing",
+            name="updated_at",
+            field=models.DateTimeField(auto_now=True),
+        ),
+    ]
@@ -1,5 +1,5 @@
 from django.core.exceptions import ValidationError
-from django.db import models
+from django.db import models, transaction
 from django.conf import settings
 from django.utils import timezone
 
@@ -14,6 +14,7 @@ class Borrowing(models.Model):
     user = models.ForeignKey(
         settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name="borrowings"
     )
+    updated_at = models.DateTimeField(auto_now=True)
 
     def clean(self):
         today = timezone.now().date()
@@ -44,11 +45,11 @@ class Borrowing(models.Model):
 
     def save(self, *args, **kwargs):
         self.clean()
-        if not self.pk:
-            self.book.inventory -= 1
-            self.book.save()
+        with transaction.atomic():
+            if not self.pk and not self.book.reserve():
+                raise ValidationError("Selected book is out of stock.")
 
-        super().save(*args, **kwargs)
+            super().save(*args, **kwargs)
 
     def __str__(self):
         return (
@@ -58,3 +59,17 @@ class Borrowing(models.Model):
 
     class Meta:
         ordering = ["-borrow_date"]
+        indexes = [
+            # BorrowingViewSet: a user's active borrowings, newest first
+            models.Index(
+                fields=["user", "-borrow_date"],
+                condition=models.Q(actual_return_date__isnull=True),
+                name="borrowing_active_user_idx",
+            ),
+            # today_overdue_borrowings: active borrowings by expected date
+            models.Index(
+                fields=["expected_return_date"],
+                condition=models.Q(actual_return_date__isnull=True),
+                name="borrowing_overdue_idx",
+            ),
+        ]
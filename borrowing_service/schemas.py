@@ -9,7 +9,9 @@ from borrowing_service.serializers import (
     BorrowingListSerializer,
     BorrowingDetailSerializer,
     BorrowingCreateSerializer,
+    BorrowingCartSerializer,
 )
+from core.idempotency import idempotency_key_parameter
 
 
 borrowing_viewset_schema = extend_schema_view(
@@ -46,8 +48,14 @@ borrowing_viewset_schema = extend_schema_view(
     create=extend_schema(
         description=(
             "Create a new borrowing record. "
-            "The record is automatically linked to the authenticated user."
+            "The record is automatically linked to the authenticated user. "
+            "The Stripe session is created after the borrowing is saved; "
+            "if Stripe is unavailable, 'session_url' is null and the payment "
+            "stays pending, the client retries by opening 'checkout_url'. "
+            "With lazy checkout, 'session_url' is null and the session is "
+            "created when the client opens 'checkout_url'."
         ),
+        parameters=[idempotency_key_parameter],
         request=BorrowingCreateSerializer,
         responses=BorrowingDetailSerializer,
     ),
@@ -58,7 +66,9 @@ borrowing_return_schema = extend_schema(
         "Mark a borrowed book as returned. This action sets the actual return date "
         "to the current date and increments the book's inventory. If the book "
         "is returned late, a FINE payment session is created, "
-        "and the response includes a payment ID and a Stripe session URL."
+        "and the response includes a payment ID and a Stripe session URL "
+        "(null if Stripe is unavailable, the payment can be renewed later, "
+        "or with lazy checkout, the session is created by 'checkout_url')."
     ),
     responses={
         200: [
@@ -72,6 +82,8 @@ borrowing_return_schema = extend_schema(
                     "message": "The book was returned late, you must pay a fine.",
                     "payment_id": 123,
                     "session_url": "https://stripe.example.com/session/abc123",
+                    "checkout_url": "https://library.example.com"
+                    "/api/payments/123/checkout/",
                 },
             ),
         ],
@@ -82,3 +94,24 @@ borrowing_return_schema = extend_schema(
     },
     methods=["POST"],
 )
+
+borrowing_cart_schema = extend_schema(
+    description=(
+        "Borrow several books at once. All borrowings are created in one "
+        "transaction and paid for with one payment, whose Stripe session has "
+        "a line item per book. Fails as a whole if any of the books is out "
+        "of stock. 'session_url' is null if Stripe is unavailable or with "
+        "lazy checkout, like for a single borrowing."
+    ),
+    parameters=[idempotency_key_parameter],
+    request=BorrowingCartSerializer,
+    responses={201: BorrowingCartSerializer},
+    examples=[
+        OpenApiExample(
+            "Cart",
+            value={"books": [1, 2, 3], "expected_return_date": "2025-03-10"},
+            request_only=True,
+        ),
+    ],
+    methods=["POST"],
+)
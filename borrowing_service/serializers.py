@@ -1,11 +1,16 @@
+from datetime import date
+from decimal import Decimal
+
+from django.conf import settings
+from django.core.exceptions import ValidationError as DjangoValidationError
 from django.db import transaction
 from django.utils import timezone
 from rest_framework import serializers
 
 from borrowing_service.models import Borrowing
 from book_service.models import Book
+from core.prefetch import PrefetchPlanMixin
 from payment_service.models import Payment
-from payment_service.utils import create_payment_session
 from user.models import User
 
 
@@ -21,40 +26,138 @@ class BorrowingBookSerializer(serializers.ModelSerializer):
         fields = ("id", "title", "author", "cover", "daily_fee")
 
 
+def validate_no_pending_payments(user) -> None:
+    pending_payments = Payment.objects.filter(
+        borrowing__user=user, status=Payment.Status.PENDING
+    )
+
+    if pending_payments.exists():
+        raise serializers.ValidationError(
+            "You cannot borrow new books with pending payment."
+        )
+
+
+def validate_expected_return_date(expected_return_date) -> None:
+    today = timezone.now().date()
+    if expected_return_date and expected_return_date < today:
+        raise serializers.ValidationError(
+            "Expected return date cannot be earlier than borrow date."
+        )
+
+
+def validate_rental_fee(books, expected_return_date) -> None:
+    """
+    The rental fee of the books is paid with one payment, it has to fit
+    into Payment.money_to_pay.
+    """
+    field = Payment._meta.get_field("money_to_pay")
+    limit = Decimal(10) ** (field.max_digits - field.decimal_places)
+    # borrow_date is set with date.today() on save
+    days = (expected_return_date - date.today()).days
+    if sum(book.daily_fee for book in books) * days >= limit:
+        raise serializers.ValidationError(
+            f"The rental fee must be less than {limit}, "
+            "choose an earlier return date or fewer books."
+        )
+
+
 class BorrowingCreateSerializer(serializers.ModelSerializer):
     book = serializers.PrimaryKeyRelatedField(queryset=Book.objects.all())
     expected_return_date = serializers.DateField(required=True)
     payment_id = serializers.IntegerField(read_only=True)
     session_url = serializers.CharField(read_only=True)
+    checkout_url = serializers.CharField(read_only=True)
 
     class Meta:
         model = Borrowing
-        fields = ("id", "expected_return_date", "book", "payment_id", "session_url")
-
-    def validate(self, data):
-        user = self.context["request"].user
-        pending_payments = Payment.objects.filter(
-            borrowing__user=user, status=Payment.Status.PENDING
+        fields = (
+            "id",
+            "expected_return_date",
+            "book",
+            "payment_id",
+            "session_url",
+            "checkout_url",
         )
 
-        if pending_payments.exists():
-            raise serializers.ValidationError(
-                "You cannot borrow new books with pending payment."
-            )
+    def validate(self, data):
+        validate_no_pending_payments(self.context["request"].user)
 
         book = data.get("book")
         if book and book.inventory <= 0:
             raise serializers.ValidationError("Selected book is out of stock.")
 
-        expected_return_date = data.get("expected_return_date")
-        today = timezone.now().date()
-        if expected_return_date and expected_return_date < today:
+        validate_expected_return_date(data.get("expected_return_date"))
+        validate_rental_fee([book], data["expected_return_date"])
+
+        return data
+
+    def create(self, validated_data):
+        try:
+            return super().create(validated_data)
+        except DjangoValidationError as e:
+            # the book may run out of stock between validation and save
+            raise serializers.ValidationError(e.messages)
+
+
+class BorrowingCartSerializer(serializers.Serializer):
+    """
+    Borrowings of several books at once, paid for with one payment.
+    Books are loaded with one query and reserved with one UPDATE.
+    """
+
+    books = serializers.ListField(
+        child=serializers.IntegerField(),
+        allow_empty=False,
+        max_length=settings.BORROWING_CART_MAX_BOOKS,
+    )
+    expected_return_date = serializers.DateField(required=True)
+    ids = serializers.ListField(child=serializers.IntegerField(), read_only=True)
+    payment_id = serializers.IntegerField(read_only=True)
+    session_url = serializers.CharField(read_only=True)
+    checkout_url = serializers.CharField(read_only=True)
+
+    def validate_books(self, book_ids):
+        if len(set(book_ids)) != len(book_ids):
+            raise serializers.ValidationError("Each book can be borrowed only once.")
+
+        books = Book.objects.in_bulk(book_ids)
+        missing = [book_id for book_id in book_ids if book_id not in books]
+        if missing:
             raise serializers.ValidationError(
-                "Expected return date cannot be earlier than borrow date."
+                f"Invalid pk {missing[0]} - object does not exist."
             )
 
+        return [books[book_id] for book_id in book_ids]
+
+    def validate(self, data):
+        validate_no_pending_payments(self.context["request"].user)
+
+        for book in data["books"]:
+            if book.inventory <= 0:
+                raise serializers.ValidationError(
+                    f"Selected book is out of stock: {book.title}."
+                )
+
+        validate_expected_return_date(data["expected_return_date"])
+        validate_rental_fee(data["books"], data["expected_return_date"])
+
         return data
 
+    def create(self, validated_data):
+        books = validated_data["books"]
+        # the books may run out of stock between validation and save
+        if not Book.reserve_all(books):
+            raise serializers.ValidationError("Selected book is out of stock.")
+
+        return Borrowing.objects.bulk_create(
+            Borrowing(
+                book=book,
+                user=validated_data["user"],
+                expected_return_date=validated_data["expected_return_date"],
+            )
+            for book in books
+        )
+
 
 class BorrowingPaymentListSerializer(serializers.ModelSerializer):
     class Meta:
@@ -73,12 +176,15 @@ class BorrowingPaymentListSerializer(serializers.ModelSerializer):
         )
 
 
-class BorrowingDetailSerializer(serializers.ModelSerializer):
+class BorrowingDetailSerializer(PrefetchPlanMixin, serializers.ModelSerializer):
     book = BorrowingBookSerializer(read_only=True)
     user = BorrowingUserSerializer(read_only=True)
     payments = BorrowingPaymentListSerializer(
         source="payment", many=True, read_only=True
     )
+    # the payment of a cart is the payment of its first borrowing,
+    # every borrowing of the cart lists it here
+    cart_payments = BorrowingPaymentListSerializer(many=True, read_only=True)
 
     class Meta:
         model = Borrowing
@@ -90,15 +196,17 @@ class BorrowingDetailSerializer(serializers.ModelSerializer):
             "expected_return_date",
             "actual_return_date",
             "payments",
+            "cart_payments",
         )
 
 
-class BorrowingListSerializer(serializers.ModelSerializer):
+class BorrowingListSerializer(PrefetchPlanMixin, serializers.ModelSerializer):
     book = BorrowingBookSerializer(read_only=True)
     user = BorrowingUserSerializer(read_only=True)
     payments = BorrowingPaymentListSerializer(
         source="payment", many=True, read_only=True
     )
+    cart_payments = BorrowingPaymentListSerializer(many=True, read_only=True)
 
     class Meta:
         model = Borrowing
@@ -110,6 +218,7 @@ class BorrowingListSerializer(serializers.ModelSerializer):
             "expected_return_date",
             "actual_return_date",
             "payments",
+            "cart_payments",
         )
 
 
@@ -1,9 +1,17 @@
+import datetime
 import logging
 
 from celery import shared_task
+from django.conf import settings
 
 from borrowing_service.models import Borrowing
-from borrowing_service.utils import today_overdue_borrowings
+from borrowing_service.utils import (
+    overdue_borrowings_after,
+    overdue_report_pages,
+    overdue_report_rows,
+    today_overdue_borrowings,
+)
+from notifications_service.queue import queue_notification
 from notifications_service.utils import send_telegram_message
 
 # Used for Celery logging via:
@@ -27,7 +35,7 @@ def notify_new_borrowing(self, borrowing_id) -> None:
             f"Expected Return Date: {borrowing.expected_return_date}"
         )
 
-        success = send_telegram_message(message)
+        success = queue_notification(message)
 
         if not success:
             logger.error(f"Failed to send notification for borrowing {borrowing.id}")
@@ -41,16 +49,111 @@ def notify_new_borrowing(self, borrowing_id) -> None:
         raise self.retry(exc=exc, countdown=60)
 
 
+@shared_task(max_retries=3, bind=True)
+def notify_new_cart(self, borrowing_ids) -> None:
+    """
+    One notification for all borrowings of a cart.
+    """
+    try:
+        logger.info(f"Processing notify_new_cart for borrowing_ids={borrowing_ids}")
+        borrowings = list(
+            Borrowing.objects.filter(id__in=borrowing_ids)
+            .select_related("user", "book")
+            .order_by("id")
+        )
+        if not borrowings:
+            raise Exception(f"Borrowings with IDs {borrowing_ids} not found")
+
+        books = "\n".join(f"- {borrowing.book.title}" for borrowing in borrowings)
+        message = (
+            f"New Borrowings Created!\n"
+            f"Borrowing IDs: {', '.join(str(b.id) for b in borrowings)}\n"
+            f"User: {borrowings[0].user.email}\n"
+            f"Books:\n{books}\n"
+            f"Borrow Date: {borrowings[0].borrow_date}\n"
+            f"Expected Return Date: {borrowings[0].expected_return_date}"
+        )
+
+        success = queue_notification(message)
+
+        if not success:
+            logger.error(f"Failed to send notification for borrowings {borrowing_ids}")
+            raise Exception("Failed to send Telegram notification")
+        logger.info(f"Notification sent for new borrowings {borrowing_ids}")
+    except Exception as exc:
+        logger.error(f"Error in notify_new_cart: {str(exc)}")
+        raise self.retry(exc=exc, countdown=60)
+
+
 # If is needed to be moved to another service
 # change in core/settings.py CELERY_BEAT_SCHEDULE
 # 'task': 'borrowing_service.tasks.check_overdue_borrowings',
 # with your service name and function name if it was changed!
 @shared_task(bind=True, max_retries=3)
-def check_overdue_borrowings(self):
-    today, overdue_borrowings = today_overdue_borrowings()
+def check_overdue_borrowings(
+    self, today=None, after=None, pages_sent=0, reported=0
+) -> None:
+    """
+    Send today's overdue borrowings report in pages. When a page fails
+    to send, the retry gets the progress of the report in its kwargs
+    (the last sent borrowing and the number of sent pages) and resumes
+    after the last delivered page instead of sending it again.
+    """
+    if today is None:
+        today, overdue_borrowings = today_overdue_borrowings()
+    else:
+        # a retry reports the same day as the first run
+        today = datetime.date.fromisoformat(today)
+        _, overdue_borrowings = today_overdue_borrowings()
+        overdue_borrowings = overdue_borrowings.filter(expected_return_date__lte=today)
+
+    progress = {
+        "today": today.isoformat(),
+        "after": after,
+        "pages_sent": pages_sent,
+        "reported": reported,
+    }
+
+    def remaining_borrowings():
+        if progress["after"] is None:
+            return overdue_borrowings
+        expected_return_date, borrowing_id = progress["after"]
+        return overdue_borrowings_after(
+            overdue_borrowings,
+            datetime.date.fromisoformat(expected_return_date),
+            borrowing_id,
+        )
 
     try:
-        if not overdue_borrowings.exists():
+        if progress["pages_sent"] < settings.OVERDUE_REPORT_MAX_PAGES:
+            rows = overdue_report_rows(
+                remaining_borrowings(), settings.OVERDUE_REPORT_CHUNK_SIZE
+            )
+            pages = overdue_report_pages(
+                today, rows, continued=bool(progress["pages_sent"])
+            )
+            for page, entries, (expected_return_date, borrowing_id) in pages:
+                if not send_telegram_message(page):
+                    logger.error("Failed to send overdue borrowings notification")
+                    raise Exception("Failed to send Telegram notification")
+                progress["after"] = [expected_return_date.isoformat(), borrowing_id]
+                progress["pages_sent"] += 1
+                progress["reported"] += entries
+
+                if progress["pages_sent"] == settings.OVERDUE_REPORT_MAX_PAGES:
+                    break
+
+        if progress["pages_sent"] >= settings.OVERDUE_REPORT_MAX_PAGES:
+            # the rest is summarized instead of flooding the chat
+            remaining = remaining_borrowings().count()
+            if remaining > 0 and not send_telegram_message(
+                f"...and {remaining} more overdue borrowings."
+            ):
+                raise Exception("Failed to send Telegram notification")
+            progress["reported"] += remaining
+
+        reported = progress["reported"]
+        if not reported:
             message = "No borrowings overdue today!"
             success = send_telegram_message(message)
             if not success:
@@ -59,28 +162,7 @@ def check_overdue_borrowings(self):
             logger.info("No overdue borrowings found, notification sent")
             return
 
-        overdue_list = []
-        for borrowing in overdue_borrowings:
-            overdue_info = (
-                f"- Borrowing ID: {borrowing.id}\n"
-                f"  User: {borrowing.user.email}\n"
-                f"  Book: {borrowing.book.title}\n"
-                f"  Expected Return Date: {borrowing.expected_return_date}\n"
-                f"  Days Overdue: {(today - borrowing.expected_return_date).days}"
-            )
-            overdue_list.append(overdue_info)
-
-        message = "Overdue Borrowings Alert!\n\n" + "\n\n".join(overdue_list)
-
-        success = send_telegram_message(message)
-        if not success:
-            logger.error("Failed to send overdue borrowings notification")
-            raise Exception("Failed to send Telegram notification")
-
-        logger.info(
-            f"Notification sent for {overdue_borrowings.count()} overdue borrowings"
-        )
-        logger.info(f"Checked {overdue_borrowings.count()} overdue borrowings")
+        logger.info(f"Notification sent for {reported} overdue borrowings")
     except Exception as exc:
         logger.error(f"Error in check_overdue_borrowings: {str(exc)}")
-        raise self.retry(exc=exc, countdown=60)
+        raise self.retry(exc=exc, countdown=60, kwargs=progress)
@@ -1,10 +1,12 @@
 from django.contrib.auth import get_user_model
 from django.core.exceptions import ValidationError
+from django.db import connection, transaction
 from django.test import TestCase
 from django.utils import timezone
 
 from book_service.models import Book
 from borrowing_service.models import Borrowing
+from borrowing_service.utils import today_overdue_borrowings
 
 User = get_user_model()
 
@@ -128,3 +130,48 @@ class BorrowingModelTests(TestCase):
         self.assertTrue(actual_return_field.blank)
         self.assertFalse(expected_return_field.null)
         self.assertFalse(expected_return_field.blank)
+
+
+class BorrowingIndexUsageTests(TestCase):
+    """Checks with EXPLAIN that the hot borrowing queries use their indexes."""
+
+    def setUp(self):
+        self.user = User.objects.create_user(
+            email="index@example.com", password="testpass123"
+        )
+        self.book = Book.objects.create(
+            title="Index Book",
+            author="Index Author",
+            cover=Book.CoverType.SOFT,
+            inventory=20,
+            daily_fee=1.00,
+        )
+        for days in range(1, 11):
+            Borrowing.objects.create(
+                book=self.book,
+                user=self.user,
+                expected_return_date=timezone.now().date()
+                + timezone.timedelta(days=days),
+                actual_return_date=(timezone.now().date() if days % 2 else None),
+            )
+
+    def assertUsesIndex(self, queryset, index_name):
+        with transaction.atomic():
+            if connection.vendor == "postgresql":
+                # tiny test tables are cheaper to scan than to read by index
+                with connection.cursor() as cursor:
+                    cursor.execute("SET LOCAL enable_seqscan = off")
+            plan = queryset.explain()
+        self.assertIn(index_name, plan)
+
+    def test_active_borrowings_per_user_use_index(self):
+        queryset = Borrowing.objects.filter(
+            user=self.user, actual_return_date__isnull=True
+        ).select_related("book", "user")
+
+        self.assertUsesIndex(queryset, "borrowing_active_user_idx")
+
+    def test_overdue_borrowings_use_index(self):
+        today, queryset = today_overdue_borrowings()
+
+        self.assertUsesIndex(queryset, "borrowing_overdue_idx")
@@ -4,6 +4,7 @@ from django.contrib.auth import get_user_model
 from django.test import TestCase
 from django.utils import timezone
 from datetime import timedelta
+from rest_framework.renderers import JSONRenderer
 
 
 from borrowing_service.models import Borrowing
@@ -12,8 +13,10 @@ from payment_service.models import Payment
 from borrowing_service.serializers import (
     BorrowingCreateSerializer,
     BorrowingDetailSerializer,
+    BorrowingListSerializer,
     BorrowingReturnSerializer,
 )
+from core.projections import FlatProjection
 
 user = get_user_model()
 
@@ -107,6 +110,50 @@ class BorrowingSerializerTest(TestCase):
         self.assertEqual(data["book"]["id"], self.book.id)
         self.assertEqual(data["user"]["email"], self.user.email)
 
+    def test_borrowing_detail_serializer_decimal_and_date_fields(self):
+        borrowing = Borrowing.objects.select_related("book").get(pk=self.borrowing.pk)
+        data = BorrowingDetailSerializer(instance=borrowing).data
+        self.assertEqual(data["book"]["daily_fee"], "10.00")
+        self.assertEqual(
+            data["expected_return_date"],
+            self.borrowing.expected_return_date.isoformat(),
+        )
+
+        # values not coming from the database are still quantized
+        self.assertEqual(
+            BorrowingDetailSerializer(instance=self.borrowing).data["book"][
+                "daily_fee"
+            ],
+            "10.00",
+        )
+
+    def test_flat_projection_renders_same_json_as_list_serializer(self):
+        self.borrowing.actual_return_date = timezone.now().date()
+        self.borrowing.save()
+        other_book = Book.objects.create(
+            title="Other Book", author="Other Author", daily_fee=2.5, inventory=5
+        )
+        other = Borrowing.objects.create(
+            user=self.user,
+            book=other_book,
+            expected_return_date=timezone.now().date() + timedelta(days=3),
+        )
+        for money_to_pay in (10.5, 3):
+            Payment.objects.create(
+                borrowing=other,
+                money_to_pay=money_to_pay,
+                session_id=f"session_{money_to_pay}",
+                session_url="https://example.com/checkout",
+            )
+
+        queryset = BorrowingListSerializer.setup_eager_loading(Borrowing.objects.all())
+        projection = FlatProjection(BorrowingListSerializer)
+
+        self.assertEqual(
+            JSONRenderer().render(projection.render(projection.values(queryset))),
+            JSONRenderer().render(BorrowingListSerializer(queryset, many=True).data),
+        )
+
     def test_borrowing_return_serializer(self):
         self.borrowing.actual_return_date = timezone.now().date()
         self.borrowing.save()
@@ -1,6 +1,8 @@
 from django.contrib.auth import get_user_model
 from django.test import TestCase
 from unittest.mock import patch, Mock
+
+from django.test import override_settings
 from borrowing_service.tasks import notify_new_borrowing, check_overdue_borrowings
 from borrowing_service.models import Borrowing
 from book_service.models import Book
@@ -30,7 +32,7 @@ class NotifyNewBorrowingTestCase(TestCase):
 
         self.mock_send_telegram = Mock(return_value=True)
         self.patcher_send_telegram = patch(
-            "borrowing_service.tasks.send_telegram_message", new=self.mock_send_telegram
+            "borrowing_service.tasks.queue_notification", new=self.mock_send_telegram
         )
         self.patcher_send_telegram.start()
 
@@ -153,3 +155,85 @@ class CheckOverdueBorrowingsTestCase(TestCase):
 
         self.assertEqual(str(context.exception), "Unexpected error")
         self.mock_send_telegram.assert_not_called()
+
+    def create_overdue_borrowings(self, count, days_overdue=3):
+        today = datetime.date.today()
+        Book.objects.filter(pk=self.book.pk).update(inventory=count)
+        self.book.refresh_from_db()
+        borrowings = [
+            Borrowing.objects.create(
+                user=self.user,
+                book=self.book,
+                expected_return_date=today + datetime.timedelta(days=1),
+            )
+            for _ in range(count)
+        ]
+        Borrowing.objects.filter(id__in=[b.id for b in borrowings]).update(
+            expected_return_date=today - datetime.timedelta(days=days_overdue)
+        )
+        return today, Borrowing.objects.filter(actual_return_date__isnull=True)
+
+    def test_check_overdue_borrowings_single_page(self):
+        self.mock_today_overdue.return_value = self.create_overdue_borrowings(2)
+        borrowing_ids = sorted(Borrowing.objects.values_list("id", flat=True))
+        expected_date = datetime.date.today() - datetime.timedelta(days=3)
+
+        check_overdue_borrowings()
+
+        expected_message = "Overdue Borrowings Alert!\n\n" + "\n\n".join(
+            f"- Borrowing ID: {borrowing_id}\n"
+            f"  User: testuser@example.com\n"
+            f"  Book: Test Book\n"
+            f"  Expected Return Date: {expected_date}\n"
+            f"  Days Overdue: 3"
+            for borrowing_id in borrowing_ids
+        )
+        self.mock_send_telegram.assert_called_once_with(expected_message)
+
+    def test_check_overdue_borrowings_splits_pages(self):
+        self.mock_today_overdue.return_value = self.create_overdue_borrowings(60)
+
+        check_overdue_borrowings()
+
+        pages = [call.args[0] for call in self.mock_send_telegram.call_args_list]
+        self.assertGreater(len(pages), 1)
+        self.assertTrue(all(len(page) <= 4096 for page in pages))
+        self.assertTrue(pages[0].startswith("Overdue Borrowings Alert!"))
+        self.assertTrue(pages[1].startswith("Overdue Borrowings Alert (continued)"))
+        self.assertEqual(sum(page.count("- Borrowing ID:") for page in pages), 60)
+
+    def test_check_overdue_borrowings_retry_resumes_after_sent_pages(self):
+        self.mock_today_overdue.return_value = self.create_overdue_borrowings(60)
+        self.mock_send_telegram.side_effect = [True, False]
+
+        with patch.object(
+            check_overdue_borrowings, "retry", side_effect=Exception("retry")
+        ) as mock_retry:
+            with self.assertRaises(Exception):
+                check_overdue_borrowings()
+        progress = mock_retry.call_args.kwargs["kwargs"]
+        first_page = self.mock_send_telegram.call_args_list[0].args[0]
+        self.assertEqual(progress["pages_sent"], 1)
+        self.assertEqual(progress["reported"], first_page.count("- Borrowing ID:"))
+
+        self.mock_send_telegram.reset_mock(side_effect=True)
+        self.mock_send_telegram.return_value = True
+        check_overdue_borrowings(**progress)
+
+        pages = [call.args[0] for call in self.mock_send_telegram.call_args_list]
+        self.assertNotIn(first_page, pages)
+        self.assertTrue(pages[0].startswith("Overdue Borrowings Alert (continued)"))
+        self.assertEqual(
+            sum(page.count("- Borrowing ID:") for page in [first_page, *pages]), 60
+        )
+
+    @override_settings(OVERDUE_REPORT_MAX_PAGES=1)
+    def test_check_overdue_borrowings_summarizes_after_max_pages(self):
+        self.mock_today_overdue.return_value = self.create_overdue_borrowings(60)
+
+        check_overdue_borrowings()
+
+        pages = [call.args[0] for call in self.mock_send_telegram.call_args_list]
+        self.assertEqual(len(pages), 2)
+        reported = pages[0].count("- Borrowing ID:")
+        self.assertEqual(pages[1], f"...and {60 - reported} more overdue borrowings.")
@@ -66,3 +66,26 @@ class TodayOverdueBorrowingsTest(TestCase):
 
         self.assertEqual(today, non_overdue_time.date())
         self.assertEqual(overdue_borrowings.count(), 0)
+
+
+class OverdueReportPagesTest(TestCase):
+    def test_pages_respect_limit(self):
+        today = datetime(2025, 2, 24).date()
+        rows = [
+            (index, f"user{index}@test.com", "Test Book", today - timedelta(days=2))
+            for index in range(10)
+        ]
+
+        pages = list(utils.overdue_report_pages(today, rows, limit=400))
+
+        self.assertTrue(all(len(page) <= 400 for page, _, _ in pages))
+        self.assertEqual(sum(entries for _, entries, _ in pages), 10)
+        self.assertEqual(pages[-1][2], (today - timedelta(days=2), 9))
+        self.assertTrue(pages[0][0].startswith(utils.OVERDUE_REPORT_HEADER))
+        self.assertTrue(pages[-1][0].startswith(utils.OVERDUE_REPORT_CONTINUED))
+        self.assertIn("Days Overdue: 2", pages[0][0])
+
+    def test_no_rows_no_pages(self):
+        pages = list(utils.overdue_report_pages(datetime(2025, 2, 24).date(), []))
+
+        self.assertEqual(pages, [])
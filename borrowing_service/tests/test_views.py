@@ -1,11 +1,21 @@
+import json
+import stripe
 from unittest.mock import patch, MagicMock
-from datetime import datetime, timedelta
+from datetime import date, datetime, timedelta
+from django.core.cache import cache
 from django.utils import timezone
 from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import override_settings
 from rest_framework.test import APITestCase
 from rest_framework import status
 from borrowing_service.models import Borrowing
+from borrowing_service.views import BorrowingViewSet
 from book_service.models import Book
+from core.renderers import ORJSONRenderer
+from notifications_service.models import OutboxMessage
+from payment_service.models import Payment
+from payment_service.utils import attach_checkout_session, create_cart_payment
 
 User = get_user_model()
 
@@ -17,22 +27,18 @@ class BorrowingViewSetTest(APITestCase):
         cls.timezone_patcher = patch("borrowing_service.models.timezone.now")
         cls.mock_now = cls.timezone_patcher.start()
         cls.payment_patcher = patch(
-            "borrowing_service.views.create_payment_session",
-            return_value=(MagicMock(id=1), "mocked_url"),
+            "borrowing_service.views.attach_checkout_session",
+            return_value="mocked_url",
         )
         cls.mock_payment = cls.payment_patcher.start()
         cls.stripe_patcher = patch("stripe.api_key", "sk_test_mock_key")
         cls.stripe_patcher.start()
-        # Mock Celery task
-        cls.celery_patcher = patch("borrowing_service.views.notify_new_borrowing.delay")
-        cls.mock_celery = cls.celery_patcher.start()
 
     @classmethod
     def tearDownClass(cls):
         cls.timezone_patcher.stop()
         cls.payment_patcher.stop()
         cls.stripe_patcher.stop()
-        cls.celery_patcher.stop()
         super().tearDownClass()
 
     def setUp(self):
@@ -49,7 +55,9 @@ class BorrowingViewSetTest(APITestCase):
         self.book = Book.objects.create(title="Test Book", inventory=5, daily_fee=10)
 
     def test_create_borrowing(self):
-        data = {"book": self.book.id, "expected_return_date": "2025-03-10"}
+        # borrow_date is set from the real date, not the patched timezone
+        expected_return_date = (date.today() + timedelta(days=8)).isoformat()
+        data = {"book": self.book.id, "expected_return_date": expected_return_date}
         response = self.client.post("/api/borrowings/", data, format="json")
         self.assertEqual(response.status_code, status.HTTP_201_CREATED)
 
@@ -59,10 +67,197 @@ class BorrowingViewSetTest(APITestCase):
         self.assertIn("payment_id", response.data)
         self.assertIn("session_url", response.data)
 
-        self.assertEqual(response.data["expected_return_date"], "2025-03-10")
+        self.assertEqual(response.data["expected_return_date"], expected_return_date)
         self.assertEqual(response.data["book"], self.book.id)
-        self.assertEqual(response.data["payment_id"], 1)
+        payment = Payment.objects.get(borrowing_id=response.data["id"])
+        self.assertEqual(response.data["payment_id"], payment.id)
         self.assertEqual(response.data["session_url"], "mocked_url")
+        self.assertEqual(payment.status, Payment.Status.PENDING)
+        self.assertEqual(payment.money_to_pay, 80)
+
+        outbox = OutboxMessage.objects.values_list("task_name", "args")
+        self.assertEqual(
+            list(outbox),
+            [
+                ("borrowing_service.tasks.notify_new_borrowing", [response.data["id"]]),
+                ("payment_service.tasks.notify_new_payment", [payment.id]),
+            ],
+        )
+
+    def test_create_borrowing_calls_stripe_outside_transaction(self):
+        test_atomic_blocks = len(connection.atomic_blocks)
+
+        def attach_checkout_session(payment, request):
+            self.assertEqual(len(connection.atomic_blocks), test_atomic_blocks)
+            self.assertTrue(Borrowing.objects.filter(pk=payment.borrowing_id).exists())
+            return "mocked_url"
+
+        expected_return_date = (date.today() + timedelta(days=8)).isoformat()
+        data = {"book": self.book.id, "expected_return_date": expected_return_date}
+        with patch(
+            "borrowing_service.views.attach_checkout_session",
+            side_effect=attach_checkout_session,
+        ) as mock_attach:
+            response = self.client.post("/api/borrowings/", data, format="json")
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        mock_attach.assert_called_once()
+
+    @override_settings(STRIPE_LAZY_CHECKOUT=True)
+    def test_create_borrowing_lazy_checkout(self):
+        expected_return_date = (date.today() + timedelta(days=8)).isoformat()
+        data = {"book": self.book.id, "expected_return_date": expected_return_date}
+        with patch("borrowing_service.views.attach_checkout_session") as mock_attach:
+            response = self.client.post("/api/borrowings/", data, format="json")
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        mock_attach.assert_not_called()
+        payment = Payment.objects.get(pk=response.data["payment_id"])
+        self.assertIsNone(response.data["session_url"])
+        self.assertEqual(
+            response.data["checkout_url"],
+            f"http://testserver/api/payments/{payment.id}/checkout/",
+        )
+        self.assertEqual(payment.status, Payment.Status.PENDING)
+        self.assertEqual(payment.session_id, "")
+
+    @patch(
+        "payment_service.utils.create_stripe_session",
+        side_effect=stripe.error.StripeError("Stripe is down"),
+    )
+    def test_create_borrowing_stripe_outage_keeps_payment_pending(self, _):
+        expected_return_date = (date.today() + timedelta(days=8)).isoformat()
+        data = {"book": self.book.id, "expected_return_date": expected_return_date}
+        with patch(
+            "borrowing_service.views.attach_checkout_session",
+            side_effect=attach_checkout_session,
+        ):
+            response = self.client.post("/api/borrowings/", data, format="json")
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        payment = Payment.objects.get(pk=response.data["payment_id"])
+        self.assertEqual(payment.status, Payment.Status.PENDING)
+        self.assertIsNone(response.data["session_url"])
+        self.assertEqual(
+            response.data["checkout_url"],
+            f"http://testserver/api/payments/{payment.id}/checkout/",
+        )
+
+        # the unpaid borrowing still blocks the next one
+        response = self.client.post("/api/borrowings/", data, format="json")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_cart_creates_borrowings_with_one_payment(self):
+        books = [self.book] + [
+            Book.objects.create(title=f"Cart Book {index}", inventory=1, daily_fee=5)
+            for index in range(2)
+        ]
+        expected_return_date = (date.today() + timedelta(days=4)).isoformat()
+        data = {
+            "books": [book.id for book in books],
+            "expected_return_date": expected_return_date,
+        }
+        response = self.client.post("/api/borrowings/cart/", data, format="json")
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data["books"], data["books"])
+        self.assertEqual(response.data["session_url"], "mocked_url")
+        borrowings = Borrowing.objects.filter(user=self.user).order_by("id")
+        self.assertEqual(list(response.data["ids"]), [b.id for b in borrowings])
+
+        payment = Payment.objects.get()
+        self.assertEqual(response.data["payment_id"], payment.id)
+        self.assertEqual(payment.money_to_pay, 80)
+        self.assertEqual(
+            sorted(payment.borrowings.values_list("id", flat=True)),
+            response.data["ids"],
+        )
+        self.assertEqual(
+            list(Book.objects.filter(pk__in=data["books"]).values_list("inventory")),
+            [(0,), (0,), (4,)],
+        )
+
+        outbox = OutboxMessage.objects.values_list("task_name", "args")
+        self.assertEqual(
+            list(outbox),
+            [
+                ("borrowing_service.tasks.notify_new_cart", [response.data["ids"]]),
+                ("payment_service.tasks.notify_new_payment", [payment.id]),
+            ],
+        )
+
+    def test_cart_out_of_stock_creates_nothing(self):
+        sold_out = Book.objects.create(title="Sold Out", inventory=1, daily_fee=5)
+        expected_return_date = (date.today() + timedelta(days=4)).isoformat()
+        data = {
+            "books": [self.book.id, sold_out.id],
+            "expected_return_date": expected_return_date,
+        }
+        # taken by another user between validation and the reservation
+        Book.objects.filter(pk=sold_out.pk).update(inventory=0)
+        response = self.client.post("/api/borrowings/cart/", data, format="json")
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertFalse(Borrowing.objects.exists())
+        self.assertFalse(Payment.objects.exists())
+        self.book.refresh_from_db()
+        self.assertEqual(self.book.inventory, 5)
+
+    def test_cart_rejects_rental_fee_over_payment_limit(self):
+        books = [
+            Book.objects.create(title=f"Rare Book {index}", inventory=1, daily_fee=500)
+            for index in range(2)
+        ]
+        expected_return_date = (date.today() + timedelta(days=10)).isoformat()
+        data = {
+            "books": [book.id for book in books],
+            "expected_return_date": expected_return_date,
+        }
+        response = self.client.post("/api/borrowings/cart/", data, format="json")
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn("rental fee", str(response.data))
+        self.assertFalse(Borrowing.objects.exists())
+
+    def test_cart_rejects_duplicate_books(self):
+        expected_return_date = (date.today() + timedelta(days=4)).isoformat()
+        data = {
+            "books": [self.book.id, self.book.id],
+            "expected_return_date": expected_return_date,
+        }
+        response = self.client.post("/api/borrowings/cart/", data, format="json")
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn("books", response.data)
+        self.assertFalse(Borrowing.objects.exists())
+
+    def test_create_borrowing_retry_with_idempotency_key(self):
+        cache.clear()
+        expected_return_date = (date.today() + timedelta(days=8)).isoformat()
+        data = {"book": self.book.id, "expected_return_date": expected_return_date}
+
+        first = self.client.post(
+            "/api/borrowings/", data, format="json", HTTP_IDEMPOTENCY_KEY="key-1"
+        )
+        retry = self.client.post(
+            "/api/borrowings/", data, format="json", HTTP_IDEMPOTENCY_KEY="key-1"
+        )
+
+        self.assertEqual(first.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(retry.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(retry.data, first.data)
+        self.assertEqual(retry["Idempotent-Replayed"], "true")
+        self.assertEqual(Borrowing.objects.count(), 1)
+        self.book.refresh_from_db()
+        self.assertEqual(self.book.inventory, 4)
+
+        # the key doesn't stand for another request
+        data["expected_return_date"] = (date.today() + timedelta(days=9)).isoformat()
+        response = self.client.post(
+            "/api/borrowings/", data, format="json", HTTP_IDEMPOTENCY_KEY="key-1"
+        )
+        self.assertEqual(response.status_code, status.HTTP_422_UNPROCESSABLE_ENTITY)
+        self.assertEqual(Borrowing.objects.count(), 1)
 
     def test_user_sees_only_own_borrowings(self):
         Borrowing.objects.create(
@@ -117,3 +312,148 @@ class BorrowingViewSetTest(APITestCase):
         )
         response = self.client.get(f"/api/borrowings/?user_id={self.user.id}")
         self.assertEqual(len(response.data), 4)
+
+
+class BorrowingViewSetQueryCountTest(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            email="querycount@example.com", password="testpass"
+        )
+        self.admin = User.objects.create_superuser(
+            email="querycount_admin@example.com", password="adminpass"
+        )
+        self.book = Book.objects.create(
+            title="Query Count Book", inventory=50, daily_fee=10
+        )
+
+    def create_borrowings(self, count, user=None):
+        borrowings = []
+        for _ in range(count):
+            borrowing = Borrowing.objects.create(
+                user=user or self.user,
+                book=self.book,
+                expected_return_date=timezone.now().date() + timedelta(days=7),
+            )
+            for payment_type in Payment.Type.values:
+                Payment.objects.create(
+                    borrowing=borrowing,
+                    money_to_pay=10,
+                    status=Payment.Status.PAID,
+                    type=payment_type,
+                    session_id=f"session_{borrowing.id}_{payment_type}",
+                )
+            borrowings.append(borrowing)
+        return borrowings
+
+    def assert_list_queries(self, num, url="/api/borrowings/"):
+        with self.assertNumQueries(num):
+            response = self.client.get(url, HTTP_ACCEPT="application/json")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response
+
+    def test_list_query_count_does_not_depend_on_page_size(self):
+        self.client.force_authenticate(user=self.user)
+        self.create_borrowings(1)
+        # count + page validators + borrowings with book/user
+        # + payments and cart payments prefetch
+        response = self.assert_list_queries(5)
+        self.assertEqual(len(response.data["results"]), 1)
+
+        self.create_borrowings(4)
+        response = self.assert_list_queries(5)
+        self.assertEqual(len(response.data["results"]), 5)
+        self.assertEqual(len(response.data["results"][0]["payments"]), 2)
+
+    def test_staff_list_query_count_across_users(self):
+        self.client.force_authenticate(user=self.admin)
+        for index in range(5):
+            other_user = User.objects.create_user(
+                email=f"querycount_{index}@example.com", password="testpass"
+            )
+            self.create_borrowings(1, user=other_user)
+
+        response = self.assert_list_queries(5)
+        emails = {item["user"]["email"] for item in response.data["results"]}
+        self.assertEqual(len(emails), 5)
+
+        self.assert_list_queries(5, "/api/borrowings/?is_active=true")
+
+    def test_retrieve_query_count(self):
+        self.client.force_authenticate(user=self.user)
+        borrowing = self.create_borrowings(1)[0]
+
+        with self.assertNumQueries(4):
+            response = self.client.get(
+                f"/api/borrowings/{borrowing.id}/", HTTP_ACCEPT="application/json"
+            )
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["book"]["title"], self.book.title)
+        self.assertEqual(len(response.data["payments"]), 2)
+
+    def test_retrieve_malformed_id(self):
+        self.client.force_authenticate(user=self.user)
+
+        response = self.client.get(
+            "/api/borrowings/abc/", HTTP_ACCEPT="application/json"
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_list_sends_etag_only(self):
+        self.client.force_authenticate(user=self.user)
+        borrowing = self.create_borrowings(1)[0]
+
+        response = self.client.get("/api/borrowings/", HTTP_ACCEPT="application/json")
+        self.assertIn("ETag", response)
+        # a row leaving the page doesn't advance the updated_at of the others
+        self.assertNotIn("Last-Modified", response)
+
+        response = self.client.get(
+            f"/api/borrowings/{borrowing.id}/", HTTP_ACCEPT="application/json"
+        )
+        self.assertIn("Last-Modified", response)
+
+    def test_orjson_renderer_matches_json_renderer(self):
+        self.client.force_authenticate(user=self.user)
+        self.create_borrowings(3)
+        expected = self.client.get("/api/borrowings/", HTTP_ACCEPT="application/json")
+
+        with patch.object(BorrowingViewSet, "renderer_classes", [ORJSONRenderer]):
+            response = self.client.get("/api/borrowings/")
+
+        self.assertEqual(response["Content-Type"], "application/json")
+        self.assertEqual(json.loads(response.content), json.loads(expected.content))
+
+    def test_cart_payment_listed_on_every_borrowing(self):
+        self.client.force_authenticate(user=self.user)
+        borrowings = [
+            Borrowing.objects.create(
+                user=self.user,
+                book=self.book,
+                expected_return_date=timezone.now().date() + timedelta(days=7),
+            )
+            for _ in range(2)
+        ]
+        payment = create_cart_payment(borrowings)
+
+        response = self.client.get("/api/borrowings/", HTTP_ACCEPT="application/json")
+        for item in response.data["results"]:
+            self.assertEqual(
+                [cart_payment["id"] for cart_payment in item["cart_payments"]],
+                [payment.id],
+            )
+
+        url = f"/api/borrowings/{borrowings[1].id}/"
+        response = self.client.get(url, HTTP_ACCEPT="application/json")
+        self.assertEqual(response.data["payments"], [])
+        self.assertEqual(response.data["cart_payments"][0]["status"], "pending")
+
+        payment.status = Payment.Status.PAID
+        payment.save()
+
+        response = self.client.get(
+            url, HTTP_ACCEPT="application/json", HTTP_IF_NONE_MATCH=response["ETag"]
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["cart_payments"][0]["status"], "paid")
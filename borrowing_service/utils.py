@@ -1,9 +1,15 @@
 from datetime import date
+from typing import Iterable, Iterator
 
-from django.db.models import QuerySet
+from django.db.models import Q, QuerySet
 from django.utils import timezone
 
 from borrowing_service.models import Borrowing
+from notifications_service.utils import TELEGRAM_MESSAGE_LIMIT
+
+OVERDUE_REPORT_HEADER = "Overdue Borrowings Alert!"
+OVERDUE_REPORT_CONTINUED = "Overdue Borrowings Alert (continued)"
+OVERDUE_REPORT_FIELDS = ("id", "user__email", "book__title", "expected_return_date")
 
 
 def today_overdue_borrowings() -> (date, QuerySet):
@@ -13,3 +19,67 @@ def today_overdue_borrowings() -> (date, QuerySet):
     ).select_related("user", "book")
 
     return today, overdue_borrowings
+
+
+def overdue_report_rows(overdue_borrowings: QuerySet, chunk_size: int) -> Iterator:
+    """
+    Stream only the columns used by the overdue report, chunk by chunk,
+    without building model instances or caching the whole result.
+    """
+    return (
+        overdue_borrowings.values_list(*OVERDUE_REPORT_FIELDS)
+        .order_by("expected_return_date", "id")
+        .iterator(chunk_size=chunk_size)
+    )
+
+
+def overdue_borrowings_after(
+    overdue_borrowings: QuerySet, expected_return_date: date, borrowing_id: int
+) -> QuerySet:
+    """
+    Overdue borrowings that come after the given one in report order,
+    to resume a report from its last sent page.
+    """
+    return overdue_borrowings.filter(
+        Q(expected_return_date__gt=expected_return_date)
+        | Q(expected_return_date=expected_return_date, id__gt=borrowing_id)
+    )
+
+
+def overdue_report_pages(
+    today: date,
+    rows: Iterable,
+    limit: int = TELEGRAM_MESSAGE_LIMIT,
+    continued: bool = False,
+) -> Iterator[tuple[str, int, tuple]]:
+    """
+    Format overdue report rows into pages of at most limit characters.
+
+    Args:
+        continued: Whether earlier pages of the report were already sent
+
+    Yields:
+        tuple: (page text, number of borrowings on the page,
+            (expected return date, id) of its last borrowing)
+    """
+    page = OVERDUE_REPORT_CONTINUED if continued else OVERDUE_REPORT_HEADER
+    entries, last = 0, None
+
+    for borrowing_id, email, title, expected_return_date in rows:
+        entry = (
+            f"- Borrowing ID: {borrowing_id}\n"
+            f"  User: {email}\n"
+            f"  Book: {title}\n"
+            f"  Expected Return Date: {expected_return_date}\n"
+            f"  Days Overdue: {(today - expected_return_date).days}"
+        )
+        if entries and len(page) + len(entry) + 2 > limit:
+            yield page, entries, last
+            page, entries = OVERDUE_REPORT_CONTINUED, 0
+
+        page += "\n\n" + entry
+        entries += 1
+        last = (expected_return_date, borrowing_id)
+
+    if entries:
+        yield page, entries, last
@@ -1,3 +1,4 @@
+from django.conf import settings
 from django.db import transaction
 from django.utils import timezone
 
@@ -14,15 +15,36 @@ from borrowing_service.serializers import (
     BorrowingDetailSerializer,
     BorrowingCreateSerializer,
     BorrowingReturnSerializer,
+    BorrowingCartSerializer,
 )
-from borrowing_service.schemas import borrowing_viewset_schema, borrowing_return_schema
-from borrowing_service.tasks import notify_new_borrowing
+from borrowing_service.schemas import (
+    borrowing_viewset_schema,
+    borrowing_return_schema,
+    borrowing_cart_schema,
+)
+from borrowing_service.tasks import notify_new_borrowing, notify_new_cart
+from core.conditional import ConditionalGetMixin
+from core.db_routers import ReplicaReadViewMixin
+from core.idempotency import idempotent
+from core.prefetch import PrefetchPlanViewMixin
+from core.projections import FlatListViewMixin
+from notifications_service.outbox import enqueue_task
 from payment_service.models import Payment
-from payment_service.utils import create_payment_session
+from payment_service.tasks import notify_new_payment
+from payment_service.utils import (
+    attach_checkout_session,
+    checkout_url,
+    create_cart_payment,
+    create_pending_payment,
+)
 
 
 @borrowing_viewset_schema
 class BorrowingViewSet(
+    ReplicaReadViewMixin,
+    ConditionalGetMixin,
+    FlatListViewMixin,
+    PrefetchPlanViewMixin,
     mixins.CreateModelMixin,
     mixins.ListModelMixin,
     mixins.RetrieveModelMixin,
@@ -35,15 +57,26 @@ class BorrowingViewSet(
     **Retrieve:** Gets detailed info for a specific borrowing record.
     **Create:** Creates a new borrowing record.
     **Return Borrowing:** Custom action to mark a borrowed book as returned.
+    **Cart:** Creates borrowings of several books paid for with one payment.
     """
 
     queryset = Borrowing.objects.all()
     permission_classes = [IsAuthenticated]
+    conditional_fields = (
+        "updated_at",
+        "book__updated_at",
+        "user__updated_at",
+        "payment__updated_at",
+        "cart_payments__updated_at",
+    )
 
     def get_queryset(self):
         qs = super().get_queryset()
         user = self.request.user
 
+        if self.action == "return_borrowing":
+            qs = qs.select_related("book")
+
         is_active = self.request.query_params.get("is_active")
         if is_active is not None:
             if is_active.lower() in ["true", "1", "yes"]:
@@ -69,6 +102,9 @@ class BorrowingViewSet(
         if self.action == "return_borrowing":
             return BorrowingReturnSerializer
 
+        if self.action == "cart":
+            return BorrowingCartSerializer
+
         return BorrowingCreateSerializer
 
     @borrowing_return_schema
@@ -87,27 +123,67 @@ class BorrowingViewSet(
                 status=status.HTTP_400_BAD_REQUEST,
             )
 
+        fine = None
         with transaction.atomic():
             borrowing.actual_return_date = timezone.now().date()
-            borrowing.book.inventory += 1
-
-            response_data = {"message": "Book returned successfully"}
+            borrowing.book.release()
+            borrowing.save()
 
             if borrowing.actual_return_date > borrowing.expected_return_date:
-                payment, session_url = create_payment_session(
-                    borrowing, request, Payment.Type.FINE
-                )
-                response_data = {
-                    "message": "The book was returned late, you must pay a fine.",
-                    "payment_id": payment.id,
-                    "session_url": session_url,
-                }
-
-            borrowing.book.save()
-            borrowing.save()
+                fine = create_pending_payment(borrowing, Payment.Type.FINE)
+                enqueue_task(notify_new_payment, fine.id)
+
+        response_data = {"message": "Book returned successfully"}
+
+        if fine:
+            session_url = None
+            if not settings.STRIPE_LAZY_CHECKOUT:
+                session_url = attach_checkout_session(fine, request)
+            response_data = {
+                "message": "The book was returned late, you must pay a fine.",
+                "payment_id": fine.id,
+                "session_url": session_url,
+                "checkout_url": checkout_url(fine, request),
+            }
 
         return Response(response_data, status=status.HTTP_200_OK)
 
+    @borrowing_cart_schema
+    @action(detail=False, methods=["POST"], serializer_class=BorrowingCartSerializer)
+    @idempotent
+    def cart(self, request):
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+
+        with transaction.atomic():
+            borrowings = serializer.save(user=request.user)
+            payment = create_cart_payment(borrowings)
+            enqueue_task(notify_new_cart, [borrowing.id for borrowing in borrowings])
+            enqueue_task(notify_new_payment, payment.id)
+
+        # one Checkout Session with a line item per book, created
+        # after commit like the session of a single borrowing
+        session_url = None
+        if not settings.STRIPE_LAZY_CHECKOUT:
+            session_url = attach_checkout_session(payment, request)
+
+        response_data = {
+            "ids": [borrowing.id for borrowing in borrowings],
+            "books": [borrowing.book_id for borrowing in borrowings],
+            "expected_return_date": serializer.validated_data["expected_return_date"],
+            "payment_id": payment.id,
+            "session_url": session_url,
+            "checkout_url": checkout_url(payment, request),
+        }
+        return Response(
+            BorrowingCartSerializer(response_data).data,
+            status=status.HTTP_201_CREATED,
+        )
+
+    @idempotent
+    def create(self, request, *args, **kwargs):
+        return super().create(request, *args, **kwargs)
+
     def perform_create(self, serializer):
         user = self.request.user
 
@@ -116,13 +192,20 @@ class BorrowingViewSet(
 
         with transaction.atomic():
             borrowing = serializer.save(user=user)
-            payment, session_url = create_payment_session(
-                borrowing, self.request, Payment.Type.PAYMENT
-            )
-            notify_new_borrowing.delay(borrowing.id)
-
-        borrowing.payment_id = payment.id if payment else None
-        borrowing.session_url = session_url if session_url else None
+            payment = create_pending_payment(borrowing, Payment.Type.PAYMENT)
+            enqueue_task(notify_new_borrowing, borrowing.id)
+            enqueue_task(notify_new_payment, payment.id)
+
+        # Stripe is called after commit, so the borrowing and book rows
+        # are not locked for the duration of the network round trip.
+        # In lazy mode it's called when the client opens checkout_url.
+        session_url = None
+        if not settings.STRIPE_LAZY_CHECKOUT:
+            session_url = attach_checkout_session(payment, self.request)
+
+        borrowing.payment_id = payment.id
+        borrowing.session_url = session_url
+        borrowing.checkout_url = checkout_url(payment, self.request)
 
         response_data = BorrowingCreateSerializer(borrowing).data
 
@@ -1,4 +1,17 @@
 #!/bin/sh
 
 python manage.py migrate
+
+case "$SERVER_MODE" in
+    wsgi|asgi)
+        if [ "$SERVER_MODE" = "asgi" ]; then
+            # The Stripe-bound payment views are async under ASGI, so a slow
+            # Stripe response doesn't hold a worker
+            export ASYNC_PAYMENT_VIEWS="${ASYNC_PAYMENT_VIEWS:-true}"
+        fi
+        # settings in gunicorn.conf.py
+        exec gunicorn --config gunicorn.conf.py
+        ;;
+esac
+
 python manage.py runserver 0.0.0.0:8000
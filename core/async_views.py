@@ -0,0 +1,42 @@
+import inspect
+
+from asgiref.sync import sync_to_async
+from rest_framework.views import APIView
+
+
+class AsyncAPIView(APIView):
+    """
+    APIView with async handlers for endpoints that mostly wait on external
+    services, so they don't hold a worker thread under ASGI.
+
+    DRF runs sync handlers only, this view runs the usual authentication,
+    permission and throttle checks of APIView.initial() in a thread and
+    awaits the handler. Exceptions are handled and responses rendered
+    like in any other DRF view, handlers return Response.
+    """
+
+    async def dispatch(self, request, *args, **kwargs):
+        self.args = args
+        self.kwargs = kwargs
+        request = self.initialize_request(request, *args, **kwargs)
+        self.request = request
+        self.headers = self.default_response_headers
+
+        try:
+            await sync_to_async(self.initial)(request, *args, **kwargs)
+
+            if request.method.lower() in self.http_method_names:
+                handler = getattr(
+                    self, request.method.lower(), self.http_method_not_allowed
+                )
+            else:
+                handler = self.http_method_not_allowed
+
+            response = handler(request, *args, **kwargs)
+            if inspect.isawaitable(response):
+                response = await response
+        except Exception as exc:
+            response = self.handle_exception(exc)
+
+        self.response = self.finalize_response(request, response, *args, **kwargs)
+        return self.response
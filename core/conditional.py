@@ -0,0 +1,169 @@
+import hashlib
+from datetime import datetime
+
+from django.core.exceptions import ImproperlyConfigured, ValidationError
+from django.core.paginator import InvalidPage, Page
+from django.db.models import Max, QuerySet
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
+from rest_framework.pagination import PageNumberPagination
+
+
+class ConditionalGetMixin:
+    """
+    View mixin answering list and retrieve requests with 304 Not Modified
+    when the client already holds the current representation, before
+    the objects are loaded or serialized.
+
+    Validators come from the updated_at columns listed in
+    conditional_fields, read for the rows of the requested page only, so
+    that a change of a related object rendered by the serializer (e.g. a
+    payment of a borrowing) changes the ETag as well. The columns are
+    aggregated per row, a to-many relation can't multiply the rows of
+    the page. Rows moving in or out of the page change the ETag through
+    their ids, rows elsewhere in the list through the total count.
+    """
+
+    conditional_fields = ("updated_at",)
+    # page read for the validators, reused for the response
+    conditional_page = None
+
+    def is_detail_request(self) -> bool:
+        return (self.lookup_url_kwarg or self.lookup_field) in self.kwargs
+
+    def get_conditional_page(self, queryset: QuerySet) -> Page | None:
+        """
+        Page of the list the response renders, read the way
+        PageNumberPagination reads it.
+
+        Returns:
+            Page: requested page, None when it doesn't exist
+        """
+        paginator = self.paginator
+        if not isinstance(paginator, PageNumberPagination):
+            raise ImproperlyConfigured(
+                f"{type(self).__name__} needs PageNumberPagination "
+                "or its own get_conditional_validators()"
+            )
+
+        django_paginator = paginator.django_paginator_class(
+            queryset, paginator.get_page_size(self.request)
+        )
+        try:
+            return django_paginator.page(
+                paginator.get_page_number(self.request, django_paginator)
+            )
+        except InvalidPage:
+            return None
+
+    def paginate_queryset(self, queryset):
+        """
+        Paginate like PageNumberPagination, with the count of the page
+        read for the validators, so the list is not counted twice.
+        """
+        page = self.conditional_page
+        if page is None:
+            return super().paginate_queryset(queryset)
+
+        paginator = self.paginator
+        django_paginator = paginator.django_paginator_class(
+            queryset, page.paginator.per_page
+        )
+        # Paginator.count is a cached property
+        django_paginator.count = page.paginator.count
+        paginator.request = self.request
+        paginator.page = django_paginator.page(page.number)
+        if django_paginator.num_pages > 1 and paginator.template is not None:
+            paginator.display_page_controls = True
+        return list(paginator.page)
+
+    def get_conditional_values(self, rows: QuerySet) -> list[tuple]:
+        """
+        Returns:
+            list: (pk, *conditional_fields) of the rows, ordered by pk
+        """
+        return list(
+            rows.order_by("pk")
+            .values_list("pk")
+            .annotate(*(Max(field) for field in self.conditional_fields))
+        )
+
+    def get_conditional_validators(self) -> tuple[str | None, datetime | None]:
+        """
+        Last-Modified is only sent for a single object, a row leaving a
+        page of a list doesn't advance the updated_at of the others.
+
+        Returns:
+            tuple: (ETag, Last-Modified), ETag is None to skip the check
+        """
+        queryset = self.filter_queryset(self.get_queryset())
+        if self.is_detail_request():
+            lookup_url_kwarg = self.lookup_url_kwarg or self.lookup_field
+            try:
+                values = self.get_conditional_values(
+                    queryset.filter(
+                        **{self.lookup_field: self.kwargs[lookup_url_kwarg]}
+                    )
+                )
+            except (TypeError, ValueError, ValidationError):
+                # malformed lookup value, let the view answer with 404
+                return None, None
+            if not values:
+                # let the view answer with 404
+                return None, None
+
+            last_modified = max(
+                (value for value in values[0] if isinstance(value, datetime)),
+                default=None,
+            )
+            return self.make_etag(values), last_modified
+
+        if self.paginator is None:
+            return self.make_etag(self.get_conditional_values(queryset)), None
+
+        page = self.get_conditional_page(queryset)
+        if page is None:
+            # let the view answer with 404
+            return None, None
+        self.conditional_page = page
+        values = self.get_conditional_values(
+            queryset.filter(pk__in=page.object_list.values("pk"))
+        )
+        return self.make_etag(page.paginator.count, values), None
+
+    def make_etag(self, *parts) -> str:
+        request = self.request
+        digest = hashlib.md5(
+            repr(
+                (
+                    request.get_full_path(),
+                    request.accepted_media_type,
+                    request.user.pk,
+                    parts,
+                )
+            ).encode(),
+            usedforsecurity=False,
+        ).hexdigest()
+        return f'"{digest}"'
+
+    def conditional_response(self, handler, request, *args, **kwargs):
+        etag, last_modified = self.get_conditional_validators()
+        if etag is None:
+            return handler(request, *args, **kwargs)
+
+        timestamp = int(last_modified.timestamp()) if last_modified else None
+        response = get_conditional_response(request, etag=etag, last_modified=timestamp)
+        if response is None:
+            response = handler(request, *args, **kwargs)
+
+        if response.status_code in (200, 304):
+            response["ETag"] = etag
+            if timestamp is not None:
+                response["Last-Modified"] = http_date(timestamp)
+        return response
+
+    def list(self, request, *args, **kwargs):
+        return self.conditional_response(super().list, request, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.conditional_response(super().retrieve, request, *args, **kwargs)
@@ -0,0 +1,116 @@
+import random
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.core.cache import cache
+from rest_framework.permissions import SAFE_METHODS
+
+# Alias of the database the current request reads from, None for default
+_read_database = ContextVar("read_database", default=None)
+
+
+class ReplicaRouter:
+    """
+    Sends reads to the replica picked for the current request by
+    ReplicaReadViewMixin, everything else to the default database.
+
+    Outside of such requests (writes, admin, Celery tasks, management
+    commands) reads stay on default, so nothing reads data it may just
+    have written from a lagging replica.
+    """
+
+    def db_for_read(self, model, **hints):
+        return _read_database.get()
+
+    def db_for_write(self, model, **hints):
+        return "default"
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # replicas hold the same rows as default
+        return True
+
+
+def choose_replica() -> str | None:
+    """
+    Returns:
+        str | None: Alias of one of settings.DATABASE_REPLICAS,
+            None when no replicas are configured
+    """
+    replicas = settings.DATABASE_REPLICAS
+    return random.choice(replicas) if replicas else None
+
+
+def _primary_pin_key(user_id) -> str:
+    return f"db:primary_until:{user_id}"
+
+
+def pin_to_primary(user) -> None:
+    """
+    Keeps the reads of the user on default for
+    settings.REPLICA_STICKY_SECONDS, long enough for the replicas
+    to catch up with what the user has just written.
+    """
+    cache.set(_primary_pin_key(user.pk), True, settings.REPLICA_STICKY_SECONDS)
+
+
+def is_pinned_to_primary(user) -> bool:
+    if not user.is_authenticated:
+        return False
+    return cache.get(_primary_pin_key(user.pk), False)
+
+
+class PrimaryStickinessMiddleware:
+    """
+    Pins the user to the primary database after every successful
+    unsafe request. Placed after AuthenticationMiddleware; DRF sets
+    the user it authenticated (e.g. from a JWT) on the Django request.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        response = self.get_response(request)
+
+        user = getattr(request, "user", None)
+        if (
+            request.method not in SAFE_METHODS
+            and response.status_code < 400
+            and user is not None
+            and user.is_authenticated
+        ):
+            pin_to_primary(user)
+        return response
+
+
+class ReplicaReadViewMixin:
+    """
+    View mixin serving the safe requests of the actions listed in
+    replica_actions from a read replica, unless the user has written
+    something within the last settings.REPLICA_STICKY_SECONDS.
+    """
+
+    replica_actions = ("list", "retrieve")
+
+    def use_replica(self, request) -> bool:
+        # generic views without a router have no action
+        action = getattr(self, "action", "list")
+        if request.method not in SAFE_METHODS or action not in self.replica_actions:
+            return False
+        return not is_pinned_to_primary(request.user)
+
+    def initial(self, request, *args, **kwargs):
+        # authentication reads the user from default
+        super().initial(request, *args, **kwargs)
+        if self.use_replica(request):
+            self._replica_token = _read_database.set(choose_replica())
+
+    def dispatch(self, request, *args, **kwargs):
+        # finalize_response() is skipped when the handler raises
+        # an exception DRF doesn't handle, so the token is reset here
+        self._replica_token = None
+        try:
+            return super().dispatch(request, *args, **kwargs)
+        finally:
+            if self._replica_token is not None:
+                _read_database.reset(self._replica_token)
@@ -0,0 +1,41 @@
+import logging
+
+from django.core.cache import cache
+from django.db import connection
+from django.http import JsonResponse
+
+logger = logging.getLogger(__name__)
+
+
+def health(request):
+    """Liveness probe, the process is up and serving requests."""
+    return JsonResponse({"status": "ok"})
+
+
+def ready(request):
+    """
+    Readiness probe, the database and the cache can be reached,
+    so the instance can take traffic. Failures are logged, the
+    anonymous caller only gets ok or unavailable per check.
+    """
+    checks = {}
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT 1")
+        checks["database"] = "ok"
+    except Exception:
+        logger.exception("Readiness check failed: database")
+        checks["database"] = "unavailable"
+
+    try:
+        cache.get("ready")
+        checks["cache"] = "ok"
+    except Exception:
+        logger.exception("Readiness check failed: cache")
+        checks["cache"] = "unavailable"
+
+    is_ready = all(check == "ok" for check in checks.values())
+    return JsonResponse(
+        {"status": "ok" if is_ready else "unavailable", "checks": checks},
+        status=200 if is_ready else 503,
+    )
@@ -0,0 +1,163 @@
+import hashlib
+from contextlib import asynccontextmanager, contextmanager
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import cache
+from drf_spectacular.utils import OpenApiParameter
+from rest_framework import exceptions, status
+from rest_framework.response import Response
+
+IDEMPOTENCY_HEADER = "Idempotency-Key"
+REPLAYED_HEADER = "Idempotent-Replayed"
+MAX_KEY_LENGTH = 255
+
+idempotency_key_parameter = OpenApiParameter(
+    name=IDEMPOTENCY_HEADER,
+    location=OpenApiParameter.HEADER,
+    description=(
+        "Unique key of the request, e.g. a UUID. A retry with the same key "
+        "and body gets the stored response back instead of being executed "
+        "again, for 24 hours."
+    ),
+    required=False,
+    type=str,
+)
+
+
+class IdempotencyKeyInUse(exceptions.APIException):
+    status_code = status.HTTP_409_CONFLICT
+    default_detail = "A request with this Idempotency-Key is still in progress."
+    default_code = "idempotency_key_in_use"
+
+
+class IdempotencyKeyReused(exceptions.APIException):
+    status_code = status.HTTP_422_UNPROCESSABLE_ENTITY
+    default_detail = "This Idempotency-Key was used with a different request."
+    default_code = "idempotency_key_reused"
+
+
+def idempotent(handler):
+    """
+    Decorator of DRF view handlers with side effects, e.g. creating
+    a Stripe session, so that client retries don't repeat them.
+
+    A request with an Idempotency-Key header is executed once per user,
+    endpoint and key. Its response is stored in the cache for
+    settings.IDEMPOTENCY_KEY_TIMEOUT and returned to retries with the
+    same body, without calling the handler. A retry arriving while the
+    first request is still running gets 409 Conflict.
+
+    Server errors and exceptions raised by the handler aren't stored,
+    so the request can be retried with the same key.
+    """
+
+    @wraps(handler)
+    def wrapper(view, request, *args, **kwargs):
+        key = request.headers.get(IDEMPOTENCY_HEADER)
+        if not key:
+            return handler(view, request, *args, **kwargs)
+
+        cache_key = _cache_key(request, key)
+        fingerprint = _fingerprint(request)
+
+        record = cache.get(cache_key)
+        if record is None:
+            with _lock(cache_key):
+                # the first request may have finished in the meantime
+                record = cache.get(cache_key)
+                if record is None:
+                    response = handler(view, request, *args, **kwargs)
+                    if response.status_code < 500:
+                        cache.set(
+                            cache_key,
+                            _record(fingerprint, response.status_code, response.data),
+                            settings.IDEMPOTENCY_KEY_TIMEOUT,
+                        )
+                    return response
+
+        status_code, data = _replay(record, fingerprint)
+        return Response(data, status=status_code, headers={REPLAYED_HEADER: "true"})
+
+    return wrapper
+
+
+def aidempotent(handler):
+    """
+    idempotent() for the async handlers of AsyncAPIView.
+    """
+
+    @wraps(handler)
+    async def wrapper(view, request, *args, **kwargs):
+        key = request.headers.get(IDEMPOTENCY_HEADER)
+        if not key:
+            return await handler(view, request, *args, **kwargs)
+
+        cache_key = _cache_key(request, key)
+        fingerprint = _fingerprint(request)
+
+        record = await cache.aget(cache_key)
+        if record is None:
+            async with _alock(cache_key):
+                # the first request may have finished in the meantime
+                record = await cache.aget(cache_key)
+                if record is None:
+                    response = await handler(view, request, *args, **kwargs)
+                    if response.status_code < 500:
+                        await cache.aset(
+                            cache_key,
+                            _record(fingerprint, response.status_code, response.data),
+                            settings.IDEMPOTENCY_KEY_TIMEOUT,
+                        )
+                    return response
+
+        status_code, data = _replay(record, fingerprint)
+        return Response(data, status=status_code, headers={REPLAYED_HEADER: "true"})
+
+    return wrapper
+
+
+def _cache_key(request, key: str) -> str:
+    if len(key) > MAX_KEY_LENGTH:
+        raise exceptions.ValidationError(
+            {IDEMPOTENCY_HEADER: f"Must be at most {MAX_KEY_LENGTH} characters."}
+        )
+    return f"idempotency:{request.user.pk}:{request.method}:{request.path}:{key}"
+
+
+def _fingerprint(request) -> str:
+    digest = hashlib.sha256(request.get_full_path().encode())
+    digest.update(request.body)
+    return digest.hexdigest()
+
+
+def _record(fingerprint: str, status_code: int, data) -> dict:
+    return {"fingerprint": fingerprint, "status": status_code, "data": data}
+
+
+def _replay(record: dict, fingerprint: str) -> tuple[int, object]:
+    if record["fingerprint"] != fingerprint:
+        raise IdempotencyKeyReused()
+    return record["status"], record["data"]
+
+
+@contextmanager
+def _lock(cache_key: str):
+    lock_key = f"{cache_key}:lock"
+    if not cache.add(lock_key, True, settings.IDEMPOTENCY_LOCK_TIMEOUT):
+        raise IdempotencyKeyInUse()
+    try:
+        yield
+    finally:
+        cache.delete(lock_key)
+
+
+@asynccontextmanager
+async def _alock(cache_key: str):
+    lock_key = f"{cache_key}:lock"
+    if not await cache.aadd(lock_key, True, settings.IDEMPOTENCY_LOCK_TIMEOUT):
+        raise IdempotencyKeyInUse()
+    try:
+        yield
+    finally:
+        await cache.adelete(lock_key)
@@ -0,0 +1,109 @@
+from functools import cache
+
+from django.db.models import Prefetch, QuerySet
+from rest_framework import serializers
+
+
+def build_prefetch_plan(
+    serializer_class, prefix: str = ""
+) -> tuple[list[str], list[Prefetch]]:
+    """
+    Walk the fields of a ModelSerializer and collect the lookups needed
+    to render it without per-row queries.
+
+    Nested forward relations become select_related() lookups, nested
+    many=True relations become Prefetch() objects whose queryset only
+    loads the columns rendered by the child serializer.
+
+    Returns:
+        tuple: (select_related lookups, prefetch_related lookups)
+    """
+    model = serializer_class.Meta.model
+    select_related = []
+    prefetch_related = []
+
+    for field in serializer_class().fields.values():
+        if field.source == "*":
+            continue
+
+        lookup = f"{prefix}{field.source}"
+
+        if isinstance(field, serializers.ListSerializer) and isinstance(
+            field.child, serializers.ModelSerializer
+        ):
+            relation = model._meta.get_field(field.source)
+            prefetch_related.append(
+                Prefetch(lookup, queryset=_child_queryset(field.child, relation))
+            )
+        elif isinstance(field, serializers.ModelSerializer):
+            select_related.append(lookup)
+            nested_select, nested_prefetch = build_prefetch_plan(
+                type(field), prefix=f"{lookup}__"
+            )
+            select_related += nested_select
+            prefetch_related += nested_prefetch
+
+    return select_related, prefetch_related
+
+
+@cache
+def get_prefetch_plan(serializer_class) -> tuple[list[str], list[Prefetch]]:
+    # walking the fields instantiates the serializers, once per class is enough
+    return build_prefetch_plan(serializer_class)
+
+
+def _child_queryset(child, relation) -> QuerySet:
+    model = child.Meta.model
+    queryset = model._default_manager.all()
+
+    concrete_fields = {field.name for field in model._meta.concrete_fields}
+    sources = {field.source for field in child.fields.values()}
+
+    # Restrict columns only when every rendered field maps to a column,
+    # otherwise deferred fields would be loaded one row at a time.
+    if sources <= concrete_fields:
+        columns = sources | {model._meta.pk.name}
+        if relation.one_to_many:
+            columns.add(relation.field.name)
+        queryset = queryset.only(*columns)
+
+    select_related, prefetch_related = build_prefetch_plan(type(child))
+    if select_related:
+        queryset = queryset.select_related(*select_related)
+    if prefetch_related:
+        queryset = queryset.prefetch_related(*prefetch_related)
+    return queryset
+
+
+class PrefetchPlanMixin:
+    """
+    Serializer mixin exposing the eager loading plan of its nested fields,
+    so views can load everything the serializer renders up front.
+    """
+
+    @classmethod
+    def get_prefetch_plan(cls) -> tuple[list[str], list[Prefetch]]:
+        return get_prefetch_plan(cls)
+
+    @classmethod
+    def setup_eager_loading(cls, queryset: QuerySet) -> QuerySet:
+        select_related, prefetch_related = cls.get_prefetch_plan()
+        if select_related:
+            queryset = queryset.select_related(*select_related)
+        if prefetch_related:
+            queryset = queryset.prefetch_related(*prefetch_related)
+        return queryset
+
+
+class PrefetchPlanViewMixin:
+    """
+    View mixin applying the prefetch plan of the current serializer class
+    to the queryset returned by get_queryset().
+    """
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        serializer_class = self.get_serializer_class()
+        if issubclass(serializer_class, PrefetchPlanMixin):
+            queryset = serializer_class.setup_eager_loading(queryset)
+        return queryset
@@ -0,0 +1,207 @@
+from functools import cache
+
+from django.core.exceptions import ImproperlyConfigured
+from django.db.models import QuerySet
+from rest_framework import serializers
+from rest_framework.response import Response
+
+# Fields whose to_representation() returns str/int column values unchanged
+PLAIN_FIELDS = (
+    serializers.BooleanField,
+    serializers.CharField,
+    serializers.ChoiceField,
+    serializers.EmailField,
+    serializers.IntegerField,
+    serializers.PrimaryKeyRelatedField,
+    serializers.URLField,
+)
+
+
+class FlatProjection:
+    """
+    Read-only rendering of a ModelSerializer from values() rows.
+
+    The serializer fields are compiled once into the values() lookups
+    they read and a function building the representation of a row, so
+    rendering a page costs a dict per object instead of a model instance
+    and a trip through every serializer field. The output is the same
+    as the serializer's.
+
+    Supported fields are model fields, primary keys of related objects,
+    nested serializers of forward relations and many=True nested
+    serializers of reverse foreign keys and many-to-many relations,
+    which are loaded with one query per relation like prefetch_related().
+    """
+
+    def __init__(self, serializer_class):
+        self.model = serializer_class.Meta.model
+        self.lookups = []
+        self.relations = []
+        self.build = self._compile(serializer_class(), "")
+
+    def _add_lookup(self, lookup: str) -> None:
+        if lookup not in self.lookups:
+            self.lookups.append(lookup)
+
+    def _compile(self, serializer, prefix: str):
+        model = serializer.Meta.model
+        getters = []
+
+        for name, field in serializer.fields.items():
+            source = field.source
+            if source == "*" or "." in source:
+                raise ImproperlyConfigured(
+                    f"{type(serializer).__name__}.{name} can't be read from values()"
+                )
+
+            if isinstance(field, serializers.ListSerializer) and isinstance(
+                field.child, serializers.ModelSerializer
+            ):
+                relation = model._meta.get_field(source)
+                if not relation.auto_created or relation.concrete:
+                    raise ImproperlyConfigured(
+                        f"{type(serializer).__name__}.{name} is not a reverse "
+                        f"foreign key or many-to-many relation"
+                    )
+                key = f"{prefix}{model._meta.pk.name}"
+                self._add_lookup(key)
+                self.relations.append(
+                    ReverseRelation(
+                        key, relation.field.attname, FlatProjection(type(field.child))
+                    )
+                )
+                getters.append((name, _children_getter(len(self.relations) - 1, key)))
+            elif isinstance(field, serializers.ModelSerializer):
+                nested_prefix = f"{prefix}{source}__"
+                key = f"{nested_prefix}{field.Meta.model._meta.pk.name}"
+                self._add_lookup(key)
+                getters.append(
+                    (name, _nested_getter(key, self._compile(field, nested_prefix)))
+                )
+            else:
+                lookup = f"{prefix}{source}"
+                self._add_lookup(lookup)
+                convert = None if type(field) in PLAIN_FIELDS else field
+                getters.append((name, _value_getter(lookup, convert)))
+
+        def build(row, children):
+            return {name: getter(row, children) for name, getter in getters}
+
+        return build
+
+    def values(self, queryset: QuerySet, *extra_lookups: str) -> QuerySet:
+        """
+        Returns:
+            QuerySet: Rows of the queryset holding the projected lookups
+        """
+        lookups = self.lookups + [
+            lookup for lookup in extra_lookups if lookup not in self.lookups
+        ]
+        return queryset.prefetch_related(None).values(*lookups)
+
+    def render(self, rows) -> list[dict]:
+        """
+        Render values() rows the way the serializer renders many=True.
+
+        Args:
+            rows: Rows returned by values(), e.g. a page of them
+
+        Returns:
+            list: Representation of every row
+        """
+        rows = list(rows)
+        children = [relation.load(rows) for relation in self.relations]
+        return [self.build(row, children) for row in rows]
+
+
+class ReverseRelation:
+    def __init__(self, key: str, field: str, projection: FlatProjection):
+        self.key = key
+        self.field = field
+        self.projection = projection
+
+    def load(self, rows) -> dict:
+        """
+        Returns:
+            dict: Rendered children of each parent primary key
+        """
+        parent_ids = {row[self.key] for row in rows}
+        children = {parent_id: [] for parent_id in parent_ids}
+        if not parent_ids:
+            return children
+
+        model = self.projection.model
+        child_rows = list(
+            self.projection.values(
+                model._default_manager.filter(**{f"{self.field}__in": parent_ids}),
+                self.field,
+            )
+        )
+        for row, child in zip(child_rows, self.projection.render(child_rows)):
+            children[row[self.field]].append(child)
+        return children
+
+
+def _value_getter(lookup, field):
+    if field is None:
+        return lambda row, children: row[lookup]
+
+    def get(row, children):
+        value = row[lookup]
+        return None if value is None else field.to_representation(value)
+
+    return get
+
+
+def _nested_getter(key, build):
+    def get(row, children):
+        return None if row[key] is None else build(row, children)
+
+    return get
+
+
+def _children_getter(index, key):
+    return lambda row, children: children[index][row[key]]
+
+
+@cache
+def get_projection(serializer_class) -> FlatProjection:
+    return FlatProjection(serializer_class)
+
+
+class FlatListViewMixin:
+    """
+    View mixin rendering the actions listed in flat_actions with the
+    FlatProjection of the serializer class instead of the serializer.
+    """
+
+    flat_actions = ("list",)
+
+    def use_flat_projection(self) -> bool:
+        # generic views without a router have no action
+        return getattr(self, "action", "list") in self.flat_actions
+
+    def get_flat_list_data(self):
+        """
+        Returns:
+            Data of the list response, paginated when pagination is on
+        """
+        projection = get_projection(self.get_serializer_class())
+        # the cursor is read from the rows of the page
+        ordering = getattr(self.paginator, "ordering", None) or ()
+        if isinstance(ordering, str):
+            ordering = (ordering,)
+
+        rows = projection.values(
+            self.filter_queryset(self.get_queryset()),
+            *(field.lstrip("-") for field in ordering),
+        )
+        page = self.paginate_queryset(rows)
+        if page is None:
+            return projection.render(rows)
+        return self.get_paginated_response(projection.render(page)).data
+
+    def list(self, request, *args, **kwargs):
+        if not self.use_flat_projection():
+            return super().list(request, *args, **kwargs)
+        return Response(self.get_flat_list_data())
@@ -0,0 +1,31 @@
+from django.db.models import QuerySet
+
+
+def delete_in_batches(queryset: QuerySet, batch_size: int) -> int:
+    """
+    Delete the rows of the queryset in primary key order, at most
+    batch_size rows per DELETE statement, so pruning a large backlog
+    never locks more than one batch of rows at once.
+
+    Old rows come first in primary key order, so every batch is found
+    by walking the primary key index from its start.
+
+    Args:
+        queryset: Rows to delete, e.g. processed rows older than a cutoff
+        batch_size: Maximum number of rows deleted by one statement
+
+    Returns:
+        int: Number of deleted rows
+    """
+    deleted = 0
+    model = queryset.model
+    while True:
+        ids = list(queryset.order_by("pk").values_list("pk", flat=True)[:batch_size])
+        if not ids:
+            break
+
+        deleted += model.objects.filter(pk__in=ids).delete()[0]
+        if len(ids) < batch_size:
+            break
+
+    return deleted
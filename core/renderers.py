@@ -0,0 +1,65 @@
+from decimal import Decimal
+
+import orjson
+from django.utils.encoding import force_str
+from django.utils.functional import Promise
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import BaseParser
+from rest_framework.renderers import BaseRenderer
+
+LINE_SEPARATOR = "\u2028".encode()
+PARAGRAPH_SEPARATOR = "\u2029".encode()
+
+
+def _default(value):
+    # types orjson doesn't serialize natively
+    if isinstance(value, Decimal):
+        return str(value)
+    if isinstance(value, Promise):
+        return force_str(value)
+    if hasattr(value, "tolist"):
+        return value.tolist()
+    if hasattr(value, "__iter__"):
+        return list(value)
+    raise TypeError(f"Type is not JSON serializable: {type(value).__name__}")
+
+
+class ORJSONRenderer(BaseRenderer):
+    """
+    JSON renderer serializing with orjson instead of the json module.
+
+    Output matches rest_framework.renderers.JSONRenderer for the
+    serializers of this project, except that it is always compact
+    unless the client asks for an indent. Like JSONRenderer, U+2028 and
+    U+2029 are escaped, so the JSON can be embedded in JavaScript.
+    """
+
+    media_type = "application/json"
+    format = "json"
+    charset = None
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b""
+
+        option = orjson.OPT_NON_STR_KEYS
+        if accepted_media_type and "indent" in accepted_media_type:
+            option |= orjson.OPT_INDENT_2
+        ret = orjson.dumps(data, default=_default, option=option)
+        # orjson writes them as raw UTF-8
+        return ret.replace(LINE_SEPARATOR, b"\\u2028").replace(
+            PARAGRAPH_SEPARATOR, b"\\u2029"
+        )
+
+
+class ORJSONParser(BaseParser):
+    """Parses JSON request bodies with orjson."""
+
+    media_type = "application/json"
+    renderer_class = ORJSONRenderer
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        try:
+            return orjson.loads(stream.read())
+        except orjson.JSONDecodeError as exc:
+            raise ParseError(f"JSON parse error - {exc}")
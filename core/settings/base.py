@@ -50,6 +50,7 @@ MIDDLEWARE = [
     "django.middleware.common.CommonMiddleware",
     "django.middleware.csrf.CsrfViewMiddleware",
     "django.contrib.auth.middleware.AuthenticationMiddleware",
+    "core.db_routers.PrimaryStickinessMiddleware",
     "django.contrib.messages.middleware.MessageMiddleware",
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
 ]
@@ -83,6 +84,14 @@ DATABASES = {
     }
 }
 
+DATABASE_ROUTERS = ["core.db_routers.ReplicaRouter"]
+
+# Aliases from DATABASES that list and retrieve endpoints read from
+DATABASE_REPLICAS = []
+
+# How long reads of a user stay on default after they wrote something
+REPLICA_STICKY_SECONDS = int(os.environ.get("REPLICA_STICKY_SECONDS", 5))
+
 # Password validation
 
 AUTH_PASSWORD_VALIDATORS = [
@@ -122,6 +131,23 @@ STATIC_URL = "static/"
 
 DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
 
+# Cache
+
+CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+    }
+}
+
+# Catalog pages are invalidated on every book change, the timeout
+# only bounds how long unused versions linger in the cache
+BOOK_CATALOG_CACHE_TIMEOUT = 60 * 60
+
+# Responses replayed to retries with the same Idempotency-Key
+IDEMPOTENCY_KEY_TIMEOUT = 24 * 60 * 60
+# Upper bound on how long a crashed request keeps its key locked
+IDEMPOTENCY_LOCK_TIMEOUT = 60
+
 REST_FRAMEWORK = {
     "DEFAULT_PAGINATION_CLASS": "rest_framework.pagination.PageNumberPagination",
     "PAGE_SIZE": 5,
@@ -157,6 +183,22 @@ SIMPLE_JWT = {
 # Telegram notifications
 TELEGRAM_BOT_TOKEN = os.environ.get("TELEGRAM_BOT_TOKEN")
 TELEGRAM_CHAT_ID = os.environ.get("TELEGRAM_CHAT_ID")
+TELEGRAM_API_URL = os.environ.get("TELEGRAM_API_URL", "https://api.telegram.org")
+TELEGRAM_POOL_SIZE = int(os.environ.get("TELEGRAM_POOL_SIZE", 10))
+TELEGRAM_TIMEOUT = (3.05, 10)  # (connect, read) seconds
+TELEGRAM_MAX_RETRIES = 3  # on 429 Too Many Requests
+TELEGRAM_MAX_RETRY_AFTER = 30  # longer waits are left to Celery retries
+# Notifications are coalesced into digests sent every window (0 disables)
+TELEGRAM_DIGEST_WINDOW = int(os.environ.get("TELEGRAM_DIGEST_WINDOW", 10))
+TELEGRAM_DIGEST_MAX_MESSAGES = 500  # per flush
+TELEGRAM_DIGEST_MAX_ATTEMPTS = 5  # then the digest is dropped
+# Shared by all Celery workers, Telegram allows about 1 message/sec per chat
+TELEGRAM_RATE_LIMIT = float(os.environ.get("TELEGRAM_RATE_LIMIT", 1))
+TELEGRAM_RATE_BURST = 3
+NOTIFICATIONS_REDIS_URL = (
+    f"redis://:{os.environ.get('REDIS_PASSWORD')}@"
+    f"{os.environ.get('REDIS_HOST')}:{os.environ.get('REDIS_PORT')}/1"
+)
 
 # Celery Configuration
 CELERY_BROKER_URL = (
@@ -184,8 +226,73 @@ CELERY_BEAT_SCHEDULE = {
         "task": "payment_service.tasks.expire_payments",
         "schedule": 60,
     },
+    "process-stripe-events": {
+        "task": "payment_service.tasks.process_stripe_events",
+        "schedule": 2,
+    },
+    "prune-stripe-events-hourly": {
+        "task": "payment_service.tasks.prune_processed_stripe_events",
+        "schedule": 60 * 60,
+    },
+    "relay-outbox-messages": {
+        "task": "notifications_service.tasks.relay_outbox_messages",
+        "schedule": 5,
+    },
+    "prune-outbox-messages-hourly": {
+        "task": "notifications_service.tasks.prune_outbox_messages",
+        "schedule": 60 * 60,
+    },
+    "flush-telegram-notifications": {
+        "task": "notifications_service.tasks.flush_telegram_notifications",
+        "schedule": TELEGRAM_DIGEST_WINDOW or 60,
+    },
 }
 
+# Daily overdue borrowings report
+OVERDUE_REPORT_CHUNK_SIZE = 2000  # rows fetched per database round trip
+OVERDUE_REPORT_MAX_PAGES = 20  # Telegram messages, the rest is summarized
+
+# Books borrowed at once with POST /api/borrowings/cart/
+BORROWING_CART_MAX_BOOKS = 10
+
+# Pending payments expired by one UPDATE statement
+EXPIRE_PAYMENTS_BATCH_SIZE = 1000
+
+# Stripe webhook events applied to payments by process_stripe_events
+STRIPE_EVENTS_BATCH_SIZE = 500
+STRIPE_EVENTS_MAX_BATCHES_PER_RUN = 10
+# Processed events are kept past Stripe's 3 day redelivery window
+STRIPE_EVENTS_RETENTION = 7 * 24 * 60 * 60  # seconds
+STRIPE_EVENTS_PRUNE_BATCH_SIZE = 1000
+
+# Transactional outbox for Celery tasks
+OUTBOX_BATCH_SIZE = 100
+OUTBOX_MAX_BATCHES_PER_RUN = 10
+# Relayed messages are kept for a day for debugging, then pruned
+OUTBOX_RETENTION = 24 * 60 * 60  # seconds
+OUTBOX_PRUNE_BATCH_SIZE = 1000
+
 # Stripe Settings
 STRIPE_PUBLISHABLE_KEY = os.environ.get("STRIPE_PUBLISHABLE_KEY")
 STRIPE_SECRET_KEY = os.environ.get("STRIPE_SECRET_KEY")
+# Point at a local stand-in, e.g. python -m benchmarks.fake_stripe
+STRIPE_API_BASE = os.environ.get("STRIPE_API_BASE", "https://api.stripe.com")
+# Signing secret of the webhook endpoint, whsec_...
+STRIPE_WEBHOOK_SECRET = os.environ.get("STRIPE_WEBHOOK_SECRET")
+STRIPE_CONNECT_TIMEOUT = 2  # seconds
+STRIPE_READ_TIMEOUT = 10  # seconds, Checkout Sessions usually take < 1s
+STRIPE_MAX_NETWORK_RETRIES = 1  # sent with the same idempotency key
+STRIPE_POOL_SIZE = 10  # keep-alive connections per process
+# Calls fail at once for STRIPE_CIRCUIT_RESET_TIMEOUT seconds after
+# this many consecutive timeouts or server errors of Stripe
+STRIPE_CIRCUIT_FAILURE_THRESHOLD = 5
+STRIPE_CIRCUIT_RESET_TIMEOUT = 30
+# Create Checkout Sessions only when the client opens the checkout URL
+# of a payment, instead of for every new borrowing and fine
+STRIPE_LAZY_CHECKOUT = os.environ.get("STRIPE_LAZY_CHECKOUT", "false").lower() == "true"
+# Seconds a payment without a Checkout Session stays pending,
+# Stripe's default lifetime of a session
+PENDING_PAYMENT_TTL = 24 * 60 * 60
+# Serve the Stripe-bound payment endpoints with async views, so waiting
+# on Stripe doesn't hold a worker thread when running under ASGI
+ASYNC_PAYMENT_VIEWS = os.environ.get("ASYNC_PAYMENT_VIEWS", "false").lower() == "true"
@@ -1,6 +1,11 @@
 from .base import *
 
 
+# Set when connecting through pgbouncer in transaction pooling mode
+DB_TRANSACTION_POOLING = (
+    os.environ.get("DB_TRANSACTION_POOLING", "false").lower() == "true"
+)
+
 DATABASES = {
     "default": {
         "ENGINE": "django.db.backends.postgresql",
@@ -9,5 +14,46 @@ DATABASES = {
         "PASSWORD": os.environ["POSTGRES_PASSWORD"],
         "HOST": os.environ["POSTGRES_HOST"],
         "PORT": int(os.environ["POSTGRES_DB_PORT"]),
+        # Every worker thread keeps its connection open for this many
+        # seconds instead of reconnecting per request, so the server
+        # holds up to workers * threads connections per app instance.
+        # Under ASGI each request runs in a new thread, so they are off.
+        "CONN_MAX_AGE": int(
+            os.environ.get(
+                "DB_CONN_MAX_AGE", 0 if os.environ.get("SERVER_MODE") == "asgi" else 60
+            )
+        ),
+        # a connection dropped by the server is replaced before it's used
+        "CONN_HEALTH_CHECKS": True,
+        # QuerySet.iterator() named cursors don't survive the end of a
+        # transaction, after which pgbouncer may switch the connection
+        "DISABLE_SERVER_SIDE_CURSORS": DB_TRANSACTION_POOLING,
+        "OPTIONS": {
+            "connect_timeout": int(os.environ.get("DB_CONNECT_TIMEOUT", 5)),
+        },
+    }
+}
+
+# Comma-separated hosts of streaming replicas of the default database,
+# with the same name, credentials and port
+DATABASE_REPLICAS = []
+for index, host in enumerate(
+    filter(None, os.environ.get("POSTGRES_REPLICA_HOSTS", "").split(","))
+):
+    alias = f"replica_{index}"
+    DATABASES[alias] = {
+        **DATABASES["default"],
+        "HOST": host.strip(),
+        "TEST": {"MIRROR": "default"},
+    }
+    DATABASE_REPLICAS.append(alias)
+
+CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.redis.RedisCache",
+        "LOCATION": (
+            f"redis://:{os.environ.get('REDIS_PASSWORD')}@"
+            f"{os.environ.get('REDIS_HOST')}:{os.environ.get('REDIS_PORT')}/2"
+        ),
     }
 }
@@ -7,3 +7,14 @@ DATABASES = {
         "NAME": BASE_DIR / "db.sqlite3",
     }
 }
+
+# Point SQLITE_REPLICA_NAME at a copy of db.sqlite3 to read list and
+# retrieve endpoints from it, e.g. to see how stickiness hides the lag
+# of a replica. Without it the alias is only used by the router tests.
+DATABASES["replica"] = {
+    "ENGINE": "django.db.backends.sqlite3",
+    "NAME": os.environ.get("SQLITE_REPLICA_NAME", BASE_DIR / "db.sqlite3"),
+    "TEST": {"MIRROR": "default"},
+}
+
+DATABASE_REPLICAS = ["replica"] if os.environ.get("SQLITE_REPLICA_NAME") else []
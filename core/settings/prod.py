@@ -0,0 +1,29 @@
+from django.core.exceptions import ImproperlyConfigured
+
+from .build import *
+
+
+DEBUG = False
+
+# JSON only: no browsable API forms and templates on every response,
+# serialized with orjson
+REST_FRAMEWORK = {
+    **REST_FRAMEWORK,
+    "DEFAULT_RENDERER_CLASSES": [
+        "core.renderers.ORJSONRenderer",
+    ],
+    "DEFAULT_PARSER_CLASSES": [
+        "core.renderers.ORJSONParser",
+        "rest_framework.parsers.FormParser",
+        "rest_framework.parsers.MultiPartParser",
+    ],
+}
+
+ALLOWED_HOSTS = list(
+    filter(None, os.environ.get("DJANGO_ALLOWED_HOSTS", "").split(","))
+)
+if not ALLOWED_HOSTS:
+    raise ImproperlyConfigured(
+        "DJANGO_ALLOWED_HOSTS must list the comma-separated host names "
+        "the site is served on"
+    )
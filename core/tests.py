@@ -0,0 +1,112 @@
+from decimal import Decimal
+from unittest.mock import patch
+
+from django.core.cache import cache
+from django.db import connection, connections
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIClient
+
+from book_service.models import Book
+from core.renderers import ORJSONRenderer
+from user.models import User
+
+
+class HealthEndpointsTest(TestCase):
+    def test_health(self):
+        with self.assertNumQueries(0):
+            response = self.client.get(reverse("health"))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json(), {"status": "ok"})
+
+    def test_ready(self):
+        response = self.client.get(reverse("ready"))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["checks"], {"database": "ok", "cache": "ok"})
+
+    def test_not_ready_without_database(self):
+        with patch.object(
+            connection, "cursor", side_effect=Exception("connection refused")
+        ), self.assertLogs("core.health", "ERROR") as logs:
+            response = self.client.get(reverse("ready"))
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response.json()["checks"]["database"], "unavailable")
+        self.assertNotIn("connection refused", response.content.decode())
+        self.assertIn("connection refused", logs.output[0])
+
+
+class ORJSONRendererTest(TestCase):
+    def test_escapes_line_separators_like_json_renderer(self):
+        data = {"title": "line\u2028paragraph\u2029end", "fee": "1.50"}
+
+        content = ORJSONRenderer().render(data)
+
+        self.assertIn(b"\\u2028", content)
+        self.assertIn(b"\\u2029", content)
+        self.assertEqual(content, JSONRenderer().render(data))
+
+
+# Committed rows are visible to the replica alias, a second connection
+# to the test database, which TestCase's transaction would hide
+@override_settings(DATABASE_REPLICAS=["replica"])
+class ReplicaRoutingTest(TransactionTestCase):
+    databases = "__all__"
+
+    def setUp(self):
+        cache.clear()
+        self.admin = User.objects.create_superuser(
+            email="admin@example.com", password="adminpass"
+        )
+        self.user = User.objects.create_user(
+            email="user@example.com", password="userpass"
+        )
+        self.book = Book.objects.create(
+            title="Book",
+            author="Author",
+            cover=Book.CoverType.HARD,
+            inventory=5,
+            daily_fee=Decimal("1.00"),
+        )
+        self.client = APIClient()
+
+    def get(self, url):
+        with CaptureQueriesContext(connections["replica"]) as replica_queries:
+            response = self.client.get(url, HTTP_ACCEPT="application/json")
+        self.assertEqual(response.status_code, 200)
+        return len(replica_queries)
+
+    def test_list_and_retrieve_read_from_replica(self):
+        self.client.force_authenticate(user=self.user)
+        book_url = reverse("book_service:book_service-detail", args=[self.book.pk])
+
+        self.assertGreater(self.get(book_url), 0)
+        self.assertGreater(self.get(reverse("borrowing_service:borrowings-list")), 0)
+        self.assertGreater(self.get("/api/payments/"), 0)
+
+    def test_catalog_pages_read_from_default(self):
+        self.assertEqual(self.get(reverse("book_service:book_service-list")), 0)
+
+    def test_reads_stick_to_default_after_a_write(self):
+        self.client.force_authenticate(user=self.admin)
+        response = self.client.patch(
+            reverse("book_service:book_service-detail", args=[self.book.pk]),
+            {"inventory": 4},
+        )
+        self.assertEqual(response.status_code, 200)
+
+        book_url = reverse("book_service:book_service-detail", args=[self.book.pk])
+        self.assertEqual(self.get(book_url), 0)
+
+        # other users aren't pinned
+        self.client.force_authenticate(user=self.user)
+        self.assertGreater(self.get(book_url), 0)
+
+    def test_failed_write_does_not_pin(self):
+        self.client.force_authenticate(user=self.user)
+        response = self.client.post(reverse("book_service:book_service-list"), {})
+        self.assertEqual(response.status_code, 403)
+
+        book_url = reverse("book_service:book_service-detail", args=[self.book.pk])
+        self.assertGreater(self.get(book_url), 0)
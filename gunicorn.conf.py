@@ -0,0 +1,45 @@
+"""
+Gunicorn settings for the production entrypoint, see
+commands/run_library_backend.sh. Every value can be overridden from
+the environment.
+
+Graceful reload: send SIGHUP to the master, workers finish their
+in-flight requests (up to graceful_timeout) and are replaced with
+workers importing the new code. With GUNICORN_PRELOAD=true the master
+holds the app and SIGHUP brings the old code back, so a deploy needs
+a full restart or a SIGUSR2 upgrade of the master instead.
+"""
+
+import multiprocessing
+import os
+
+SERVER_MODE = os.environ.get("SERVER_MODE", "wsgi")
+
+bind = os.environ.get("GUNICORN_BIND", "0.0.0.0:8000")
+
+# Pre-fork worker model: processes for CPU bound work, threads per
+# process for requests waiting on PostgreSQL, Redis or Stripe
+workers = int(os.environ.get("WEB_CONCURRENCY", multiprocessing.cpu_count() * 2 + 1))
+if SERVER_MODE == "asgi":
+    worker_class = "uvicorn.workers.UvicornWorker"
+    wsgi_app = "core.asgi:application"
+else:
+    worker_class = "gthread"
+    threads = int(os.environ.get("GUNICORN_THREADS", 4))
+    wsgi_app = "core.wsgi:application"
+
+# Import the app once in the master, workers fork with it loaded and
+# start faster, at the cost of SIGHUP no longer loading new code
+preload_app = os.environ.get("GUNICORN_PRELOAD", "false").lower() == "true"
+
+# Recycle workers to bound the effect of leaks, jittered so they
+# don't all restart at once
+max_requests = int(os.environ.get("GUNICORN_MAX_REQUESTS", 2000))
+max_requests_jitter = int(os.environ.get("GUNICORN_MAX_REQUESTS_JITTER", 200))
+
+timeout = int(os.environ.get("GUNICORN_TIMEOUT", 30))
+graceful_timeout = int(os.environ.get("GUNICORN_GRACEFUL_TIMEOUT", 30))
+keepalive = int(os.environ.get("GUNICORN_KEEPALIVE", 5))
+
+accesslog = os.environ.get("GUNICORN_ACCESSLOG", "-")
+errorlog = "-"
@@ -0,0 +1,5 @@
+from django.contrib import admin
+
+from notifications_service.models import OutboxMessage
+
+admin.site.register(OutboxMessage)
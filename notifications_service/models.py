@@ -0,0 +1,27 @@
+from django.db import models
+from django.db.models import Q
+
+
+class OutboxMessage(models.Model):
+    """
+    Celery task call stored in the same transaction as the change it
+    reports on, and sent to the broker by the relay after commit.
+    """
+
+    task_name = models.CharField(max_length=255)
+    args = models.JSONField(default=list)
+    created_at = models.DateTimeField(auto_now_add=True)
+    dispatched_at = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f"{self.task_name}{tuple(self.args)}"
+
+    class Meta:
+        ordering = ["id"]
+        indexes = [
+            models.Index(
+                fields=["id"],
+                condition=Q(dispatched_at__isnull=True),
+                name="outbox_pending_idx",
+            )
+        ]
@@ -0,0 +1,87 @@
+import datetime
+import logging
+
+from celery import current_app
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from core.pruning import delete_in_batches
+from notifications_service.models import OutboxMessage
+
+logger = logging.getLogger(__name__)
+
+
+def enqueue_task(task, *args) -> OutboxMessage:
+    """
+    Store a Celery task call in the outbox.
+
+    Call it inside the transaction that creates the objects the task
+    reads: the task is only sent to the broker by relay_outbox once
+    the transaction is committed, and never if it is rolled back.
+
+    Args:
+        task: Celery task (or its registered name) to call
+        args: JSON serializable task arguments
+
+    Returns:
+        OutboxMessage: The stored outbox message
+    """
+    return OutboxMessage.objects.create(
+        task_name=getattr(task, "name", task), args=list(args)
+    )
+
+
+def relay_outbox(batch_size: int = None) -> int:
+    """
+    Send one batch of pending outbox messages to the broker over a single
+    producer connection and mark them as dispatched.
+
+    Rows are locked with SKIP LOCKED where supported, so several relays
+    can run at once without sending a message twice.
+
+    Returns:
+        int: Number of dispatched messages
+    """
+    batch_size = batch_size or settings.OUTBOX_BATCH_SIZE
+
+    with transaction.atomic():
+        messages = list(
+            OutboxMessage.objects.select_for_update(skip_locked=True).filter(
+                dispatched_at__isnull=True
+            )[:batch_size]
+        )
+        if not messages:
+            return 0
+
+        with current_app.producer_or_acquire() as producer:
+            for message in messages:
+                current_app.send_task(
+                    message.task_name, args=message.args, producer=producer
+                )
+
+        OutboxMessage.objects.filter(
+            id__in=[message.id for message in messages]
+        ).update(dispatched_at=timezone.now())
+
+    logger.info(f"Relayed {len(messages)} outbox messages")
+    return len(messages)
+
+
+def prune_outbox(batch_size: int = None) -> int:
+    """
+    Delete messages dispatched more than OUTBOX_RETENTION seconds ago,
+    so the outbox only holds pending and recently relayed messages.
+
+    Returns:
+        int: Number of deleted messages
+    """
+    cutoff = timezone.now() - datetime.timedelta(seconds=settings.OUTBOX_RETENTION)
+    deleted = delete_in_batches(
+        OutboxMessage.objects.filter(dispatched_at__lt=cutoff),
+        batch_size or settings.OUTBOX_PRUNE_BATCH_SIZE,
+    )
+
+    if deleted:
+        logger.info(f"Pruned {deleted} dispatched outbox messages")
+    return deleted
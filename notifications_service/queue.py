@@ -0,0 +1,236 @@
+import logging
+import time
+
+import redis
+from django.conf import settings
+
+from notifications_service.utils import TELEGRAM_MESSAGE_LIMIT, send_telegram_message
+
+logger = logging.getLogger(__name__)
+
+DIGEST_SEPARATOR = "\n\n"
+
+BUFFER_KEY = "notifications:telegram:buffer"
+# messages taken by a flush stay here until they are sent
+PROCESSING_KEY = "notifications:telegram:processing"
+FLUSH_LOCK_KEY = "notifications:telegram:flush"
+# failed attempts to send the digest at the head of the processing list
+ATTEMPTS_KEY = "notifications:telegram:attempts"
+# a flush running longer than this may be overlapped by the next one,
+# which can send its messages twice, but never loses them
+FLUSH_LOCK_TIMEOUT = 600  # seconds
+BUCKET_KEY = "notifications:telegram:bucket"
+
+# Refills the bucket from the time elapsed since the last call and takes
+# one token. Returns how long the caller has to wait if the bucket is empty.
+# Redis server time is used, so workers on different hosts share one clock.
+TOKEN_BUCKET_SCRIPT = """
+local rate = tonumber(ARGV[1])
+local capacity = tonumber(ARGV[2])
+local time = redis.call("TIME")
+local now = tonumber(time[1]) + tonumber(time[2]) / 1000000
+
+local bucket = redis.call("HMGET", KEYS[1], "tokens", "updated_at")
+local tokens = tonumber(bucket[1]) or capacity
+local updated_at = tonumber(bucket[2]) or now
+
+tokens = math.min(capacity, tokens + (now - updated_at) * rate)
+local wait = 0
+if tokens < 1 then
+    wait = (1 - tokens) / rate
+else
+    tokens = tokens - 1
+end
+
+redis.call("HSET", KEYS[1], "tokens", tokens, "updated_at", now)
+redis.call("EXPIRE", KEYS[1], math.ceil(capacity / rate) + 1)
+return tostring(wait)
+"""
+
+_redis_client = None
+
+
+def get_redis_client() -> redis.Redis:
+    global _redis_client
+    if _redis_client is None:
+        _redis_client = redis.Redis.from_url(settings.NOTIFICATIONS_REDIS_URL)
+    return _redis_client
+
+
+class TokenBucket:
+    """
+    Rate limiter shared by all Celery workers through Redis,
+    allowing `rate` messages per second with bursts of up to `capacity`.
+    """
+
+    def __init__(self, client: redis.Redis, key: str, rate: float, capacity: int):
+        self.key = key
+        self.rate = rate
+        self.capacity = capacity
+        self.script = client.register_script(TOKEN_BUCKET_SCRIPT)
+
+    def acquire(self, timeout: float) -> bool:
+        """Wait for a token, return False if it would take longer than timeout."""
+        deadline = time.monotonic() + timeout
+        while True:
+            wait = float(self.script(keys=[self.key], args=[self.rate, self.capacity]))
+            if wait == 0:
+                return True
+            if time.monotonic() + wait > deadline:
+                return False
+            time.sleep(wait)
+
+
+def get_telegram_bucket() -> TokenBucket:
+    return TokenBucket(
+        get_redis_client(),
+        BUCKET_KEY,
+        rate=settings.TELEGRAM_RATE_LIMIT,
+        capacity=settings.TELEGRAM_RATE_BURST,
+    )
+
+
+def queue_notification(message: str) -> bool:
+    """
+    Buffer a message to be sent as part of the next digest.
+    Sends it right away when digests are disabled.
+    """
+    if not settings.TELEGRAM_DIGEST_WINDOW:
+        return send_telegram_message(message, markdown=False)
+
+    get_redis_client().rpush(BUFFER_KEY, message)
+    return True
+
+
+def split_message(message: str, limit: int = TELEGRAM_MESSAGE_LIMIT) -> list[str]:
+    """Split a message into chunks of at most limit characters, on lines if possible."""
+    chunks = []
+    while len(message) > limit:
+        cut = message.rfind("\n", 0, limit)
+        if cut <= 0:
+            cut = limit
+        chunks.append(message[:cut])
+        message = message[cut:].lstrip("\n")
+    if message:
+        chunks.append(message)
+    return chunks
+
+
+def build_digests(
+    messages: list[str], limit: int = TELEGRAM_MESSAGE_LIMIT
+) -> list[tuple[str, int]]:
+    """
+    Pack messages, in order, into as few Telegram messages as the limit
+    allows. Digests are only split between messages, a message longer
+    than the limit is sent on its own, split on lines.
+
+    Returns:
+        list: (text, number of messages it completes)
+    """
+    digests = []
+    current, count = "", 0
+    for message in messages:
+        if len(message) > limit:
+            if current:
+                digests.append((current, count))
+                current, count = "", 0
+            chunks = split_message(message, limit)
+            digests += [(chunk, 0) for chunk in chunks[:-1]]
+            digests.append((chunks[-1], 1))
+        elif current and len(current) + len(DIGEST_SEPARATOR) + len(message) <= limit:
+            current += DIGEST_SEPARATOR + message
+            count += 1
+        else:
+            if current:
+                digests.append((current, count))
+            current, count = message, 1
+    if current:
+        digests.append((current, count))
+    return digests
+
+
+def take_messages(limit: int) -> list[str]:
+    """
+    Move up to limit buffered messages to the processing list and return
+    it. Messages left there by an interrupted flush come first, messages
+    are only removed from it by acknowledge() once they are sent.
+    """
+    client = get_redis_client()
+    messages = client.lrange(PROCESSING_KEY, 0, limit - 1)
+
+    missing = limit - len(messages)
+    if missing > 0:
+        pipeline = client.pipeline(transaction=True)
+        for _ in range(missing):
+            pipeline.lmove(BUFFER_KEY, PROCESSING_KEY, "LEFT", "RIGHT")
+        messages += [message for message in pipeline.execute() if message]
+
+    return [message.decode() for message in messages]
+
+
+def acknowledge(count: int) -> None:
+    """Remove the first count messages, which were sent, from the processing list."""
+    if count:
+        get_redis_client().ltrim(PROCESSING_KEY, count, -1)
+
+
+def flush_notifications() -> int:
+    """
+    Send buffered messages as digests, respecting the shared rate limit.
+    Messages are acknowledged digest by digest, the ones that could not
+    be sent stay in the processing list and are sent first by the next
+    flush, as are those of a flush killed before it finished.
+
+    Digests are sent as plain text, the messages hold user data such as
+    emails, which Telegram may fail to parse as Markdown. A digest still
+    rejected TELEGRAM_DIGEST_MAX_ATTEMPTS times in a row is logged and
+    dropped, so it can't hold back the messages queued after it.
+
+    Returns:
+        int: Number of digests sent
+    """
+    client = get_redis_client()
+    lock = client.lock(FLUSH_LOCK_KEY, timeout=FLUSH_LOCK_TIMEOUT)
+    if not lock.acquire(blocking=False):
+        logger.info("Another flush is running, skipping")
+        return 0
+
+    sent = 0
+    try:
+        messages = take_messages(settings.TELEGRAM_DIGEST_MAX_MESSAGES)
+        if not messages:
+            return 0
+
+        digests = build_digests(messages)
+        bucket = get_telegram_bucket()
+
+        for digest, count in digests:
+            if not bucket.acquire(timeout=settings.TELEGRAM_DIGEST_WINDOW):
+                logger.warning("Telegram rate limit reached, postponing digests")
+                return sent
+
+            if send_telegram_message(digest, markdown=False):
+                acknowledge(count)
+                if not sent:
+                    client.delete(ATTEMPTS_KEY)
+                sent += 1
+                continue
+
+            attempts = client.incr(ATTEMPTS_KEY)
+            if attempts < settings.TELEGRAM_DIGEST_MAX_ATTEMPTS:
+                raise Exception("Failed to send Telegram notification")
+
+            logger.error(
+                f"Dropping a digest of {count} notifications after "
+                f"{attempts} failed attempts: {digest[:200]!r}"
+            )
+            acknowledge(count)
+            client.delete(ATTEMPTS_KEY)
+    finally:
+        try:
+            lock.release()
+        except redis.exceptions.LockError:
+            logger.warning("Flush outlasted its lock, it may have been overlapped")
+
+    logger.info(f"Sent {len(messages)} notifications in {sent} digests")
+    return sent
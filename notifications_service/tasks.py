@@ -0,0 +1,55 @@
+import logging
+
+from celery import shared_task
+from django.conf import settings
+
+from notifications_service.outbox import prune_outbox, relay_outbox
+from notifications_service.queue import flush_notifications
+
+logger = logging.getLogger(__name__)
+
+
+@shared_task(bind=True, max_retries=3)
+def relay_outbox_messages(self):
+    """
+    This task sends pending outbox messages to the broker in batches
+    until the outbox is drained or the per-run limit is reached
+    """
+    try:
+        relayed = 0
+        for _ in range(settings.OUTBOX_MAX_BATCHES_PER_RUN):
+            count = relay_outbox()
+            relayed += count
+            if count < settings.OUTBOX_BATCH_SIZE:
+                break
+
+        if relayed:
+            logger.info(f"Relayed {relayed} outbox messages in total")
+    except Exception as exc:
+        logger.error(f"Error in relay_outbox_messages: {str(exc)}")
+        raise self.retry(exc=exc, countdown=10)
+
+
+@shared_task(bind=True, max_retries=3)
+def prune_outbox_messages(self):
+    """
+    This task deletes outbox messages relayed longer than
+    OUTBOX_RETENTION ago, so the outbox table doesn't grow forever
+    """
+    try:
+        prune_outbox()
+    except Exception as exc:
+        logger.error(f"Error in prune_outbox_messages: {str(exc)}")
+        raise self.retry(exc=exc, countdown=60)
+
+
+@shared_task(bind=True, max_retries=3)
+def flush_telegram_notifications(self):
+    """
+    This task sends notifications buffered during the digest window
+    """
+    try:
+        flush_notifications()
+    except Exception as exc:
+        logger.error(f"Error in flush_telegram_notifications: {str(exc)}")
+        raise self.retry(exc=exc, countdown=settings.TELEGRAM_DIGEST_WINDOW or 60)
@@ -0,0 +1,115 @@
+from datetime import timedelta
+from unittest.mock import MagicMock, patch
+
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from notifications_service.models import OutboxMessage
+from notifications_service.outbox import enqueue_task, prune_outbox, relay_outbox
+from notifications_service.tasks import relay_outbox_messages
+from payment_service.tasks import notify_new_payment
+
+
+class OutboxTestCase(TestCase):
+    def setUp(self):
+        self.app_patcher = patch("notifications_service.outbox.current_app")
+        self.mock_app = self.app_patcher.start()
+        self.producer = MagicMock()
+        self.mock_app.producer_or_acquire.return_value.__enter__.return_value = (
+            self.producer
+        )
+
+    def tearDown(self):
+        self.app_patcher.stop()
+
+    def test_enqueue_task_stores_message(self):
+        message = enqueue_task(notify_new_payment, 42)
+
+        message.refresh_from_db()
+        self.assertEqual(message.task_name, "payment_service.tasks.notify_new_payment")
+        self.assertEqual(message.args, [42])
+        self.assertIsNone(message.dispatched_at)
+        self.mock_app.send_task.assert_not_called()
+
+    def test_enqueue_task_accepts_task_name(self):
+        message = enqueue_task("borrowing_service.tasks.notify_new_borrowing", 1)
+
+        self.assertEqual(
+            message.task_name, "borrowing_service.tasks.notify_new_borrowing"
+        )
+
+    def test_relay_outbox_sends_pending_messages(self):
+        first = enqueue_task(notify_new_payment, 1)
+        second = enqueue_task(notify_new_payment, 2)
+
+        relayed = relay_outbox()
+
+        self.assertEqual(relayed, 2)
+        self.mock_app.producer_or_acquire.assert_called_once()
+        self.assertEqual(
+            [call.args for call in self.mock_app.send_task.call_args_list],
+            [
+                ("payment_service.tasks.notify_new_payment",),
+                ("payment_service.tasks.notify_new_payment",),
+            ],
+        )
+        self.assertEqual(
+            [call.kwargs for call in self.mock_app.send_task.call_args_list],
+            [
+                {"args": [1], "producer": self.producer},
+                {"args": [2], "producer": self.producer},
+            ],
+        )
+        first.refresh_from_db()
+        second.refresh_from_db()
+        self.assertIsNotNone(first.dispatched_at)
+        self.assertIsNotNone(second.dispatched_at)
+
+    def test_relay_outbox_skips_dispatched_messages(self):
+        enqueue_task(notify_new_payment, 1)
+        relay_outbox()
+        self.mock_app.send_task.reset_mock()
+
+        self.assertEqual(relay_outbox(), 0)
+        self.mock_app.send_task.assert_not_called()
+
+    def test_relay_outbox_broker_error_keeps_messages_pending(self):
+        message = enqueue_task(notify_new_payment, 1)
+        self.mock_app.send_task.side_effect = ConnectionError("Broker is down")
+
+        with self.assertRaises(ConnectionError):
+            relay_outbox()
+
+        message.refresh_from_db()
+        self.assertIsNone(message.dispatched_at)
+
+    @override_settings(OUTBOX_BATCH_SIZE=2, OUTBOX_MAX_BATCHES_PER_RUN=10)
+    def test_relay_outbox_messages_task_drains_in_batches(self):
+        for payment_id in range(5):
+            enqueue_task(notify_new_payment, payment_id)
+
+        result = relay_outbox_messages()
+
+        self.assertIsNone(result)
+        self.assertEqual(self.mock_app.producer_or_acquire.call_count, 3)
+        self.assertEqual(self.mock_app.send_task.call_count, 5)
+        self.assertFalse(
+            OutboxMessage.objects.filter(dispatched_at__isnull=True).exists()
+        )
+
+    @override_settings(OUTBOX_RETENTION=3600)
+    def test_prune_outbox_deletes_old_dispatched_messages(self):
+        old = enqueue_task(notify_new_payment, 1)
+        recent = enqueue_task(notify_new_payment, 2)
+        pending = enqueue_task(notify_new_payment, 3)
+        now = timezone.now()
+        OutboxMessage.objects.filter(pk=old.pk).update(
+            dispatched_at=now - timedelta(hours=2)
+        )
+        OutboxMessage.objects.filter(pk=recent.pk).update(dispatched_at=now)
+
+        self.assertEqual(prune_outbox(batch_size=1), 1)
+        self.assertEqual(
+            list(OutboxMessage.objects.values_list("pk", flat=True)),
+            [recent.pk, pending.pk],
+        )
@@ -0,0 +1,204 @@
+from unittest.mock import MagicMock, patch
+
+from django.test import TestCase, override_settings
+
+from notifications_service.queue import (
+    ATTEMPTS_KEY,
+    BUFFER_KEY,
+    PROCESSING_KEY,
+    TokenBucket,
+    build_digests,
+    flush_notifications,
+    queue_notification,
+    split_message,
+)
+
+
+class DigestTestCase(TestCase):
+    def test_build_digests_joins_messages(self):
+        digests = build_digests(["first", "second", "third"])
+
+        self.assertEqual(digests, [("first\n\nsecond\n\nthird", 3)])
+
+    def test_build_digests_respects_limit(self):
+        messages = ["a" * 40, "b" * 40, "c" * 40]
+
+        digests = build_digests(messages, limit=100)
+
+        self.assertEqual(digests, [("a" * 40 + "\n\n" + "b" * 40, 2), ("c" * 40, 1)])
+
+    def test_build_digests_splits_long_message(self):
+        message = "\n".join(["line"] * 50)
+
+        digests = build_digests(["short", message, "after"], limit=100)
+
+        texts = [text for text, _ in digests]
+        self.assertTrue(all(len(text) <= 100 for text in texts))
+        self.assertEqual("".join(texts).count("line"), 50)
+        # the long message is sent on its own
+        self.assertEqual(digests[0], ("short", 1))
+        self.assertEqual(digests[-1], ("after", 1))
+        self.assertEqual(sum(count for _, count in digests[1:-1]), 1)
+
+    def test_split_message_without_newlines(self):
+        chunks = split_message("x" * 250, limit=100)
+
+        self.assertEqual([len(chunk) for chunk in chunks], [100, 100, 50])
+
+
+class QueueNotificationTestCase(TestCase):
+    @override_settings(TELEGRAM_DIGEST_WINDOW=10)
+    @patch("notifications_service.queue.send_telegram_message")
+    @patch("notifications_service.queue.get_redis_client")
+    def test_queue_notification_buffers_message(self, mock_client, mock_send):
+        result = queue_notification("New Borrowing Created!")
+
+        self.assertTrue(result)
+        mock_client.return_value.rpush.assert_called_once_with(
+            BUFFER_KEY, "New Borrowing Created!"
+        )
+        mock_send.assert_not_called()
+
+    @override_settings(TELEGRAM_DIGEST_WINDOW=0)
+    @patch("notifications_service.queue.send_telegram_message")
+    @patch("notifications_service.queue.get_redis_client")
+    def test_queue_notification_sends_when_disabled(self, mock_client, mock_send):
+        mock_send.return_value = True
+
+        result = queue_notification("New Borrowing Created!")
+
+        self.assertTrue(result)
+        mock_send.assert_called_once_with("New Borrowing Created!", markdown=False)
+        mock_client.assert_not_called()
+
+
+@override_settings(TELEGRAM_DIGEST_WINDOW=10, TELEGRAM_DIGEST_MAX_MESSAGES=100)
+class FlushNotificationsTestCase(TestCase):
+    def setUp(self):
+        self.client_patcher = patch("notifications_service.queue.get_redis_client")
+        self.client = self.client_patcher.start().return_value
+        self.pipeline = self.client.pipeline.return_value
+        self.client.lrange.return_value = []
+        self.pipeline.execute.return_value = []
+
+        self.bucket_patcher = patch("notifications_service.queue.get_telegram_bucket")
+        self.mock_bucket = self.bucket_patcher.start().return_value
+        self.mock_bucket.acquire.return_value = True
+
+        self.send_patcher = patch("notifications_service.queue.send_telegram_message")
+        self.mock_send = self.send_patcher.start()
+        self.mock_send.return_value = True
+
+    def tearDown(self):
+        self.client_patcher.stop()
+        self.bucket_patcher.stop()
+        self.send_patcher.stop()
+
+    def test_flush_sends_single_digest(self):
+        self.pipeline.execute.return_value = [b"first", b"second"] + [None] * 98
+
+        sent = flush_notifications()
+
+        self.assertEqual(sent, 1)
+        self.assertEqual(self.pipeline.lmove.call_count, 100)
+        self.pipeline.lmove.assert_called_with(
+            BUFFER_KEY, PROCESSING_KEY, "LEFT", "RIGHT"
+        )
+        self.mock_send.assert_called_once_with("first\n\nsecond", markdown=False)
+        self.client.ltrim.assert_called_once_with(PROCESSING_KEY, 2, -1)
+        self.client.lock.return_value.release.assert_called_once()
+
+    def test_flush_sends_messages_left_by_interrupted_flush_first(self):
+        self.client.lrange.return_value = [b"left over"]
+        self.pipeline.execute.return_value = [b"new"] + [None] * 98
+
+        flush_notifications()
+
+        self.client.lrange.assert_called_once_with(PROCESSING_KEY, 0, 99)
+        self.assertEqual(self.pipeline.lmove.call_count, 99)
+        self.mock_send.assert_called_once_with("left over\n\nnew", markdown=False)
+
+    def test_flush_empty_buffer(self):
+        sent = flush_notifications()
+
+        self.assertEqual(sent, 0)
+        self.mock_send.assert_not_called()
+
+    def test_flush_skipped_while_another_flush_runs(self):
+        self.client.lock.return_value.acquire.return_value = False
+
+        self.assertEqual(flush_notifications(), 0)
+        self.client.lrange.assert_not_called()
+
+    @patch("notifications_service.queue.build_digests")
+    def test_flush_keeps_unsent_messages_when_rate_limited(self, mock_build):
+        self.pipeline.execute.return_value = [b"first", b"second"]
+        mock_build.return_value = [("first", 1), ("second", 1)]
+        self.mock_bucket.acquire.side_effect = [True, False]
+
+        sent = flush_notifications()
+
+        self.assertEqual(sent, 1)
+        self.mock_send.assert_called_once_with("first", markdown=False)
+        # only the sent message leaves the processing list
+        self.client.ltrim.assert_called_once_with(PROCESSING_KEY, 1, -1)
+
+    def test_flush_keeps_messages_on_send_failure(self):
+        self.pipeline.execute.return_value = [b"first"]
+        self.mock_send.return_value = False
+        self.client.incr.return_value = 1
+
+        with self.assertRaises(Exception) as context:
+            flush_notifications()
+
+        self.assertEqual(str(context.exception), "Failed to send Telegram notification")
+        self.client.ltrim.assert_not_called()
+        self.client.lock.return_value.release.assert_called_once()
+
+    @override_settings(TELEGRAM_DIGEST_MAX_ATTEMPTS=5)
+    def test_flush_drops_digest_rejected_too_many_times(self):
+        self.pipeline.execute.return_value = [b"first_user@example.com", b"second"]
+        self.mock_send.return_value = False
+        self.client.incr.return_value = 5
+
+        with self.assertLogs("notifications_service.queue", "ERROR"):
+            sent = flush_notifications()
+
+        self.assertEqual(sent, 0)
+        # acknowledged, so the messages queued after it are not held back
+        self.client.ltrim.assert_called_once_with(PROCESSING_KEY, 2, -1)
+        self.client.delete.assert_called_once_with(ATTEMPTS_KEY)
+
+    def test_flush_resets_attempts_after_sending(self):
+        self.pipeline.execute.return_value = [b"first"]
+
+        flush_notifications()
+
+        self.client.delete.assert_called_once_with(ATTEMPTS_KEY)
+
+
+class TokenBucketTestCase(TestCase):
+    def setUp(self):
+        self.client = MagicMock()
+        self.script = self.client.register_script.return_value
+        self.bucket = TokenBucket(self.client, "bucket", rate=1, capacity=3)
+
+    def test_acquire_available_token(self):
+        self.script.return_value = b"0"
+
+        self.assertTrue(self.bucket.acquire(timeout=1))
+        self.script.assert_called_once_with(keys=["bucket"], args=[1, 3])
+
+    @patch("notifications_service.queue.time.sleep")
+    def test_acquire_waits_for_refill(self, mock_sleep):
+        self.script.side_effect = [b"0.5", b"0"]
+
+        self.assertTrue(self.bucket.acquire(timeout=1))
+        mock_sleep.assert_called_once_with(0.5)
+
+    @patch("notifications_service.queue.time.sleep")
+    def test_acquire_gives_up_after_timeout(self, mock_sleep):
+        self.script.return_value = b"5"
+
+        self.assertFalse(self.bucket.acquire(timeout=1))
+        mock_sleep.assert_not_called()
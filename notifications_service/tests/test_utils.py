@@ -1,4 +1,4 @@
-from django.test import TestCase
+from django.test import TestCase, override_settings
 from unittest.mock import patch, Mock
 from notifications_service.utils import send_telegram_message
 from django.conf import settings
@@ -9,7 +9,7 @@ class TelegramNotificationTestCase(TestCase):
     def setUp(self):
         self.message = "Test message from TestCase"
 
-    @patch("notifications_service.utils.requests.post")
+    @patch("notifications_service.utils.session.post")
     def test_send_telegram_message_success(self, mock_post):
         mock_response = Mock()
         mock_response.status_code = 200
@@ -19,16 +19,17 @@ class TelegramNotificationTestCase(TestCase):
         result = send_telegram_message(self.message)
 
         mock_post.assert_called_once_with(
-            f"https://api.telegram.org/bot{settings.TELEGRAM_BOT_TOKEN}/sendMessage",
+            f"{settings.TELEGRAM_API_URL}/bot{settings.TELEGRAM_BOT_TOKEN}/sendMessage",
             json={
                 "chat_id": settings.TELEGRAM_CHAT_ID,
                 "text": self.message,
                 "parse_mode": "Markdown",
             },
+            timeout=settings.TELEGRAM_TIMEOUT,
         )
         self.assertTrue(result)
 
-    @patch("notifications_service.utils.requests.post")
+    @patch("notifications_service.utils.session.post")
     def test_send_telegram_message_failure_403(self, mock_post):
         mock_response = Mock()
         mock_response.status_code = 403
@@ -40,7 +41,7 @@ class TelegramNotificationTestCase(TestCase):
         mock_post.assert_called_once()
         self.assertFalse(result)
 
-    @patch("notifications_service.utils.requests.post")
+    @patch("notifications_service.utils.session.post")
     def test_send_telegram_message_failure_400(self, mock_post):
         mock_response = Mock()
         mock_response.status_code = 400
@@ -54,7 +55,7 @@ class TelegramNotificationTestCase(TestCase):
         mock_post.assert_called_once()
         self.assertFalse(result)
 
-    @patch("notifications_service.utils.requests.post")
+    @patch("notifications_service.utils.session.post")
     def test_send_telegram_message_network_error(self, mock_post):
         mock_post.side_effect = requests.exceptions.ConnectionError(
             "Network is unreachable"
@@ -64,7 +65,7 @@ class TelegramNotificationTestCase(TestCase):
 
         self.assertFalse(result)
 
-    @patch("notifications_service.utils.requests.post")
+    @patch("notifications_service.utils.session.post")
     def test_send_telegram_message_long_message(self, mock_post):
         mock_response = Mock()
         mock_response.status_code = 200
@@ -76,16 +77,17 @@ class TelegramNotificationTestCase(TestCase):
         result = send_telegram_message(long_message)
 
         mock_post.assert_called_once_with(
-            f"https://api.telegram.org/bot{settings.TELEGRAM_BOT_TOKEN}/sendMessage",
+            f"{settings.TELEGRAM_API_URL}/bot{settings.TELEGRAM_BOT_TOKEN}/sendMessage",
             json={
                 "chat_id": settings.TELEGRAM_CHAT_ID,
                 "text": long_message,
                 "parse_mode": "Markdown",
             },
+            timeout=settings.TELEGRAM_TIMEOUT,
         )
         self.assertTrue(result)
 
-    @patch("notifications_service.utils.requests.post")
+    @patch("notifications_service.utils.session.post")
     def test_send_telegram_message_special_characters(self, mock_post):
         mock_response = Mock()
         mock_response.status_code = 200
@@ -96,11 +98,69 @@ class TelegramNotificationTestCase(TestCase):
         result = send_telegram_message(special_message)
 
         mock_post.assert_called_once_with(
-            f"https://api.telegram.org/bot{settings.TELEGRAM_BOT_TOKEN}/sendMessage",
+            f"{settings.TELEGRAM_API_URL}/bot{settings.TELEGRAM_BOT_TOKEN}/sendMessage",
             json={
                 "chat_id": settings.TELEGRAM_CHAT_ID,
                 "text": special_message,
                 "parse_mode": "Markdown",
             },
+            timeout=settings.TELEGRAM_TIMEOUT,
         )
         self.assertTrue(result)
+
+    @patch("notifications_service.utils.time.sleep")
+    @patch("notifications_service.utils.session.post")
+    def test_send_telegram_message_retries_after_rate_limit(
+        self, mock_post, mock_sleep
+    ):
+        rate_limited = Mock()
+        rate_limited.status_code = 429
+        rate_limited.json.return_value = {
+            "ok": False,
+            "error_code": 429,
+            "parameters": {"retry_after": 3},
+        }
+        success = Mock()
+        success.status_code = 200
+        mock_post.side_effect = [rate_limited, success]
+
+        result = send_telegram_message(self.message)
+
+        self.assertTrue(result)
+        self.assertEqual(mock_post.call_count, 2)
+        mock_sleep.assert_called_once_with(3.0)
+
+    @override_settings(TELEGRAM_MAX_RETRIES=2)
+    @patch("notifications_service.utils.time.sleep")
+    @patch("notifications_service.utils.session.post")
+    def test_send_telegram_message_rate_limit_retries_exhausted(
+        self, mock_post, mock_sleep
+    ):
+        rate_limited = Mock()
+        rate_limited.status_code = 429
+        rate_limited.json.side_effect = ValueError("No JSON")
+        rate_limited.headers = {"Retry-After": "1"}
+        mock_post.return_value = rate_limited
+
+        result = send_telegram_message(self.message)
+
+        self.assertFalse(result)
+        self.assertEqual(mock_post.call_count, 3)
+        self.assertEqual(mock_sleep.call_count, 2)
+
+    @override_settings(TELEGRAM_MAX_RETRY_AFTER=30)
+    @patch("notifications_service.utils.time.sleep")
+    @patch("notifications_service.utils.session.post")
+    def test_send_telegram_message_long_retry_after_not_awaited(
+        self, mock_post, mock_sleep
+    ):
+        rate_limited = Mock()
+        rate_limited.status_code = 429
+        rate_limited.json.return_value = {"parameters": {"retry_after": 120}}
+        mock_post.return_value = rate_limited
+
+        result = send_telegram_message(self.message)
+
+        self.assertFalse(result)
+        mock_post.assert_called_once()
+        mock_sleep.assert_not_called()
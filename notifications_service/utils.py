@@ -1,22 +1,74 @@
-import os
-import requests
 import logging
+import time
+
+import requests
 from django.conf import settings
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 
 #  all logs are going through StreamHandler in console when Celery is running
 logger = logging.getLogger(__name__)
 
+# Maximum length of the text of a Telegram message
+TELEGRAM_MESSAGE_LIMIT = 4096
+
+
+def create_telegram_session() -> requests.Session:
+    """
+    Create an HTTP session that keeps connections to the Telegram API
+    alive between messages. Only connection errors are retried here,
+    as a resent sendMessage request would duplicate the message.
+    """
+    session = requests.Session()
+    adapter = HTTPAdapter(
+        pool_connections=1,
+        pool_maxsize=settings.TELEGRAM_POOL_SIZE,
+        max_retries=Retry(total=None, connect=2, read=0, status=0, backoff_factor=0.5),
+    )
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+
+# shared by all tasks of a worker process, so TCP and TLS setup is paid once
+session = create_telegram_session()
 
-def send_telegram_message(message: str) -> bool:
-    """Send a message to Telegram chat."""
-    url = f"https://api.telegram.org/bot{settings.TELEGRAM_BOT_TOKEN}/sendMessage"
+
+def _retry_after(response) -> float | None:
+    """Seconds to wait before retrying a rate limited (429) request."""
+    try:
+        return float(response.json()["parameters"]["retry_after"])
+    except (ValueError, KeyError, TypeError):
+        pass
+    try:
+        return float(response.headers["Retry-After"])
+    except (KeyError, ValueError):
+        return None
+
+
+def send_telegram_message(message: str, markdown: bool = True) -> bool:
+    """Send a message to Telegram chat, as plain text if markdown is False."""
+    url = f"{settings.TELEGRAM_API_URL}/bot{settings.TELEGRAM_BOT_TOKEN}/sendMessage"
     payload = {
         "chat_id": settings.TELEGRAM_CHAT_ID,
         "text": message,
-        "parse_mode": "Markdown",
     }
+    if markdown:
+        payload["parse_mode"] = "Markdown"
     try:
-        response = requests.post(url, json=payload)
+        for attempt in range(settings.TELEGRAM_MAX_RETRIES + 1):
+            response = session.post(
+                url, json=payload, timeout=settings.TELEGRAM_TIMEOUT
+            )
+            if response.status_code != 429 or attempt == settings.TELEGRAM_MAX_RETRIES:
+                break
+
+            retry_after = _retry_after(response)
+            if retry_after is None or retry_after > settings.TELEGRAM_MAX_RETRY_AFTER:
+                break
+            logger.warning(f"Telegram rate limit hit, retrying in {retry_after}s")
+            time.sleep(retry_after)
+
         if response.status_code != 200:
             logger.error(f"Telegram API error: {response.text}")
             return False
@@ -1,5 +1,6 @@
 from django.contrib import admin
 
-from payment_service.models import Payment
+from payment_service.models import Payment, StripeEvent
 
 admin.site.register(Payment)
+admin.site.register(StripeEvent)
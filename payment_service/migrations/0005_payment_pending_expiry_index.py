@@ -0,0 +1,22 @@
+# Generated by Django 5.1.6 on 2026-10-17 06:18
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("borrowing_service", "0007_borrowing_active_and_overdue_indexes"),
+        ("payment_service", "0004_alter_payment_options"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="payment",
+            index=models.Index(
+                condition=models.Q(("status", "pending")),
+                fields=["session_expires_at"],
+                name="payment_pending_expiry_idx",
+            ),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.1.6 on 2026-10-17 06:29
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("payment_service", "0005_payment_pending_expiry_index"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="payment",
+            name="updated_at",
+            field=models.DateTimeField(auto_now=True),
+        ),
+    ]
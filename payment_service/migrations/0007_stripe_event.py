@@ -0,0 +1,62 @@
+# Generated by Django 5.1.6 on 2026-10-17 07:09
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("borrowing_service", "0008_borrowing_updated_at"),
+        ("payment_service", "0006_payment_updated_at"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="StripeEvent",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("event_id", models.CharField(max_length=255, unique=True)),
+                (
+                    "type",
+                    models.CharField(
+                        choices=[
+                            ("checkout.session.completed", "Session Completed"),
+                            (
+                                "checkout.session.async_payment_succeeded",
+                                "Session Async Payment Succeeded",
+                            ),
+                            ("checkout.session.expired", "Session Expired"),
+                        ],
+                        max_length=64,
+                    ),
+                ),
+                ("session_id", models.CharField(max_length=255)),
+                ("payment_status", models.CharField(blank=True, max_length=32)),
+                ("created_at", models.DateTimeField(auto_now_add=True)),
+                ("processed_at", models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                "ordering": ["id"],
+            },
+        ),
+        migrations.AddIndex(
+            model_name="payment",
+            index=models.Index(fields=["session_id"], name="payment_session_id_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="stripeevent",
+            index=models.Index(
+                condition=models.Q(("processed_at__isnull", True)),
+                fields=["id"],
+                name="stripe_event_pending_idx",
+            ),
+        ),
+    ]
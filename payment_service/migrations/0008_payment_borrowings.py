@@ -0,0 +1,23 @@
+# Generated by Django 5.1.6 on 2026-10-17 07:26
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("borrowing_service", "0008_borrowing_updated_at"),
+        ("payment_service", "0007_stripe_event"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="payment",
+            name="borrowings",
+            field=models.ManyToManyField(
+                blank=True,
+                related_name="cart_payments",
+                to="borrowing_service.borrowing",
+            ),
+        ),
+    ]
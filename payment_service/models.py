@@ -18,6 +18,11 @@ class Payment(models.Model):
     borrowing = models.ForeignKey(
         Borrowing, on_delete=models.CASCADE, related_name="payment"
     )
+    # every borrowing paid for by a cart payment, borrowing is the first
+    # of them, payments of a single borrowing leave this empty
+    borrowings = models.ManyToManyField(
+        Borrowing, related_name="cart_payments", blank=True
+    )
     session_url = models.URLField(max_length=400)
     session_id = models.CharField(max_length=255)
     session_expires_at = models.DateTimeField(default=timezone.now)
@@ -26,6 +31,7 @@ class Payment(models.Model):
         max_length=10, choices=Status.choices, default=Status.PENDING
     )
     type = models.CharField(max_length=10, choices=Type.choices, default=Type.PAYMENT)
+    updated_at = models.DateTimeField(auto_now=True)
 
     def clean(self):
         if self.money_to_pay <= 0:
@@ -37,3 +43,46 @@ class Payment(models.Model):
 
     class Meta:
         ordering = ["-session_expires_at"]
+        indexes = [
+            # expire_payments: pending payments whose session has expired
+            models.Index(
+                fields=["session_expires_at"],
+                condition=models.Q(status="pending"),
+                name="payment_pending_expiry_idx",
+            ),
+            # success view and Stripe events look payments up by session
+            models.Index(fields=["session_id"], name="payment_session_id_idx"),
+        ]
+
+
+class StripeEvent(models.Model):
+    """
+    Checkout Session event received by the Stripe webhook, applied
+    to the payment of the session by process_stripe_events.
+    """
+
+    class Type(models.TextChoices):
+        SESSION_COMPLETED = "checkout.session.completed"
+        SESSION_ASYNC_PAYMENT_SUCCEEDED = "checkout.session.async_payment_succeeded"
+        SESSION_EXPIRED = "checkout.session.expired"
+
+    # Stripe may deliver an event more than once
+    event_id = models.CharField(max_length=255, unique=True)
+    type = models.CharField(max_length=64, choices=Type.choices)
+    session_id = models.CharField(max_length=255)
+    payment_status = models.CharField(max_length=32, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    processed_at = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f"{self.event_id} {self.type}"
+
+    class Meta:
+        ordering = ["id"]
+        indexes = [
+            models.Index(
+                fields=["id"],
+                condition=models.Q(processed_at__isnull=True),
+                name="stripe_event_pending_idx",
+            )
+        ]
@@ -4,6 +4,7 @@ from drf_spectacular.utils import (
     OpenApiExample,
 )
 
+from core.idempotency import idempotency_key_parameter
 from payment_service.serializers import PaymentSerializer, PaymentListSerializer
 
 list_payment_schema = extend_schema(
@@ -54,7 +55,11 @@ detail_payment_schema = extend_schema(
 )
 
 success_payment_schema = extend_schema(
-    description="Check successful Stripe payment and update payment status",
+    description=(
+        "Status of the payment of a Stripe Checkout Session. Payments are "
+        "marked as paid by the Stripe webhook, a pending payment may be "
+        "paid a few seconds after the redirect."
+    ),
     parameters=[
         OpenApiParameter(
             name="session_id",
@@ -81,7 +86,7 @@ success_payment_schema = extend_schema(
             },
         },
         400: {
-            "description": "Bad request (missing session_id or Stripe error)",
+            "description": "Bad request (missing session_id)",
             "content": {
                 "application/json": {
                     "schema": {
@@ -155,6 +160,7 @@ cansel_payment_schema = extend_schema(
 )
 
 renew_stripe_session_schema = extend_schema(
+    parameters=[idempotency_key_parameter],
     request={
         "application/json": {
             "schema": {
@@ -265,3 +271,92 @@ renew_stripe_session_schema = extend_schema(
     },
     description="Renews an expired Stripe payment session.",
 )
+
+stripe_webhook_schema = extend_schema(
+    description=(
+        "Receives Checkout Session events from Stripe. The request must be "
+        "signed with the endpoint secret (Stripe-Signature header)."
+    ),
+    request=None,
+    responses={
+        200: None,
+        400: {
+            "description": "Invalid payload or signature",
+            "content": {
+                "application/json": {
+                    "schema": {
+                        "type": "object",
+                        "properties": {"error": {"type": "string"}},
+                    },
+                },
+            },
+        },
+    },
+)
+
+checkout_payment_schema = extend_schema(
+    description=(
+        "Returns the Stripe Checkout Session URL of a pending payment, "
+        "creating the session on the first request for a payment created "
+        "without one (STRIPE_LAZY_CHECKOUT)."
+    ),
+    parameters=[idempotency_key_parameter],
+    request=None,
+    responses={
+        200: {
+            "description": "Checkout Session of the payment",
+            "content": {
+                "application/json": {
+                    "schema": {
+                        "type": "object",
+                        "properties": {
+                            "payment_id": {"type": "integer", "example": 1},
+                            "session_url": {
+                                "type": "string",
+                                "example": "https://checkout.stripe.com/...",
+                            },
+                        },
+                    },
+                },
+            },
+        },
+        400: {
+            "description": "Bad request (payment not pending, Stripe error)",
+            "content": {
+                "application/json": {
+                    "schema": {
+                        "type": "object",
+                        "properties": {"error": {"type": "string"}},
+                    },
+                },
+            },
+        },
+        403: {
+            "description": "Permission denied",
+            "content": {
+                "application/json": {
+                    "schema": {
+                        "type": "object",
+                        "properties": {"error": {"type": "string"}},
+                    },
+                },
+            },
+        },
+        404: {
+            "description": "Error: Not Found",
+            "content": {
+                "application/json": {
+                    "schema": {
+                        "type": "object",
+                        "properties": {
+                            "detail": {
+                                "type": "string",
+                                "example": "No Payment matches the given query.",
+                            }
+                        },
+                    },
+                },
+            },
+        },
+    },
+)
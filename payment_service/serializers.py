@@ -2,6 +2,7 @@ from rest_framework import serializers
 
 from borrowing_service.models import Borrowing
 from borrowing_service.serializers import BorrowingListSerializer
+from core.prefetch import PrefetchPlanMixin
 from payment_service.models import Payment
 
 
@@ -25,7 +26,7 @@ class PaymentSerializer(serializers.ModelSerializer):
         )
 
 
-class PaymentListSerializer(serializers.ModelSerializer):
+class PaymentListSerializer(PrefetchPlanMixin, serializers.ModelSerializer):
     borrowing = BorrowingListSerializer(many=False, read_only=True)
 
     class Meta:
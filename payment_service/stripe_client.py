@@ -0,0 +1,181 @@
+import logging
+import threading
+import time
+from functools import cache
+
+import requests
+import stripe
+from django.conf import settings
+from requests.adapters import HTTPAdapter
+
+logger = logging.getLogger(__name__)
+
+
+class CircuitOpenError(stripe.error.APIConnectionError):
+    """
+    Raised instead of calling Stripe while the circuit is open. It is
+    an APIConnectionError, so callers handle it like Stripe being down.
+    """
+
+
+class CircuitBreaker:
+    """
+    Stops calling a failing service for reset_timeout seconds after
+    failure_threshold consecutive failures, so requests fail at once
+    instead of each waiting for its own timeout. After that, one trial
+    call is let through: its success closes the circuit, its failure
+    opens it again.
+    """
+
+    def __init__(self, failure_threshold: int, reset_timeout: float):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at = None
+        self.trial_running = False
+        self.lock = threading.Lock()
+
+    def before_call(self) -> None:
+        """
+        Raises:
+            CircuitOpenError: The circuit is open, don't call the service
+        """
+        with self.lock:
+            if self.opened_at is None:
+                return
+            if (
+                self.trial_running
+                or time.monotonic() - self.opened_at < self.reset_timeout
+            ):
+                raise CircuitOpenError("Stripe is unavailable, try again later")
+            self.trial_running = True
+
+    def record_success(self) -> None:
+        with self.lock:
+            self.failures = 0
+            self.opened_at = None
+            self.trial_running = False
+
+    def record_failure(self) -> None:
+        with self.lock:
+            self.failures += 1
+            if self.trial_running or self.failures >= self.failure_threshold:
+                if self.opened_at is None:
+                    logger.warning(
+                        f"Stripe circuit opened after {self.failures} failures"
+                    )
+                self.opened_at = time.monotonic()
+                self.trial_running = False
+
+
+# Errors meaning Stripe is unreachable or overloaded, unlike errors
+# about the request itself, e.g. invalid parameters
+UNAVAILABLE_ERRORS = (
+    stripe.error.APIConnectionError,
+    stripe.error.APIError,
+    stripe.error.RateLimitError,
+)
+
+
+class StripeCheckoutClient:
+    """
+    Checkout Sessions API of a StripeClient configured from the settings,
+    with keep-alive connections, timeouts, bounded retries and a circuit
+    breaker shared by all calls of the process.
+    """
+
+    def __init__(self):
+        self.breaker = CircuitBreaker(
+            settings.STRIPE_CIRCUIT_FAILURE_THRESHOLD,
+            settings.STRIPE_CIRCUIT_RESET_TIMEOUT,
+        )
+        self.client = self._create_client(
+            stripe.RequestsClient(
+                timeout=(settings.STRIPE_CONNECT_TIMEOUT, settings.STRIPE_READ_TIMEOUT),
+                session=self._create_session(),
+            )
+        )
+        self._async_client = None
+
+    @staticmethod
+    def _create_session() -> requests.Session:
+        # retries are left to the Stripe client, which sends them
+        # with the same idempotency key
+        session = requests.Session()
+        adapter = HTTPAdapter(
+            pool_connections=1, pool_maxsize=settings.STRIPE_POOL_SIZE, max_retries=0
+        )
+        session.mount("https://", adapter)
+        session.mount("http://", adapter)
+        return session
+
+    @staticmethod
+    def _create_client(http_client) -> stripe.StripeClient:
+        return stripe.StripeClient(
+            settings.STRIPE_SECRET_KEY,
+            base_addresses={"api": settings.STRIPE_API_BASE},
+            max_network_retries=settings.STRIPE_MAX_NETWORK_RETRIES,
+            http_client=http_client,
+        )
+
+    @property
+    def async_client(self) -> stripe.StripeClient:
+        # requests can't be awaited, async calls go through httpx,
+        # whose client keeps connections alive as well
+        if self._async_client is None:
+            import httpx
+
+            self._async_client = self._create_client(
+                stripe.HTTPXClient(
+                    timeout=httpx.Timeout(
+                        settings.STRIPE_READ_TIMEOUT,
+                        connect=settings.STRIPE_CONNECT_TIMEOUT,
+                    )
+                )
+            )
+        return self._async_client
+
+    def _call(self, method, *args):
+        self.breaker.before_call()
+        try:
+            result = method(*args)
+        except UNAVAILABLE_ERRORS:
+            self.breaker.record_failure()
+            raise
+        except Exception:
+            # not a sign of Stripe being down, e.g. invalid parameters
+            self.breaker.record_success()
+            raise
+        self.breaker.record_success()
+        return result
+
+    async def _acall(self, method, *args):
+        self.breaker.before_call()
+        try:
+            result = await method(*args)
+        except UNAVAILABLE_ERRORS:
+            self.breaker.record_failure()
+            raise
+        except Exception:
+            # not a sign of Stripe being down, e.g. invalid parameters
+            self.breaker.record_success()
+            raise
+        self.breaker.record_success()
+        return result
+
+    def create_checkout_session(self, params: dict) -> stripe.checkout.Session:
+        return self._call(self.client.checkout.sessions.create, params)
+
+    async def acreate_checkout_session(self, params: dict) -> stripe.checkout.Session:
+        return await self._acall(
+            self.async_client.checkout.sessions.create_async, params
+        )
+
+
+@cache
+def get_stripe_client() -> StripeCheckoutClient:
+    """
+    Returns:
+        StripeCheckoutClient: Client shared by all threads of the process
+    """
+    return StripeCheckoutClient()
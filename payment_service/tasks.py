@@ -2,34 +2,81 @@ import logging
 from datetime import datetime
 
 from celery import shared_task
+from django.conf import settings
 
-from notifications_service.utils import send_telegram_message
+from notifications_service.queue import queue_notification
 from payment_service.models import Payment
-from payment_service.utils import expired_sessions
+from payment_service.utils import expire_pending_payments, expired_sessions
+from payment_service.webhooks import apply_stripe_events, prune_stripe_events
 
 logger = logging.getLogger(__name__)
 
 
+def payment_books(payment: Payment) -> str:
+    """Titles of the books of a payment, all of them for a cart payment."""
+    cart = payment.borrowings.select_related("book")
+    return ", ".join(borrowing.book.title for borrowing in cart) or (
+        payment.borrowing.book.title
+    )
+
+
 @shared_task(bind=True, max_retries=3)
 def expire_payments(self):
     """
     This task finds Payments with expired Stripe Sessions
-    and sets their status to expired
+    and sets their status to expired in bounded batches
     """
     now, payments_to_expire = expired_sessions()
-    count = payments_to_expire.count()
-
-    logger.info(f"Found {count} expired payment sessions")
 
     try:
-        if payments_to_expire.exists():
-            payments_to_expire.update(status=Payment.Status.EXPIRED)
-            logger.info(f"Set {count} Payments as 'expired'")
+        expired = 0
+        for expired_ids in expire_pending_payments(
+            payments_to_expire, settings.EXPIRE_PAYMENTS_BATCH_SIZE
+        ):
+            expired += len(expired_ids)
+            logger.info(f"Set {len(expired_ids)} Payments as 'expired'")
+        if expired:
+            logger.info(f"Expired {expired} Payments in total")
     except Exception as exc:
         logger.error(f"Error in expire_payments: {str(exc)}")
         raise self.retry(exc=exc, countdown=60)
 
 
+@shared_task(bind=True, max_retries=3)
+def process_stripe_events(self):
+    """
+    This task applies Stripe events received by the webhook
+    to their payments in batches until none are left
+    or the per-run limit is reached
+    """
+    try:
+        processed = 0
+        for _ in range(settings.STRIPE_EVENTS_MAX_BATCHES_PER_RUN):
+            count = apply_stripe_events()
+            processed += count
+            if count < settings.STRIPE_EVENTS_BATCH_SIZE:
+                break
+
+        if processed:
+            logger.info(f"Processed {processed} Stripe events in total")
+    except Exception as exc:
+        logger.error(f"Error in process_stripe_events: {str(exc)}")
+        raise self.retry(exc=exc, countdown=10)
+
+
+@shared_task(bind=True, max_retries=3)
+def prune_processed_stripe_events(self):
+    """
+    This task deletes Stripe events processed longer than
+    STRIPE_EVENTS_RETENTION ago
+    """
+    try:
+        prune_stripe_events()
+    except Exception as exc:
+        logger.error(f"Error in prune_processed_stripe_events: {str(exc)}")
+        raise self.retry(exc=exc, countdown=60)
+
+
 @shared_task(max_retries=3, bind=True)
 def notify_new_payment(self, payment_id):
     """
@@ -44,13 +91,13 @@ def notify_new_payment(self, payment_id):
             f"Payment ID: {payment.id}\n"
             f"Borrowing ID: {payment.borrowing.id}\n"
             f"User: {payment.borrowing.user.email}\n"
-            f"Book: {payment.borrowing.book.title}\n"
+            f"Book: {payment_books(payment)}\n"
             f"Amount to Pay: ${payment.money_to_pay}\n"
             f"Type: {payment.type}\n"
             f"Status: {payment.status}\n"
         )
 
-        success = send_telegram_message(message)
+        success = queue_notification(message)
         if not success:
             logger.error(f"Failed to send notification for payment {payment.id}")
             raise Exception("Failed to send Telegram notification")
@@ -83,14 +130,14 @@ def notify_successful_payment(self, payment_id):
             f"Payment ID: {payment.id}\n"
             f"Borrowing ID: {payment.borrowing.id}\n"
             f"User: {payment.borrowing.user.email}\n"
-            f"Book: {payment.borrowing.book.title}\n"
+            f"Book: {payment_books(payment)}\n"
             f"Amount Paid: ${payment.money_to_pay}\n"
             f"Type: {payment.type}\n"
             f"Status: {payment.status}\n"
             f"Payment Date: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}"
         )
 
-        success = send_telegram_message(message)
+        success = queue_notification(message)
         if not success:
             logger.error(
                 f"Failed to send notification for successful payment {payment.id}"
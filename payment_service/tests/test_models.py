@@ -3,6 +3,7 @@ from decimal import Decimal
 from django.core.exceptions import ValidationError
 from django.utils import timezone
 
+from django.db import connection, transaction
 from django.test import TestCase
 
 from django.contrib.auth import get_user_model
@@ -10,6 +11,7 @@ from django.contrib.auth import get_user_model
 from book_service.models import Book
 from borrowing_service.models import Borrowing
 from payment_service.models import Payment
+from payment_service.utils import expired_sessions
 
 User = get_user_model()
 
@@ -86,3 +88,40 @@ class PaymentModelTest(TestCase):
             payment.save()
 
         self.assertEqual(Payment.objects.count(), 0)
+
+
+class PaymentIndexUsageTest(TestCase):
+    def setUp(self):
+        user = User.objects.create_user(email="index@test.com", password="testpass")
+        book = Book.objects.create(
+            title="Index Book",
+            author="Index Author",
+            cover=Book.CoverType.HARD,
+            inventory=5,
+            daily_fee=1.00,
+        )
+        borrowing = Borrowing.objects.create(
+            user=user,
+            book=book,
+            expected_return_date=timezone.now().date() + timezone.timedelta(days=7),
+        )
+        for hours in range(-5, 5):
+            Payment.objects.create(
+                borrowing=borrowing,
+                session_id=f"cs_test_{hours}",
+                session_expires_at=timezone.now() + timezone.timedelta(hours=hours),
+                money_to_pay=Decimal("7.00"),
+                status=Payment.Status.PENDING if hours % 2 else Payment.Status.PAID,
+            )
+
+    def test_expired_sessions_use_index(self):
+        _, payments = expired_sessions()
+
+        with transaction.atomic():
+            if connection.vendor == "postgresql":
+                # tiny test tables are cheaper to scan than to read by index
+                with connection.cursor() as cursor:
+                    cursor.execute("SET LOCAL enable_seqscan = off")
+            plan = payments.order_by("session_expires_at", "pk").values("pk").explain()
+
+        self.assertIn("payment_pending_expiry_idx", plan)
@@ -4,11 +4,13 @@ from decimal import Decimal
 from django.test import TestCase
 from django.contrib.auth import get_user_model
 from django.utils import timezone
+from rest_framework.renderers import JSONRenderer
 
 from book_service.models import Book
 from payment_service.models import Payment
 from borrowing_service.models import Borrowing
-from payment_service.serializers import PaymentSerializer
+from payment_service.serializers import PaymentSerializer, PaymentListSerializer
+from core.projections import FlatProjection
 
 
 class PaymentSerializerTest(TestCase):
@@ -53,3 +55,53 @@ class PaymentSerializerTest(TestCase):
         serializer = PaymentSerializer(instance=self.payment)
         self.assertEqual(serializer.data["status"], Payment.Status.PENDING)
         self.assertEqual(serializer.data["type"], Payment.Type.PAYMENT)
+
+    def test_list_serializer_prefetch_plan(self):
+        select_related, prefetch_related = PaymentListSerializer.get_prefetch_plan()
+        # built once per serializer class, not on every request
+        self.assertIs(prefetch_related, PaymentListSerializer.get_prefetch_plan()[1])
+
+        self.assertEqual(
+            set(select_related), {"borrowing", "borrowing__book", "borrowing__user"}
+        )
+        self.assertEqual(
+            [prefetch.prefetch_to for prefetch in prefetch_related],
+            ["borrowing__payment", "borrowing__cart_payments"],
+        )
+
+        deferred = prefetch_related[0].queryset.query.deferred_loading
+        self.assertEqual(
+            deferred,
+            (
+                {
+                    "id",
+                    "borrowing",
+                    "status",
+                    "type",
+                    "money_to_pay",
+                    "session_url",
+                    "session_id",
+                },
+                False,
+            ),
+        )
+
+    def test_flat_projection_renders_same_json_as_list_serializer(self):
+        fine = Payment.objects.create(
+            borrowing=self.borrowing,
+            session_id="fine",
+            money_to_pay=Decimal("2.5"),
+            type=Payment.Type.FINE,
+        )
+        fine.borrowings.add(self.borrowing)
+        queryset = PaymentListSerializer.setup_eager_loading(Payment.objects.all())
+        projection = FlatProjection(PaymentListSerializer)
+
+        with self.assertNumQueries(3):
+            rendered = JSONRenderer().render(
+                projection.render(projection.values(queryset))
+            )
+        self.assertEqual(
+            rendered,
+            JSONRenderer().render(PaymentListSerializer(queryset, many=True).data),
+        )
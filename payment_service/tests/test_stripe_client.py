@@ -0,0 +1,83 @@
+from unittest.mock import MagicMock, patch
+
+import stripe
+from django.test import SimpleTestCase, override_settings
+
+from payment_service.stripe_client import CircuitOpenError, StripeCheckoutClient
+
+
+@override_settings(
+    STRIPE_SECRET_KEY="sk_test_mock_key",
+    STRIPE_API_BASE="http://127.0.0.1:12111",
+    STRIPE_CIRCUIT_FAILURE_THRESHOLD=2,
+    STRIPE_CIRCUIT_RESET_TIMEOUT=30,
+)
+class StripeCheckoutClientTest(SimpleTestCase):
+    def setUp(self):
+        self.client = StripeCheckoutClient()
+        self.create = MagicMock(return_value={"id": "cs_test_1"})
+        self.client.client = MagicMock()
+        self.client.client.checkout.sessions.create = self.create
+
+        self.now = 1000.0
+        patcher = patch(
+            "payment_service.stripe_client.time.monotonic", lambda: self.now
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def fail_with(self, error):
+        self.create.side_effect = error
+        with self.assertRaises(type(error)):
+            self.client.create_checkout_session({})
+
+    def test_client_is_configured_from_settings(self):
+        client = StripeCheckoutClient().client
+        self.assertEqual(client._requestor.api_key, "sk_test_mock_key")
+        self.assertEqual(
+            client._requestor.base_addresses["api"], "http://127.0.0.1:12111"
+        )
+
+    def test_circuit_opens_after_consecutive_failures(self):
+        self.fail_with(stripe.error.APIConnectionError("timed out"))
+        self.fail_with(stripe.error.APIError("server error"))
+        self.assertEqual(self.create.call_count, 2)
+
+        self.create.side_effect = None
+        with self.assertRaises(CircuitOpenError):
+            self.client.create_checkout_session({})
+        self.assertEqual(self.create.call_count, 2)
+
+    def test_request_errors_do_not_open_the_circuit(self):
+        for _ in range(3):
+            self.fail_with(stripe.error.InvalidRequestError("bad", "amount"))
+
+        self.create.side_effect = None
+        self.assertEqual(self.client.create_checkout_session({}), {"id": "cs_test_1"})
+
+    def test_success_resets_failure_count(self):
+        self.fail_with(stripe.error.APIConnectionError("timed out"))
+        self.create.side_effect = None
+        self.client.create_checkout_session({})
+        self.fail_with(stripe.error.APIConnectionError("timed out"))
+
+        self.create.side_effect = None
+        self.client.create_checkout_session({})
+        self.assertEqual(self.create.call_count, 4)
+
+    def test_trial_call_after_reset_timeout(self):
+        for _ in range(2):
+            self.fail_with(stripe.error.APIConnectionError("timed out"))
+
+        # a failed trial opens the circuit again
+        self.now += 30
+        self.fail_with(stripe.error.APIConnectionError("timed out"))
+        with self.assertRaises(CircuitOpenError):
+            self.client.create_checkout_session({})
+
+        # a successful one closes it
+        self.now += 30
+        self.create.side_effect = None
+        self.client.create_checkout_session({})
+        self.client.create_checkout_session({})
+        self.assertEqual(self.create.call_count, 5)
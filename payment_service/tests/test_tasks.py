@@ -1,12 +1,16 @@
 from django.contrib.auth import get_user_model
-from django.test import TestCase
+from django.test import TestCase, override_settings
+from django.utils import timezone
 from unittest.mock import patch, Mock
+from notifications_service.models import OutboxMessage
 from payment_service.tasks import (
     expire_payments,
     notify_new_payment,
     notify_successful_payment,
+    process_stripe_events,
+    prune_processed_stripe_events,
 )
-from payment_service.models import Payment
+from payment_service.models import Payment, StripeEvent
 from borrowing_service.models import Borrowing
 from book_service.models import Book
 from datetime import datetime, timedelta
@@ -121,6 +125,113 @@ class ExpirePaymentsTestCase(TestCase):
         self.mock_expired_sessions.assert_called_once()
 
 
+class ProcessStripeEventsTestCase(TestCase):
+    def setUp(self):
+        user = User.objects.create(email="testuser@example.com", password="x")
+        book = Book.objects.create(title="Test Book", inventory=10, daily_fee=1.50)
+        borrowing = Borrowing.objects.create(
+            user=user,
+            book=book,
+            expected_return_date=datetime.now().date() + timedelta(days=7),
+        )
+        self.payments = {
+            session_id: Payment.objects.create(
+                borrowing=borrowing,
+                session_id=session_id,
+                money_to_pay=10,
+                status=payment_status,
+            )
+            for session_id, payment_status in (
+                ("cs_paid", Payment.Status.PENDING),
+                ("cs_expired_then_paid", Payment.Status.EXPIRED),
+                ("cs_expired", Payment.Status.PENDING),
+                ("cs_paid_then_expired", Payment.Status.PENDING),
+                ("cs_unpaid", Payment.Status.PENDING),
+            )
+        }
+
+    def add_event(self, event_type, session_id, payment_status="paid"):
+        StripeEvent.objects.create(
+            event_id=f"evt_{StripeEvent.objects.count()}",
+            type=event_type,
+            session_id=session_id,
+            payment_status=payment_status,
+        )
+
+    @override_settings(STRIPE_EVENTS_BATCH_SIZE=2)
+    def test_process_stripe_events(self):
+        completed = StripeEvent.Type.SESSION_COMPLETED
+        expired = StripeEvent.Type.SESSION_EXPIRED
+        self.add_event(completed, "cs_paid")
+        self.add_event(completed, "cs_expired_then_paid")
+        self.add_event(expired, "cs_expired", payment_status="unpaid")
+        self.add_event(completed, "cs_paid_then_expired")
+        self.add_event(expired, "cs_paid_then_expired", payment_status="unpaid")
+        self.add_event(completed, "cs_unpaid", payment_status="unpaid")
+        self.add_event(completed, "cs_unknown")
+
+        process_stripe_events()
+
+        statuses = {
+            session_id: Payment.objects.get(pk=payment.pk).status
+            for session_id, payment in self.payments.items()
+        }
+        self.assertEqual(
+            statuses,
+            {
+                "cs_paid": Payment.Status.PAID,
+                "cs_expired_then_paid": Payment.Status.PAID,
+                "cs_expired": Payment.Status.EXPIRED,
+                "cs_paid_then_expired": Payment.Status.PAID,
+                "cs_unpaid": Payment.Status.PENDING,
+            },
+        )
+        self.assertFalse(StripeEvent.objects.filter(processed_at__isnull=True).exists())
+        self.assertEqual(
+            sorted(
+                OutboxMessage.objects.filter(
+                    task_name=notify_successful_payment.name
+                ).values_list("args", flat=True)
+            ),
+            sorted(
+                [self.payments[session_id].id]
+                for session_id in (
+                    "cs_paid",
+                    "cs_expired_then_paid",
+                    "cs_paid_then_expired",
+                )
+            ),
+        )
+
+        # another event of a paid session doesn't notify again
+        self.add_event(completed, "cs_paid")
+        process_stripe_events()
+        self.assertEqual(
+            OutboxMessage.objects.filter(
+                task_name=notify_successful_payment.name
+            ).count(),
+            3,
+        )
+
+    @override_settings(STRIPE_EVENTS_RETENTION=3600)
+    def test_prune_processed_stripe_events(self):
+        completed = StripeEvent.Type.SESSION_COMPLETED
+        for session_id in ("cs_old", "cs_recent", "cs_pending"):
+            self.add_event(completed, session_id)
+        now = timezone.now()
+        StripeEvent.objects.filter(session_id="cs_old").update(
+            processed_at=now - timedelta(hours=2)
+        )
+        StripeEvent.objects.filter(session_id="cs_recent").update(processed_at=now)
+
+        prune_processed_stripe_events()
+
+        self.assertEqual(
+            list(StripeEvent.objects.values_list("session_id", flat=True)),
+            ["cs_recent", "cs_pending"],
+        )
+
+
 class NotifyNewPaymentTestCase(TestCase):
     def setUp(self):
         self.user = User.objects.create(
@@ -151,7 +262,7 @@ class NotifyNewPaymentTestCase(TestCase):
 
         self.mock_send_telegram = Mock(return_value=True)
         self.patcher_send_telegram = patch(
-            "payment_service.tasks.send_telegram_message", new=self.mock_send_telegram
+            "payment_service.tasks.queue_notification", new=self.mock_send_telegram
         )
         self.patcher_send_telegram.start()
 
@@ -236,7 +347,7 @@ class NotifySuccessfulPaymentTestCase(TestCase):
             type=Payment.Type.PAYMENT,
         )
 
-    @patch("payment_service.tasks.send_telegram_message")
+    @patch("payment_service.tasks.queue_notification")
     def test_notify_successful_payment_success(self, mock_send_telegram):
         mock_send_telegram.return_value = True
 
@@ -256,20 +367,20 @@ class NotifySuccessfulPaymentTestCase(TestCase):
 
         mock_send_telegram.assert_called_once_with(expected_message)
 
-    @patch("payment_service.tasks.send_telegram_message")
+    @patch("payment_service.tasks.queue_notification")
     def test_notify_successful_payment_status_not_paid(self, mock_send_telegram):
         mock_send_telegram.return_value = True
         result = notify_successful_payment(self.payment_pending.id)
         mock_send_telegram.assert_not_called()
 
-    @patch("payment_service.tasks.send_telegram_message")
+    @patch("payment_service.tasks.queue_notification")
     def test_notify_successful_payment_payment_not_found(self, mock_send_telegram):
         mock_send_telegram.return_value = True
 
         with self.assertRaises(Exception):
             notify_successful_payment(999)
 
-    @patch("payment_service.tasks.send_telegram_message")
+    @patch("payment_service.tasks.queue_notification")
     def test_notify_successful_payment_send_failed(self, mock_send_telegram):
         mock_send_telegram.return_value = False
 
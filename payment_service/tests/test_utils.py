@@ -1,5 +1,5 @@
 import unittest
-from unittest.mock import patch, MagicMock
+from unittest.mock import ANY, patch, MagicMock
 from datetime import datetime, timedelta, timezone as datetime_timezone
 from decimal import Decimal
 from django.utils import timezone
@@ -7,7 +7,13 @@ from django.test import TestCase, RequestFactory
 from payment_service.models import Payment
 from borrowing_service.models import Borrowing
 from book_service.models import Book
-from payment_service.utils import expired_sessions, create_payment_session
+from payment_service.utils import (
+    expired_sessions,
+    expire_pending_payments,
+    create_pending_payment,
+    attach_checkout_session,
+    create_cart_payment,
+)
 import stripe
 
 from user.models import User
@@ -112,124 +118,237 @@ class TestUtils(TestCase):
         # No expired payments should be returned
         self.assertEqual(expired_payments.count(), 0)
 
-    @patch("payment_service.utils.create_stripe_session")
-    @patch("payment_service.utils.Payment.objects.create")
-    def test_create_payment_session(self, mock_create, mock_stripe_session):
+    def test_expire_pending_payments_in_batches(self):
         """
-        Test for the create_payment_session function.
-        Checks if the function correctly creates a payment session and payment.
+        Test for the expire_pending_payments function.
+        Each batch is a single UPDATE returning the expired IDs.
         """
         # Arrange
-        borrowing = MagicMock()
-        borrowing.book.daily_fee = Decimal("10.00")
-        borrowing.expected_return_date = self.current_time + timedelta(days=5)
-        borrowing.borrow_date = self.current_time
-        borrowing.book.title = "Test Book"
-        request = self.factory.get("/fake-path/")
-
-        # Create a datetime with timezone for comparison
-        expected_expires_at = datetime.fromtimestamp(
-            self.future_time.timestamp(), tz=datetime_timezone.utc
+        more_expired = [
+            Payment.objects.create(
+                borrowing=self.borrowing,
+                status=Payment.Status.PENDING,
+                type=Payment.Type.PAYMENT,
+                money_to_pay=Decimal("10.00"),
+                session_id=f"expired_session_{index}",
+                session_expires_at=self.past_time,
+            )
+            for index in range(4)
+        ]
+        expected_ids = sorted(
+            [self.payment_expired.id] + [payment.id for payment in more_expired]
         )
+        Payment.objects.update(updated_at=self.past_time)
+        _, payments = expired_sessions()
 
-        # Mock Stripe session
-        mock_stripe_session.return_value = MagicMock(
-            id="test_session_id",
-            expires_at=self.future_time.timestamp(),
-            url="http://stripe.com/session",
+        # Act
+        with self.assertNumQueries(3):
+            batches = list(expire_pending_payments(payments, batch_size=2))
+
+        # Assert
+        self.assertEqual(
+            batches, [expected_ids[:2], expected_ids[2:4], expected_ids[4:]]
         )
-        mock_create.return_value = MagicMock()
+        self.assertEqual(
+            set(
+                Payment.objects.filter(status=Payment.Status.EXPIRED).values_list(
+                    "id", flat=True
+                )
+            ),
+            set(expected_ids),
+        )
+        # set by the raw UPDATE, which bypasses auto_now
+        self.assertFalse(
+            Payment.objects.filter(
+                pk__in=expected_ids, updated_at__lt=self.current_time
+            ).exists()
+        )
+        self.payment_active.refresh_from_db()
+        self.assertEqual(self.payment_active.status, Payment.Status.PENDING)
+        self.payment_paid.refresh_from_db()
+        self.assertEqual(self.payment_paid.status, Payment.Status.PAID)
 
+    def test_expire_pending_payments_skips_paid_payments(self):
+        """
+        Payments paid after the sweep started are not expired.
+        """
         # Act
-        payment, session_url = create_payment_session(borrowing, request)
+        batches = expire_pending_payments(
+            Payment.objects.filter(session_expires_at__lt=self.current_time),
+            batch_size=10,
+        )
 
         # Assert
-        mock_stripe_session.assert_called_once()
-        mock_create.assert_called_once_with(
-            borrowing=borrowing,
-            status=Payment.Status.PENDING,
-            type=Payment.Type.PAYMENT,
-            money_to_pay=Decimal("50.00"),
-            session_id="test_session_id",
-            session_expires_at=expected_expires_at,
-            session_url="http://stripe.com/session",
-        )
-        self.assertIsNotNone(payment)
-        self.assertEqual(session_url, "http://stripe.com/session")
+        self.assertEqual(list(batches), [[self.payment_expired.id]])
+        self.payment_paid.refresh_from_db()
+        self.assertEqual(self.payment_paid.status, Payment.Status.PAID)
 
-    @patch("payment_service.utils.create_stripe_session")
-    def test_create_payment_session_stripe_error(self, mock_stripe_session):
+    def test_expire_pending_payments_empty_queryset(self):
         """
-        Test for the create_payment_session function with a Stripe error.
+        Test for the expire_pending_payments function without payments.
         """
-        # Arrange
-        borrowing = MagicMock()
-        borrowing.book.daily_fee = Decimal("10.00")
-        borrowing.expected_return_date = self.current_time + timedelta(days=5)
-        borrowing.borrow_date = self.current_time
-        borrowing.book.title = "Test Book"
-        request = self.factory.get("/fake-path/")
+        # Act
+        with self.assertNumQueries(0):
+            batches = list(expire_pending_payments(Payment.objects.none(), 10))
 
-        # Mock Stripe exception
-        mock_stripe_session.side_effect = stripe.error.StripeError("Stripe error")
+        # Assert
+        self.assertEqual(batches, [])
 
-        # Act & Assert
-        with self.assertRaises(stripe.error.StripeError):
-            create_payment_session(borrowing, request)
+    def test_create_pending_payment(self):
+        """
+        Test for the create_pending_payment function.
+        Checks that the payment is created without a Stripe session.
+        """
+        # Act
+        payment = create_pending_payment(self.borrowing)
 
-    def test_create_payment_session_invalid_payment_type(self):
+        # Assert
+        payment.refresh_from_db()
+        self.assertEqual(payment.borrowing, self.borrowing)
+        self.assertEqual(payment.status, Payment.Status.PENDING)
+        self.assertEqual(payment.type, Payment.Type.PAYMENT)
+        self.assertEqual(payment.money_to_pay, Decimal("7.00"))
+        self.assertEqual(payment.session_id, "")
+        self.assertEqual(payment.session_url, "")
+        # left pending until a session is opened, e.g. with lazy checkout
+        self.assertGreater(payment.session_expires_at, timezone.now())
+        self.assertNotIn(payment, expired_sessions()[1])
+
+    def test_create_pending_payment_invalid_payment_type(self):
         """
-        Test for the create_payment_session function with an invalid payment type.
+        Test for the create_pending_payment function with an invalid payment type.
         """
         # Arrange
         borrowing = MagicMock()
-        request = self.factory.get("/fake-path/")
 
         # Act & Assert
         with self.assertRaises(ValueError) as context:
-            create_payment_session(borrowing, request, payment_type="INVALID_TYPE")
+            create_pending_payment(borrowing, payment_type="INVALID_TYPE")
         self.assertEqual(str(context.exception), "Invalid payment type: INVALID_TYPE")
 
-    @patch("payment_service.utils.create_stripe_session")
     @patch("payment_service.utils.Payment.objects.create")
-    def test_create_payment_session_zero_amount(self, mock_create, mock_stripe_session):
+    def test_create_pending_payment_zero_amount(self, mock_create):
         """
-        Test for the create_payment_session function with a zero payment amount.
+        Test for the create_pending_payment function with a zero payment amount.
         """
         # Arrange
         borrowing = MagicMock()
         borrowing.book.daily_fee = Decimal("0.00")  # Zero amount
         borrowing.expected_return_date = self.current_time + timedelta(days=5)
         borrowing.borrow_date = self.current_time
-        borrowing.book.title = "Test Book"
-        request = self.factory.get("/fake-path/")
-
-        # Mock Stripe session
-        mock_stripe_session.return_value = MagicMock(
-            id="test_session_id",
-            expires_at=self.future_time.timestamp(),
-            url="http://stripe.com/session",
-        )
         mock_create.return_value = MagicMock()
 
         # Act
-        payment, session_url = create_payment_session(borrowing, request)
+        payment = create_pending_payment(borrowing)
 
         # Assert
-        mock_stripe_session.assert_called_once()
         mock_create.assert_called_once_with(
             borrowing=borrowing,
             status=Payment.Status.PENDING,
             type=Payment.Type.PAYMENT,
             money_to_pay=Decimal("0.00"),  # Zero amount
-            session_id="test_session_id",
-            session_expires_at=datetime.fromtimestamp(
-                self.future_time.timestamp(), tz=datetime_timezone.utc
-            ),
-            session_url="http://stripe.com/session",
+            session_expires_at=ANY,
         )
         self.assertIsNotNone(payment)
+
+    @patch("payment_service.utils.create_stripe_session")
+    def test_attach_checkout_session(self, mock_stripe_session):
+        """
+        Test for the attach_checkout_session function.
+        Checks that the Stripe session is stored on the payment.
+        """
+        # Arrange
+        payment = create_pending_payment(self.borrowing)
+        request = self.factory.get("/fake-path/")
+        expected_expires_at = datetime.fromtimestamp(
+            int(self.future_time.timestamp()), tz=datetime_timezone.utc
+        )
+
+        # Mock Stripe session
+        mock_stripe_session.return_value = MagicMock(
+            id="test_session_id",
+            expires_at=int(self.future_time.timestamp()),
+            url="http://stripe.com/session",
+        )
+
+        # Act
+        session_url = attach_checkout_session(payment, request)
+
+        # Assert
+        mock_stripe_session.assert_called_once_with(
+            "Book rental: Test Book",
+            Decimal("7.00"),
+            "http://testserver/api/payments/success/?session_id={CHECKOUT_SESSION_ID}",
+            "http://testserver/api/payments/cancel/",
+        )
         self.assertEqual(session_url, "http://stripe.com/session")
+        payment.refresh_from_db()
+        self.assertEqual(payment.session_id, "test_session_id")
+        self.assertEqual(payment.session_url, "http://stripe.com/session")
+        self.assertEqual(payment.session_expires_at, expected_expires_at)
+        self.assertEqual(payment.status, Payment.Status.PENDING)
+
+    @patch("payment_service.utils.create_stripe_session")
+    def test_attach_checkout_session_stripe_error(self, mock_stripe_session):
+        """
+        Test for the attach_checkout_session function with a Stripe error.
+        The payment stays pending, so it can be opened from the checkout
+        endpoint later and still blocks new borrowings.
+        """
+        # Arrange
+        payment = create_pending_payment(self.borrowing)
+        request = self.factory.get("/fake-path/")
+
+        # Mock Stripe exception
+        mock_stripe_session.side_effect = stripe.error.StripeError("Stripe error")
+
+        # Act
+        session_url = attach_checkout_session(payment, request)
+
+        # Assert
+        self.assertIsNone(session_url)
+        payment.refresh_from_db()
+        self.assertEqual(payment.status, Payment.Status.PENDING)
+        self.assertEqual(payment.session_id, "")
+
+    @patch("payment_service.utils.create_stripe_cart_session")
+    def test_attach_checkout_session_cart(self, mock_cart_session):
+        """
+        A cart payment gets one Checkout Session with a line item per book.
+        """
+        # Arrange
+        other_book = Book.objects.create(
+            title="Other Book",
+            author="Test Author",
+            cover=Book.CoverType.SOFT,
+            inventory=5,
+            daily_fee=Decimal("2.00"),
+        )
+        other = Borrowing.objects.create(
+            user=self.user,
+            book=other_book,
+            expected_return_date=self.borrowing.expected_return_date,
+        )
+        payment = create_cart_payment([self.borrowing, other])
+        mock_cart_session.return_value = MagicMock(
+            id="cart_session", url="http://cart.url", expires_at=2000000000
+        )
+        request = self.factory.get("/")
+
+        # Act
+        session_url = attach_checkout_session(payment, request)
+
+        # Assert
+        self.assertEqual(session_url, "http://cart.url")
+        self.assertEqual(payment.money_to_pay, Decimal("7.00") + Decimal("14.00"))
+        line_items = mock_cart_session.call_args.args[0]
+        self.assertEqual(
+            line_items,
+            [
+                ("Book rental: Test Book", Decimal("7.00")),
+                ("Book rental: Other Book", Decimal("14.00")),
+            ],
+        )
 
 
 if __name__ == "__main__":
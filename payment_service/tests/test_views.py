@@ -1,14 +1,28 @@
+from asgiref.sync import sync_to_async
+from django.core.cache import cache
+from django.test import AsyncRequestFactory, TestCase, override_settings
 from django.urls import reverse
 from django.utils import timezone
 from django.contrib.auth import get_user_model
 from rest_framework import status
 from rest_framework.test import APITestCase, APIClient
-from unittest.mock import patch
+from rest_framework.throttling import BaseThrottle
+from rest_framework_simplejwt.tokens import RefreshToken
+from unittest.mock import AsyncMock, MagicMock, patch
 from datetime import timedelta
+from decimal import Decimal
+import hashlib
+import hmac
+import json
 import time
 import stripe
 
-from payment_service.models import Payment
+from payment_service.models import Payment, StripeEvent
+from payment_service.views import (
+    AsyncCheckoutPaymentView,
+    AsyncRenewStripeSessionView,
+    ListPaymentView,
+)
 from borrowing_service.models import Borrowing
 from book_service.models import Book
 
@@ -88,11 +102,10 @@ class PaymentViewsTestCase(APITestCase):
         response = self.client.get(url)
         self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
 
-    @patch("payment_service.views.notify_successful_payment")
     @patch("stripe.checkout.Session.retrieve")
-    def test_success_payment_paid(self, mock_stripe_retrieve, mock_notify):
-        stripe_response = type("obj", (object,), {"payment_status": "paid"})
-        mock_stripe_retrieve.return_value = stripe_response
+    def test_success_payment_paid(self, mock_stripe_retrieve):
+        self.payment.status = Payment.Status.PAID
+        self.payment.save()
 
         self.client.force_authenticate(user=self.user)
         url = (
@@ -101,10 +114,9 @@ class PaymentViewsTestCase(APITestCase):
         )
         response = self.client.post(url, data={})
         self.assertEqual(response.status_code, status.HTTP_200_OK)
-
-        self.payment.refresh_from_db()
-        self.assertEqual(self.payment.status, Payment.Status.PAID)
-        mock_notify.assert_called_once_with(self.payment.id)
+        self.assertEqual(response.data["message"], "Payment successful")
+        self.assertEqual(response.data["payment"]["id"], self.payment.id)
+        mock_stripe_retrieve.assert_not_called()
 
     def test_success_payment_missing_session_id(self):
         self.client.force_authenticate(user=self.user)
@@ -115,9 +127,6 @@ class PaymentViewsTestCase(APITestCase):
 
     @patch("stripe.checkout.Session.retrieve")
     def test_success_payment_not_paid(self, mock_stripe_retrieve):
-        stripe_response = type("obj", (object,), {"payment_status": "unpaid"})
-        mock_stripe_retrieve.return_value = stripe_response
-
         self.client.force_authenticate(user=self.user)
         url = (
             reverse("payment_service:payment-success")
@@ -126,6 +135,8 @@ class PaymentViewsTestCase(APITestCase):
         response = self.client.post(url, data={})
         self.assertEqual(response.status_code, status.HTTP_200_OK)
         self.assertIn("Payment not completed", response.data.get("message", ""))
+        self.assertEqual(response.data["status"], Payment.Status.PENDING)
+        mock_stripe_retrieve.assert_not_called()
 
     def test_cancel_payment(self):
         self.client.force_authenticate(user=self.user)
@@ -136,7 +147,7 @@ class PaymentViewsTestCase(APITestCase):
             response.data.get("message"), "Payment was canceled. No charges were made."
         )
 
-    @patch("payment_service.views.create_stripe_session")
+    @patch("payment_service.views.create_stripe_cart_session")
     def test_renew_stripe_session_success(self, mock_create_session):
         self.payment.status = Payment.Status.EXPIRED
         self.payment.save()
@@ -159,6 +170,83 @@ class PaymentViewsTestCase(APITestCase):
         self.assertEqual(self.payment.status, Payment.Status.PENDING)
         self.assertIn("Payment session renewed", response.data.get("message", ""))
 
+    @patch("payment_service.views.create_stripe_cart_session")
+    def test_renew_cart_payment_has_line_item_per_book(self, mock_create_session):
+        other_book = Book.objects.create(
+            title="Other Book",
+            author="Author Name",
+            cover="soft",
+            inventory=10,
+            daily_fee=2.00,
+        )
+        other_borrowing = Borrowing.objects.create(
+            expected_return_date=timezone.now().date() + timedelta(days=7),
+            book=other_book,
+            user=self.user,
+        )
+        self.payment.borrowings.add(self.borrowing, other_borrowing)
+        self.payment.status = Payment.Status.EXPIRED
+        self.payment.save()
+        mock_create_session.return_value = {
+            "url": "http://fake.stripe.session.url",
+            "id": "new_session_id_789",
+            "expires_at": int(time.time()) + 3600,
+        }
+
+        self.client.force_authenticate(user=self.user)
+        response = self.client.post(
+            reverse("payment_service:renew"),
+            {"payment_id": self.payment.id},
+            format="json",
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            mock_create_session.call_args.args[0],
+            [
+                ("Book rental: Test Book", Decimal("35.00")),
+                ("Book rental: Other Book", Decimal("14.00")),
+            ],
+        )
+
+    @patch("payment_service.views.create_stripe_cart_session")
+    def test_renew_stripe_session_retry_with_idempotency_key(self, mock_create_session):
+        cache.clear()
+        self.payment.status = Payment.Status.EXPIRED
+        self.payment.save()
+        mock_create_session.return_value = {
+            "url": "http://fake.stripe.session.url",
+            "id": "new_session_id_789",
+            "expires_at": int(time.time()) + 3600,
+        }
+
+        self.client.force_authenticate(user=self.user)
+        url = reverse("payment_service:renew")
+        data = {"payment_id": self.payment.id}
+        responses = [
+            self.client.post(url, data, format="json", HTTP_IDEMPOTENCY_KEY="renew-1")
+            for _ in range(2)
+        ]
+
+        mock_create_session.assert_called_once()
+        self.assertEqual(responses[1].status_code, status.HTTP_200_OK)
+        self.assertEqual(responses[1].data, responses[0].data)
+        self.assertEqual(responses[1]["Idempotent-Replayed"], "true")
+
+    def test_renew_stripe_session_with_idempotency_key_in_progress(self):
+        cache.clear()
+        self.client.force_authenticate(user=self.user)
+        url = reverse("payment_service:renew")
+        cache.add(f"idempotency:{self.user.pk}:POST:{url}:renew-1:lock", True)
+
+        response = self.client.post(
+            url,
+            {"payment_id": self.payment.id},
+            format="json",
+            HTTP_IDEMPOTENCY_KEY="renew-1",
+        )
+        self.assertEqual(response.status_code, status.HTTP_409_CONFLICT)
+
     def test_renew_stripe_session_not_expired(self):
         self.payment.status = Payment.Status.PAID
         self.payment.save()
@@ -166,8 +254,9 @@ class PaymentViewsTestCase(APITestCase):
         url = reverse("payment_service:renew")
         data = {"payment_id": self.payment.id}
         response = self.client.post(url, data, format="json")
-        self.assertEqual(response.status_code, status.HTTP_200_OK)
-        self.assertIn("Payment is not expired", response.data.get("error", ""))
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.data["error"], "Payment is not expired")
+        self.assertEqual(response.data["status"], Payment.Status.PAID)
 
     def test_renew_stripe_session_permission_denied(self):
         other_user = self.User.objects.create_user(
@@ -198,3 +287,477 @@ class PaymentViewsTestCase(APITestCase):
         response = self.client.post(url, data, format="json")
         self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
         self.assertIn("payment_id is required", response.data.get("error", ""))
+
+    def lazy_payment(self):
+        self.payment.session_id = ""
+        self.payment.session_url = ""
+        self.payment.save()
+        return reverse("payment_service:payment-checkout", args=[self.payment.id])
+
+    @patch("payment_service.utils.create_stripe_session")
+    def test_checkout_creates_session_once(self, mock_create_session):
+        url = self.lazy_payment()
+        mock_create_session.return_value = MagicMock(
+            id="lazy_session_1",
+            url="http://fake.stripe.session.url",
+            expires_at=int(time.time()) + 3600,
+        )
+
+        self.client.force_authenticate(user=self.user)
+        first = self.client.post(url)
+        second = self.client.post(url)
+
+        self.assertEqual(first.status_code, status.HTTP_200_OK)
+        self.assertEqual(first.data["session_url"], "http://fake.stripe.session.url")
+        self.assertEqual(second.data, first.data)
+        mock_create_session.assert_called_once()
+        self.payment.refresh_from_db()
+        self.assertEqual(self.payment.session_id, "lazy_session_1")
+        self.assertEqual(self.payment.status, Payment.Status.PENDING)
+
+    @patch("payment_service.utils.create_stripe_session")
+    def test_checkout_retry_with_idempotency_key(self, mock_create_session):
+        cache.clear()
+        url = self.lazy_payment()
+        mock_create_session.return_value = MagicMock(
+            id="lazy_session_1",
+            url="http://fake.stripe.session.url",
+            expires_at=int(time.time()) + 3600,
+        )
+
+        self.client.force_authenticate(user=self.user)
+        first = self.client.post(url, HTTP_IDEMPOTENCY_KEY="checkout-1")
+        # paid meanwhile, the retry still gets the stored response
+        Payment.objects.filter(pk=self.payment.pk).update(status=Payment.Status.PAID)
+        second = self.client.post(url, HTTP_IDEMPOTENCY_KEY="checkout-1")
+
+        self.assertEqual(second.status_code, status.HTTP_200_OK)
+        self.assertEqual(second.data, first.data)
+        self.assertEqual(second["Idempotent-Replayed"], "true")
+        mock_create_session.assert_called_once()
+
+    @patch("payment_service.utils.create_stripe_session")
+    def test_checkout_stripe_error_keeps_payment_pending(self, mock_create_session):
+        url = self.lazy_payment()
+        mock_create_session.side_effect = stripe.error.APIConnectionError("down")
+
+        self.client.force_authenticate(user=self.user)
+        response = self.client.post(url)
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.payment.refresh_from_db()
+        self.assertEqual(self.payment.status, Payment.Status.PENDING)
+        self.assertEqual(self.payment.session_id, "")
+
+    @patch("payment_service.utils.create_stripe_session")
+    def test_checkout_payment_not_pending(self, mock_create_session):
+        url = self.lazy_payment()
+        self.payment.status = Payment.Status.EXPIRED
+        self.payment.save()
+
+        self.client.force_authenticate(user=self.user)
+        response = self.client.post(url)
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        mock_create_session.assert_not_called()
+
+    def test_checkout_permission_denied(self):
+        url = self.lazy_payment()
+        other_user = self.User.objects.create_user(
+            email="other@example.com", password="password"
+        )
+        self.client.force_authenticate(user=other_user)
+        response = self.client.post(url)
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_list_payments_staff_query_count(self):
+        for index in range(4):
+            other_user = self.User.objects.create_user(
+                email=f"listuser{index}@example.com", password="password"
+            )
+            borrowing = Borrowing.objects.create(
+                expected_return_date=timezone.now().date() + timedelta(days=7),
+                book=self.book,
+                user=other_user,
+            )
+            Payment.objects.create(
+                borrowing=borrowing,
+                money_to_pay=10.00,
+                status=Payment.Status.PAID,
+                type=Payment.Type.PAYMENT,
+                session_id=f"list_session_{index}",
+            )
+
+        self.client.force_authenticate(user=self.staff_user)
+        # count + page validators + flat payment rows with borrowing/book/user
+        # + sibling payments + cart payments
+        with self.assertNumQueries(5):
+            response = self.client.get("/api/payments/", HTTP_ACCEPT="application/json")
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data["results"]), 5)
+        for item in response.data["results"]:
+            self.assertEqual(len(item["borrowing"]["payments"]), 1)
+
+        # the flat projection renders what the serializer renders
+        with patch.object(ListPaymentView, "use_flat_projection", return_value=False):
+            expected = self.client.get("/api/payments/", HTTP_ACCEPT="application/json")
+        self.assertEqual(response.content, expected.content)
+
+    def test_detail_payment_conditional_get(self):
+        self.client.force_authenticate(user=self.user)
+        url = f"/api/payments/{self.payment.id}/"
+        response = self.client.get(url, HTTP_ACCEPT="application/json")
+        etag = response["ETag"]
+        self.assertIn("Last-Modified", response)
+
+        # only the validators are queried, nothing is serialized
+        with self.assertNumQueries(1):
+            response = self.client.get(
+                url, HTTP_ACCEPT="application/json", HTTP_IF_NONE_MATCH=etag
+            )
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(response["ETag"], etag)
+
+        self.payment.status = Payment.Status.PAID
+        self.payment.save()
+
+        response = self.client.get(
+            url, HTTP_ACCEPT="application/json", HTTP_IF_NONE_MATCH=etag
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["status"], Payment.Status.PAID)
+        self.assertNotEqual(response["ETag"], etag)
+
+    def test_list_payments_etag_follows_related_changes(self):
+        self.client.force_authenticate(user=self.user)
+        etag = self.client.get("/api/payments/")["ETag"]
+
+        Borrowing.objects.filter(pk=self.borrowing.pk).update(
+            updated_at=timezone.now() + timedelta(seconds=1)
+        )
+
+        response = self.client.get("/api/payments/", HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(response["ETag"], etag)
+
+    def test_list_payments_etag_follows_user_changes(self):
+        self.client.force_authenticate(user=self.staff_user)
+        etag = self.client.get("/api/payments/")["ETag"]
+
+        self.user.email = "renamed@example.com"
+        self.user.save()
+
+        response = self.client.get("/api/payments/", HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            response.data["results"][0]["borrowing"]["user"]["email"],
+            "renamed@example.com",
+        )
+
+    def test_list_payments_etag_reads_requested_page_only(self):
+        now = timezone.now()
+        Payment.objects.filter(pk=self.payment.pk).update(session_expires_at=now)
+        for index in range(5):
+            Payment.objects.create(
+                borrowing=self.borrowing,
+                money_to_pay=10.00,
+                status=Payment.Status.PAID,
+                type=Payment.Type.FINE,
+                session_id=f"page_session_{index}",
+                session_expires_at=now + timedelta(hours=index + 1),
+            )
+
+        self.client.force_authenticate(user=self.user)
+        etag = self.client.get("/api/payments/")["ETag"]
+
+        # the oldest payment is on the second page
+        self.payment.status = Payment.Status.PAID
+        self.payment.save()
+
+        # count + validators of the page rows
+        with self.assertNumQueries(2):
+            response = self.client.get("/api/payments/", HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+        response = self.client.get("/api/payments/?page=2", HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["results"][0]["id"], self.payment.id)
+
+        response = self.client.get("/api/payments/?page=3")
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+        self.assertNotIn("ETag", response)
+
+    def test_detail_payment_of_other_user_has_no_etag(self):
+        other_user = self.User.objects.create_user(
+            email="etag@example.com", password="password"
+        )
+        self.client.force_authenticate(user=other_user)
+        response = self.client.get(f"/api/payments/{self.payment.id}/")
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+        self.assertNotIn("ETag", response)
+
+
+class AsyncPaymentViewsTestCase(TestCase):
+    def setUp(self):
+        self.factory = AsyncRequestFactory()
+        self.user = get_user_model().objects.create_user(
+            email="asyncpayment@example.com", password="password123"
+        )
+        book = Book.objects.create(
+            title="Async Book",
+            author="Author Name",
+            cover="hard",
+            inventory=10,
+            daily_fee=5.00,
+        )
+        borrowing = Borrowing.objects.create(
+            expected_return_date=timezone.now().date() + timedelta(days=7),
+            book=book,
+            user=self.user,
+        )
+        self.payment = Payment.objects.create(
+            borrowing=borrowing,
+            money_to_pay=10.00,
+            status=Payment.Status.PENDING,
+            type=Payment.Type.PAYMENT,
+            session_id="async_session_123",
+        )
+        self.token = str(RefreshToken.for_user(self.user).access_token)
+
+    def post(self, view, url, token=None, **kwargs):
+        return view.as_view()(
+            self.factory.post(
+                url,
+                content_type="application/json",
+                headers={"Authorization": f"Bearer {token or self.token}"},
+                **kwargs,
+            )
+        )
+
+    async def test_renew_stripe_session_requires_authentication(self):
+        response = await AsyncRenewStripeSessionView.as_view()(
+            self.factory.post("/api/payments/renew/")
+        )
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+        self.assertIn("WWW-Authenticate", response)
+
+    @patch("payment_service.views.acreate_stripe_cart_session", new_callable=AsyncMock)
+    async def test_renew_stripe_session_success(self, mock_create_session):
+        await Payment.objects.filter(pk=self.payment.pk).aupdate(
+            status=Payment.Status.EXPIRED
+        )
+        mock_create_session.return_value = {
+            "url": "http://fake.stripe.session.url",
+            "id": "new_session_id_789",
+            "expires_at": int(time.time()) + 3600,
+        }
+
+        response = await self.post(
+            AsyncRenewStripeSessionView,
+            "/api/payments/renew/",
+            data={"payment_id": self.payment.id},
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        await self.payment.arefresh_from_db()
+        self.assertEqual(self.payment.session_id, "new_session_id_789")
+        self.assertEqual(self.payment.status, Payment.Status.PENDING)
+
+    @patch("payment_service.views.acreate_stripe_cart_session", new_callable=AsyncMock)
+    async def test_renew_stripe_session_retry_with_idempotency_key(
+        self, mock_create_session
+    ):
+        await cache.aclear()
+        await Payment.objects.filter(pk=self.payment.pk).aupdate(
+            status=Payment.Status.EXPIRED
+        )
+        mock_create_session.return_value = {
+            "url": "http://fake.stripe.session.url",
+            "id": "new_session_id_789",
+            "expires_at": int(time.time()) + 3600,
+        }
+
+        responses = [
+            await AsyncRenewStripeSessionView.as_view()(
+                self.factory.post(
+                    "/api/payments/renew/",
+                    content_type="application/json",
+                    headers={
+                        "Authorization": f"Bearer {self.token}",
+                        "Idempotency-Key": "renew-1",
+                    },
+                    data={"payment_id": self.payment.id},
+                )
+            )
+            for _ in range(2)
+        ]
+
+        mock_create_session.assert_awaited_once()
+        self.assertEqual(responses[1].status_code, status.HTTP_200_OK)
+        self.assertEqual(responses[1].data, responses[0].data)
+        self.assertEqual(responses[1]["Idempotent-Replayed"], "true")
+
+    async def test_renew_stripe_session_not_expired(self):
+        response = await self.post(
+            AsyncRenewStripeSessionView,
+            "/api/payments/renew/",
+            data={"payment_id": self.payment.id},
+        )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.data["error"], "Payment is not expired")
+
+    async def test_renew_stripe_session_throttled(self):
+        class DenyThrottle(BaseThrottle):
+            def allow_request(self, request, view):
+                return False
+
+        with patch.object(
+            AsyncRenewStripeSessionView, "throttle_classes", [DenyThrottle]
+        ):
+            response = await self.post(
+                AsyncRenewStripeSessionView,
+                "/api/payments/renew/",
+                data={"payment_id": self.payment.id},
+            )
+        self.assertEqual(response.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+
+    async def test_renew_stripe_session_permission_denied(self):
+        other_user = await sync_to_async(get_user_model().objects.create_user)(
+            email="asyncother@example.com", password="password"
+        )
+        await Payment.objects.filter(pk=self.payment.pk).aupdate(
+            status=Payment.Status.EXPIRED
+        )
+
+        response = await self.post(
+            AsyncRenewStripeSessionView,
+            "/api/payments/renew/",
+            token=str(RefreshToken.for_user(other_user).access_token),
+            data={"payment_id": self.payment.id},
+        )
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+    async def checkout(self, token=None, **headers):
+        return await AsyncCheckoutPaymentView.as_view()(
+            self.factory.post(
+                f"/api/payments/{self.payment.id}/checkout/",
+                headers={"Authorization": f"Bearer {token or self.token}", **headers},
+            ),
+            pk=self.payment.id,
+        )
+
+    @patch("payment_service.utils.acreate_stripe_cart_session", new_callable=AsyncMock)
+    async def test_checkout_creates_session_once(self, mock_create_session):
+        await cache.aclear()
+        await Payment.objects.filter(pk=self.payment.pk).aupdate(session_id="")
+        mock_create_session.return_value = MagicMock(
+            id="async_lazy_session",
+            url="http://fake.stripe.session.url",
+            expires_at=int(time.time()) + 3600,
+        )
+
+        first = await self.checkout(**{"Idempotency-Key": "checkout-1"})
+        replayed = await self.checkout(**{"Idempotency-Key": "checkout-1"})
+        second = await self.checkout()
+
+        self.assertEqual(first.status_code, status.HTTP_200_OK)
+        self.assertEqual(first.data["session_url"], "http://fake.stripe.session.url")
+        self.assertEqual(replayed["Idempotent-Replayed"], "true")
+        self.assertEqual(second.data, first.data)
+        mock_create_session.assert_awaited_once()
+        self.assertEqual(
+            mock_create_session.call_args.args[0],
+            [("Book rental: Async Book", Decimal("10.00"))],
+        )
+        await self.payment.arefresh_from_db()
+        self.assertEqual(self.payment.session_id, "async_lazy_session")
+        self.assertEqual(self.payment.status, Payment.Status.PENDING)
+
+    @patch("payment_service.utils.acreate_stripe_cart_session", new_callable=AsyncMock)
+    async def test_checkout_stripe_error_keeps_payment_pending(
+        self, mock_create_session
+    ):
+        await Payment.objects.filter(pk=self.payment.pk).aupdate(session_id="")
+        mock_create_session.side_effect = stripe.error.APIConnectionError("down")
+
+        response = await self.checkout()
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        await self.payment.arefresh_from_db()
+        self.assertEqual(self.payment.status, Payment.Status.PENDING)
+        self.assertEqual(self.payment.session_id, "")
+
+    async def test_checkout_payment_not_pending(self):
+        await Payment.objects.filter(pk=self.payment.pk).aupdate(
+            status=Payment.Status.EXPIRED
+        )
+
+        response = await self.checkout()
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.data["status"], Payment.Status.EXPIRED)
+
+    async def test_checkout_permission_denied(self):
+        other_user = await sync_to_async(get_user_model().objects.create_user)(
+            email="asyncother@example.com", password="password"
+        )
+
+        response = await self.checkout(
+            token=str(RefreshToken.for_user(other_user).access_token)
+        )
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+
+@override_settings(STRIPE_WEBHOOK_SECRET="whsec_test")
+class StripeWebhookTestCase(APITestCase):
+    url = "/api/payments/webhook/"
+
+    def event(self, event_id="evt_1", event_type="checkout.session.completed"):
+        return {
+            "id": event_id,
+            "object": "event",
+            "type": event_type,
+            "data": {
+                "object": {
+                    "id": "cs_test_1",
+                    "object": "checkout.session",
+                    "payment_status": "paid",
+                }
+            },
+        }
+
+    def post(self, event, secret="whsec_test"):
+        payload = json.dumps(event)
+        timestamp = int(time.time())
+        signature = hmac.new(
+            secret.encode(), f"{timestamp}.{payload}".encode(), hashlib.sha256
+        ).hexdigest()
+        return self.client.post(
+            self.url,
+            payload,
+            content_type="application/json",
+            HTTP_STRIPE_SIGNATURE=f"t={timestamp},v1={signature}",
+        )
+
+    def test_checkout_session_event_is_stored_once(self):
+        for _ in range(2):
+            response = self.post(self.event())
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        event = StripeEvent.objects.get()
+        self.assertEqual(event.event_id, "evt_1")
+        self.assertEqual(event.type, StripeEvent.Type.SESSION_COMPLETED)
+        self.assertEqual(event.session_id, "cs_test_1")
+        self.assertEqual(event.payment_status, "paid")
+        self.assertIsNone(event.processed_at)
+
+    def test_other_event_types_are_ignored(self):
+        response = self.post(self.event(event_type="customer.created"))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertFalse(StripeEvent.objects.exists())
+
+    def test_invalid_signature(self):
+        response = self.post(self.event(), secret="whsec_other")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertFalse(StripeEvent.objects.exists())
@@ -1,19 +1,33 @@
+from django.conf import settings
 from django.urls import path
 
 from payment_service.views import (
+    AsyncCheckoutPaymentView,
+    AsyncRenewStripeSessionView,
+    CheckoutPaymentView,
     ListPaymentView,
     DetailPaymentView,
     SuccessPaymentView,
     CancelPaymentView,
     RenewStripeSessionView,
+    StripeWebhookView,
 )
 
+if settings.ASYNC_PAYMENT_VIEWS:
+    checkout_view = AsyncCheckoutPaymentView.as_view()
+    renew_view = AsyncRenewStripeSessionView.as_view()
+else:
+    checkout_view = CheckoutPaymentView.as_view()
+    renew_view = RenewStripeSessionView.as_view()
+
 urlpatterns = [
     path("", ListPaymentView.as_view()),
     path("<int:pk>/", DetailPaymentView.as_view()),
+    path("<int:pk>/checkout/", checkout_view, name="payment-checkout"),
     path("success/", SuccessPaymentView.as_view(), name="payment-success"),
     path("cancel/", CancelPaymentView.as_view(), name="payment-cancel"),
-    path("renew/", RenewStripeSessionView.as_view(), name="renew"),
+    path("renew/", renew_view, name="renew"),
+    path("webhook/", StripeWebhookView.as_view(), name="stripe-webhook"),
 ]
 
 app_name = "payment_service"
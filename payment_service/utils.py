@@ -1,13 +1,21 @@
 import datetime
+import logging
+from collections.abc import Iterator
 from decimal import Decimal
 
 import stripe
+from asgiref.sync import sync_to_async
 from django.conf import settings
-from django.db.models import QuerySet
+from django.core.exceptions import EmptyResultSet
+from django.db import connection
+from django.db.models import Q, QuerySet
 from django.urls import reverse
 from django.utils import timezone
 
 from payment_service.models import Payment
+from payment_service.stripe_client import get_stripe_client
+
+logger = logging.getLogger(__name__)
 
 
 def expired_sessions() -> tuple[datetime, QuerySet]:
@@ -20,68 +28,357 @@ def expired_sessions() -> tuple[datetime, QuerySet]:
     )
 
 
-def create_payment_session(borrowing, request, payment_type=Payment.Type.PAYMENT):
+def expire_pending_payments(payments: QuerySet, batch_size: int) -> Iterator[list[int]]:
+    """
+    Sets the status of pending payments from the queryset to expired,
+    walking it in (session_expires_at, id) order one batch at a time,
+    which is the order of the pending payments expiry index.
+
+    Every batch is a single UPDATE ... WHERE id IN (SELECT ... LIMIT n)
+    RETURNING statement committed on its own, so no lock is held
+    on more than batch_size rows at once. The statement bypasses the
+    ORM, so it sets updated_at itself.
+
+    The IDs of each batch are yielded as soon as it is updated, so the
+    caller can act on them without the whole backlog held in memory.
+
+    Args:
+        payments: Payments to expire, e.g. from expired_sessions()
+        batch_size: Maximum number of rows updated by one statement
+
+    Yields:
+        list: IDs of the payments expired by one statement
+    """
+    expires_field = Payment._meta.get_field("session_expires_at")
+    table = connection.ops.quote_name(Payment._meta.db_table)
+    pk = connection.ops.quote_name(Payment._meta.pk.column)
+    status = connection.ops.quote_name(Payment._meta.get_field("status").column)
+    expires_at = connection.ops.quote_name(expires_field.column)
+    updated_field = Payment._meta.get_field("updated_at")
+    updated_at = connection.ops.quote_name(updated_field.column)
+
+    batch = payments.order_by("session_expires_at", "pk").values("pk")
+    while True:
+        try:
+            batch_sql, batch_params = batch[:batch_size].query.sql_with_params()
+        except EmptyResultSet:
+            break
+
+        with connection.cursor() as cursor:
+            # status is checked again, in case the payment got paid meanwhile
+            cursor.execute(
+                f"UPDATE {table} SET {status} = %s, {updated_at} = %s "
+                f"WHERE {status} = %s AND {pk} IN ({batch_sql}) "
+                f"RETURNING {pk}, {expires_at}",
+                [
+                    Payment.Status.EXPIRED,
+                    updated_field.get_db_prep_value(timezone.now(), connection),
+                    Payment.Status.PENDING,
+                    *batch_params,
+                ],
+            )
+            rows = [
+                (_aware_datetime(expires_field.to_python(expires)), payment_id)
+                for payment_id, expires in cursor.fetchall()
+            ]
+
+        if rows:
+            yield sorted(payment_id for _, payment_id in rows)
+        if len(rows) < batch_size:
+            break
+
+        last_expires_at, last_id = max(rows)
+        batch = batch.filter(
+            Q(session_expires_at__gt=last_expires_at)
+            | Q(session_expires_at=last_expires_at, pk__gt=last_id)
+        )
+
+
+def _aware_datetime(value: datetime.datetime) -> datetime.datetime:
+    # SQLite returns naive UTC datetimes to raw cursors
+    if timezone.is_naive(value):
+        return timezone.make_aware(value, datetime.timezone.utc)
+    return value
+
+
+def create_pending_payment(borrowing, payment_type=Payment.Type.PAYMENT) -> Payment:
     """
-    Creates a new Stripe Checkout Session for a borrowing and saves the
-    associated payment record in the database.
+    Creates a pending payment record for a borrowing without a Stripe
+    Checkout Session, so it can be saved in the same transaction as the
+    borrowing. The session is attached later by attach_checkout_session,
+    or by open_checkout_session when the client first asks for it.
+
+    Until then the payment expires PENDING_PAYMENT_TTL seconds
+    after its creation, like a session would.
 
     Args:
         borrowing: The Borrowing object to create a payment for
         payment_type: Type of payment (Payment.Type.PAYMENT or Payment.Type.FINE)
-        request: The request object to generate success/cancel URLs
 
     Returns:
-        tuple: (Payment object, Stripe session URL)
+        Payment: The created payment
     """
 
     if payment_type == Payment.Type.PAYMENT:
-        money_to_pay = Decimal(
-            borrowing.book.daily_fee
-            * (borrowing.expected_return_date - borrowing.borrow_date).days
-        )
-        payment_description = f"Book rental: {borrowing.book.title}"
+        money_to_pay = rental_fee(borrowing)
 
     elif payment_type == Payment.Type.FINE:
         money_to_pay = Decimal(
             borrowing.book.daily_fee
             * (borrowing.actual_return_date - borrowing.expected_return_date).days
         )
-        payment_description = f"Late return fine: {borrowing.book.title}"
     else:
         raise ValueError(f"Invalid payment type: {payment_type}")
 
+    return Payment.objects.create(
+        borrowing=borrowing,
+        status=Payment.Status.PENDING,
+        type=payment_type,
+        money_to_pay=money_to_pay,
+        session_expires_at=timezone.now()
+        + datetime.timedelta(seconds=settings.PENDING_PAYMENT_TTL),
+    )
+
+
+def rental_fee(borrowing) -> Decimal:
+    return Decimal(
+        borrowing.book.daily_fee
+        * (borrowing.expected_return_date - borrowing.borrow_date).days
+    )
+
+
+def create_cart_payment(borrowings: list) -> Payment:
+    """
+    Creates one pending payment for all borrowings of a cart, like
+    create_pending_payment does for a single borrowing. The Checkout
+    Session of the payment has a line item per borrowing.
+
+    Args:
+        borrowings: Saved Borrowing objects of one user, with their books
+
+    Returns:
+        Payment: The created payment
+    """
+    payment = Payment.objects.create(
+        borrowing=borrowings[0],
+        status=Payment.Status.PENDING,
+        type=Payment.Type.PAYMENT,
+        money_to_pay=sum(rental_fee(borrowing) for borrowing in borrowings),
+        session_expires_at=timezone.now()
+        + datetime.timedelta(seconds=settings.PENDING_PAYMENT_TTL),
+    )
+    payment.borrowings.add(*borrowings)
+    return payment
+
+
+def cart_line_items(payment: Payment) -> list[tuple[str, Decimal]]:
+    """
+    Returns:
+        list: (product description, amount) pair per book of a cart
+        payment, empty for the payment of a single borrowing
+    """
+    return [
+        (f"Book rental: {borrowing.book.title}", rental_fee(borrowing))
+        for borrowing in payment.borrowings.select_related("book").order_by("pk")
+    ]
+
+
+def renewal_line_items(payment: Payment) -> list[tuple[str, Decimal]]:
+    """
+    Line items of a new Checkout Session of an expired payment,
+    a line per book of a cart or the whole amount on one line.
+
+    Returns:
+        list: (product description, amount) pairs
+    """
+    return cart_line_items(payment) or [
+        (f"{payment.type} #{payment.id}", payment.money_to_pay)
+    ]
+
+
+def checkout_url(payment: Payment, request) -> str:
+    """
+    Returns:
+        str: URL of the endpoint opening the Checkout Session of the payment
+    """
+    return request.build_absolute_uri(
+        reverse("payment_service:payment-checkout", args=[payment.pk])
+    )
+
+
+def checkout_session_urls(request) -> tuple[str, str]:
+    """
+    Returns:
+        tuple: (success URL, cancel URL) Stripe redirects to after checkout
+    """
     success_url = (
         request.build_absolute_uri(reverse("payment_service:payment-success"))
         + "?session_id={CHECKOUT_SESSION_ID}"
     )
     cancel_url = request.build_absolute_uri(reverse("payment_service:payment-cancel"))
+    return success_url, cancel_url
+
+
+def _checkout_description(payment: Payment) -> str:
+    if payment.type == Payment.Type.PAYMENT:
+        return f"Book rental: {payment.borrowing.book.title}"
+    return f"Late return fine: {payment.borrowing.book.title}"
+
+
+def checkout_line_items(payment: Payment) -> list[tuple[str, Decimal]]:
+    """
+    Line items of the first Checkout Session of a pending payment,
+    a line per book of a cart or the rental or fine of the borrowing.
+
+    Returns:
+        list: (product description, amount) pairs
+    """
+    return cart_line_items(payment) or [
+        (_checkout_description(payment), payment.money_to_pay)
+    ]
+
+
+def _create_checkout_session(payment: Payment, request):
+    success_url, cancel_url = checkout_session_urls(request)
+
+    cart = cart_line_items(payment)
+    if cart:
+        return create_stripe_cart_session(cart, success_url, cancel_url)
+
+    return create_stripe_session(
+        _checkout_description(payment), payment.money_to_pay, success_url, cancel_url
+    )
+
+
+def attach_checkout_session(payment: Payment, request) -> str | None:
+    """
+    Creates a Stripe Checkout Session for a pending payment and stores it
+    on the payment record. Must be called outside of a transaction, so
+    no database locks are held during the Stripe round trip.
+
+    If Stripe fails, the payment is left pending without a session, like
+    a payment created in lazy mode, so it still blocks new borrowings and
+    the client can retry through the checkout endpoint.
+
+    Args:
+        payment: The Payment object created by create_pending_payment
+        request: The request object to generate success/cancel URLs
+
+    Returns:
+        str | None: Stripe session URL, None if the session was not created
+    """
 
     try:
-        checkout_session = create_stripe_session(
-            payment_description, money_to_pay, success_url, cancel_url
-        )
+        checkout_session = _create_checkout_session(payment, request)
     except stripe.error.StripeError as e:
-        raise e
+        logger.error(f"Failed to create Stripe session for payment {payment.id}: {e}")
+        return None
 
-    payment = Payment.objects.create(
-        borrowing=borrowing,
-        status=Payment.Status.PENDING,
-        type=payment_type,
-        money_to_pay=money_to_pay,
+    payment.session_id = checkout_session.id
+    payment.session_url = checkout_session.url
+    payment.session_expires_at = datetime_from_timestamp(checkout_session.expires_at)
+    payment.status = Payment.Status.PENDING
+
+    # the expire_payments sweep may have picked up the placeholder meanwhile,
+    # so the status is written together with the new session
+    Payment.objects.filter(pk=payment.pk).update(
+        session_id=payment.session_id,
+        session_url=payment.session_url,
+        session_expires_at=payment.session_expires_at,
+        status=payment.status,
+        updated_at=timezone.now(),
+    )
+
+    return payment.session_url
+
+
+def open_checkout_session(payment: Payment, request) -> str | None:
+    """
+    Returns the Checkout Session URL of a pending payment, creating the
+    session on the first call for a payment created without one. Like
+    attach_checkout_session, must be called outside of a transaction.
+
+    Concurrent first calls may both create a session, only the first
+    one stored is returned to every caller, the other one expires
+    unused on Stripe.
+
+    Args:
+        payment: A pending Payment object
+        request: The request object to generate success/cancel URLs
+
+    Returns:
+        str | None: Stripe session URL, None if the payment is not pending
+
+    Raises:
+        stripe.error.StripeError: The session could not be created,
+            the payment is left pending without one
+    """
+    if payment.session_id:
+        return payment.session_url
+
+    return store_checkout_session(payment, _create_checkout_session(payment, request))
+
+
+async def aopen_checkout_session(payment: Payment, request) -> str | None:
+    """
+    Same as open_checkout_session, awaiting Stripe over the async client.
+    """
+    if payment.session_id:
+        return payment.session_url
+
+    success_url, cancel_url = checkout_session_urls(request)
+    line_items = await sync_to_async(checkout_line_items)(payment)
+    checkout_session = await acreate_stripe_cart_session(
+        line_items, success_url, cancel_url
+    )
+    return await sync_to_async(store_checkout_session)(payment, checkout_session)
+
+
+def store_checkout_session(payment: Payment, checkout_session) -> str | None:
+    """
+    Stores the first Checkout Session created for a pending payment.
+
+    Returns:
+        str | None: URL of the session stored on the payment, None if
+        the payment is no longer pending
+    """
+    expires_at = datetime_from_timestamp(checkout_session.expires_at)
+
+    # the payment is not locked during the Stripe round trip,
+    # so the session is only stored if none was stored meanwhile
+    stored = Payment.objects.filter(
+        pk=payment.pk, status=Payment.Status.PENDING, session_id=""
+    ).update(
         session_id=checkout_session.id,
-        session_expires_at=datetime_from_timestamp(checkout_session.expires_at),
         session_url=checkout_session.url,
+        session_expires_at=expires_at,
+        updated_at=timezone.now(),
     )
+    if not stored:
+        payment.refresh_from_db()
+        if payment.status != Payment.Status.PENDING:
+            return None
+        return payment.session_url
 
-    return payment, checkout_session.url
+    payment.session_id = checkout_session.id
+    payment.session_url = checkout_session.url
+    payment.session_expires_at = expires_at
+    return payment.session_url
 
 
-def create_stripe_session(product_description, money_to_pay, success_url, cancel_url):
-    stripe.api_key = settings.STRIPE_SECRET_KEY
+def checkout_session_params(line_items: list, success_url, cancel_url) -> dict:
+    """
+    Args:
+        line_items: (product description, amount) pairs
+        success_url: URL Stripe redirects to after the payment
+        cancel_url: URL Stripe redirects to if the payment is canceled
 
-    return stripe.checkout.Session.create(
-        payment_method_types=["card"],
-        line_items=[
+    Returns:
+        dict: Parameters of a Checkout Session with a line item per pair
+    """
+    return {
+        "payment_method_types": ["card"],
+        "line_items": [
             {
                 "price_data": {
                     "currency": "usd",
@@ -91,11 +388,36 @@ def create_stripe_session(product_description, money_to_pay, success_url, cancel
                     "unit_amount": int(money_to_pay * 100),
                 },
                 "quantity": 1,
-            },
+            }
+            for product_description, money_to_pay in line_items
         ],
-        mode="payment",
-        success_url=success_url,
-        cancel_url=cancel_url,
+        "mode": "payment",
+        "success_url": success_url,
+        "cancel_url": cancel_url,
+    }
+
+
+def create_stripe_session(product_description, money_to_pay, success_url, cancel_url):
+    return get_stripe_client().create_checkout_session(
+        checkout_session_params(
+            [(product_description, money_to_pay)], success_url, cancel_url
+        )
+    )
+
+
+def create_stripe_cart_session(line_items: list, success_url, cancel_url):
+    """Same as create_stripe_session, with a line item per (description, amount)."""
+    return get_stripe_client().create_checkout_session(
+        checkout_session_params(line_items, success_url, cancel_url)
+    )
+
+
+async def acreate_stripe_cart_session(line_items: list, success_url, cancel_url):
+    """
+    Same as create_stripe_cart_session, awaiting Stripe over the async client.
+    """
+    return await get_stripe_client().acreate_checkout_session(
+        checkout_session_params(line_items, success_url, cancel_url)
     )
 
 
@@ -1,13 +1,19 @@
 import stripe
+from asgiref.sync import sync_to_async
 from django.conf import settings
 from django.db import transaction
 from django.shortcuts import get_object_or_404
-from django.urls import reverse
-from rest_framework import status, generics
-from rest_framework.permissions import IsAuthenticated
+from rest_framework import exceptions, generics, status
+from rest_framework.permissions import AllowAny, IsAuthenticated
 from rest_framework.response import Response
 from rest_framework.views import APIView
 
+from core.async_views import AsyncAPIView
+from core.conditional import ConditionalGetMixin
+from core.db_routers import ReplicaReadViewMixin
+from core.idempotency import aidempotent, idempotent
+from core.prefetch import PrefetchPlanViewMixin
+from core.projections import FlatListViewMixin
 from payment_service.models import Payment
 from payment_service.schemas import (
     list_payment_schema,
@@ -15,23 +21,138 @@ from payment_service.schemas import (
     cansel_payment_schema,
     renew_stripe_session_schema,
     detail_payment_schema,
+    stripe_webhook_schema,
+    checkout_payment_schema,
 )
 from payment_service.serializers import PaymentSerializer, PaymentListSerializer
-from payment_service.utils import create_stripe_session, datetime_from_timestamp
-from payment_service.tasks import notify_successful_payment
+from payment_service.utils import (
+    acreate_stripe_cart_session,
+    aopen_checkout_session,
+    checkout_session_urls,
+    create_stripe_cart_session,
+    datetime_from_timestamp,
+    open_checkout_session,
+    renewal_line_items,
+)
+from payment_service.webhooks import record_stripe_event
+
+
+def renew_payment_session(payment: Payment, checkout_session) -> None:
+    """Store a new Stripe Checkout Session on an expired payment."""
+    with transaction.atomic():
+        payment.session_url = checkout_session.get("url")
+        payment.session_id = checkout_session.get("id")
+
+        expires_at_timestamp = checkout_session.get("expires_at")
+        expires_at_datetime = datetime_from_timestamp(expires_at_timestamp)
+
+        payment.session_expires_at = expires_at_datetime
+
+        payment.status = Payment.Status.PENDING
+
+        payment.save()
 
 
-stripe.api_key = settings.STRIPE_SECRET_KEY
+def get_renewable_payment(payment_id, user) -> Payment:
+    """
+    Payment whose Checkout Session the user asks to renew, checked the
+    same way for the sync and async renew views.
+
+    Args:
+        payment_id: payment_id from the request body
+        user: user making the request
+
+    Returns:
+        Payment: expired payment of the user, or any one for staff
+
+    Raises:
+        ValidationError: payment_id is missing or the payment isn't expired
+        NotFound: there is no such payment
+        PermissionDenied: the payment belongs to another user
+    """
+    if not payment_id:
+        raise exceptions.ValidationError({"error": "payment_id is required"})
+
+    try:
+        payment = Payment.objects.select_related("borrowing").get(id=payment_id)
+    except (Payment.DoesNotExist, TypeError, ValueError):
+        raise exceptions.NotFound("No Payment matches the given query.")
+
+    if payment.borrowing.user_id != user.id and not user.is_staff:
+        raise exceptions.PermissionDenied(
+            {"error": "You don't have permission to view this payment"}
+        )
+
+    if payment.status != Payment.Status.EXPIRED:
+        raise exceptions.ValidationError(
+            {"error": "Payment is not expired", "status": payment.status}
+        )
+    return payment
+
+
+def get_checkout_payment(pk, user) -> Payment:
+    """
+    Payment whose Checkout Session the user asks for, checked the same
+    way for the sync and async checkout views.
+
+    Args:
+        pk: payment id from the URL
+        user: user making the request
+
+    Returns:
+        Payment: pending payment of the user, or any one for staff
+
+    Raises:
+        NotFound: there is no such payment
+        PermissionDenied: the payment belongs to another user
+        ValidationError: the payment isn't pending
+    """
+    payment = get_object_or_404(
+        Payment.objects.select_related("borrowing__book"), pk=pk
+    )
+
+    if payment.borrowing.user_id != user.id and not user.is_staff:
+        raise exceptions.PermissionDenied(
+            {"error": "You don't have permission to view this payment"}
+        )
+
+    if payment.status != Payment.Status.PENDING:
+        raise exceptions.ValidationError(
+            {"error": "Payment is not pending", "status": payment.status}
+        )
+    return payment
+
+
+def checkout_response(payment: Payment, session_url: str | None) -> Response:
+    if session_url is None:
+        # paid or expired while the session was being created
+        return Response(
+            {"error": "Payment is not pending", "status": payment.status},
+            status=status.HTTP_400_BAD_REQUEST,
+        )
+    return Response({"payment_id": payment.id, "session_url": session_url})
 
 
 @list_payment_schema
-class ListPaymentView(generics.ListAPIView):
+class ListPaymentView(
+    ReplicaReadViewMixin,
+    ConditionalGetMixin,
+    FlatListViewMixin,
+    PrefetchPlanViewMixin,
+    generics.ListAPIView,
+):
     queryset = Payment.objects.all()
     serializer_class = PaymentListSerializer
     permission_classes = (IsAuthenticated,)
+    conditional_fields = (
+        "updated_at",
+        "borrowing__updated_at",
+        "borrowing__book__updated_at",
+        "borrowing__user__updated_at",
+    )
 
     def get_queryset(self):
-        queryset = self.queryset
+        queryset = super().get_queryset()
         if self.request.user.is_staff:
             return queryset
         else:
@@ -39,7 +160,7 @@ class ListPaymentView(generics.ListAPIView):
 
 
 @detail_payment_schema
-class DetailPaymentView(generics.RetrieveAPIView):
+class DetailPaymentView(ConditionalGetMixin, generics.RetrieveAPIView):
     queryset = Payment.objects.all()
     serializer_class = PaymentSerializer
     permission_classes = (IsAuthenticated,)
@@ -54,6 +175,12 @@ class DetailPaymentView(generics.RetrieveAPIView):
 
 @success_payment_schema
 class SuccessPaymentView(APIView):
+    """
+    Status of the payment of a Checkout Session, which Stripe redirects
+    to after checkout. The status is set by the Stripe webhook, so this
+    view only reads the database and never waits on Stripe.
+    """
+
     permission_classes = (IsAuthenticated,)
 
     def post(self, request, *args, **kwargs):
@@ -64,51 +191,97 @@ class SuccessPaymentView(APIView):
                 {"error": "Session ID is required"}, status=status.HTTP_400_BAD_REQUEST
             )
 
+        payment = get_object_or_404(
+            Payment.objects.select_related("borrowing"), session_id=session_id
+        )
+
+        if (
+            payment.borrowing.user_id != request.user.id
+            and not request.user.is_superuser
+        ):
+            return Response(
+                {"error": "You don't have permission to view this payment"},
+                status=status.HTTP_403_FORBIDDEN,
+            )
+
+        if payment.status == Payment.Status.PAID:
+            return Response(
+                {
+                    "message": "Payment successful",
+                    "payment": PaymentSerializer(payment).data,
+                }
+            )
+        return Response({"message": "Payment not completed", "status": payment.status})
+
+
+@checkout_payment_schema
+class CheckoutPaymentView(APIView):
+    """
+    Checkout Session URL of a pending payment. Payments created with
+    STRIPE_LAZY_CHECKOUT have no session until the client asks for it
+    here, the session is created once and returned on later requests.
+    """
+
+    permission_classes = (IsAuthenticated,)
+
+    @idempotent
+    def post(self, request, pk):
+        payment = get_checkout_payment(pk, request.user)
+
         try:
-            payment = get_object_or_404(Payment, session_id=session_id)
-
-            if (
-                payment.borrowing.user.id != request.user.id
-                and not request.user.is_superuser
-            ):
-                return Response(
-                    {"error": "You don't have permission to view this payment"},
-                    status=status.HTTP_403_FORBIDDEN,
-                )
-
-            checkout_session = stripe.checkout.Session.retrieve(session_id)
-
-            if checkout_session.payment_status == "paid":
-                with transaction.atomic():
-                    payment.status = Payment.Status.PAID
-                    payment.save()
-
-                    if payment.type == Payment.Type.PAYMENT:
-                        payment.borrowing.is_active = True
-                        payment.borrowing.save()
-                    elif payment.type == Payment.Type.FINE:
-                        payment.borrowing.is_active = False
-                        payment.borrowing.save()
-
-                notify_successful_payment(payment.id)
-
-                return Response(
-                    {
-                        "message": "Payment successful",
-                        "payment": PaymentSerializer(payment).data,
-                    }
-                )
-            else:
-                return Response(
-                    {
-                        "message": "Payment not completed",
-                        "status": checkout_session.payment_status,
-                    }
-                )
+            session_url = open_checkout_session(payment, request)
+        except stripe.error.StripeError as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
 
+        return checkout_response(payment, session_url)
+
+
+@checkout_payment_schema
+class AsyncCheckoutPaymentView(AsyncAPIView):
+    """
+    CheckoutPaymentView awaiting Stripe instead of blocking a worker,
+    served instead of it when ASYNC_PAYMENT_VIEWS is on.
+    """
+
+    permission_classes = (IsAuthenticated,)
+
+    @aidempotent
+    async def post(self, request, pk):
+        payment = await sync_to_async(get_checkout_payment)(pk, request.user)
+
+        try:
+            session_url = await aopen_checkout_session(payment, request)
         except stripe.error.StripeError as e:
             return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
 
+        return checkout_response(payment, session_url)
+
+
+@stripe_webhook_schema
+class StripeWebhookView(APIView):
+    """
+    Endpoint receiving Checkout Session events from Stripe. Events are
+    stored after the signature is checked and applied to payments
+    by the process_stripe_events task, so Stripe gets its answer
+    without waiting on payment updates.
+    """
+
+    authentication_classes = ()
+    permission_classes = (AllowAny,)
+
+    def post(self, request, *args, **kwargs):
+        try:
+            event = stripe.Webhook.construct_event(
+                request.body,
+                request.headers.get("Stripe-Signature", ""),
+                settings.STRIPE_WEBHOOK_SECRET,
+            )
+        except (ValueError, stripe.error.SignatureVerificationError) as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        record_stripe_event(event)
+        return Response(status=status.HTTP_200_OK)
+
 
 class CancelPaymentView(APIView):
     permission_classes = (IsAuthenticated,)
@@ -122,62 +295,61 @@ class RenewStripeSessionView(APIView):
     permission_classes = (IsAuthenticated,)
 
     @renew_stripe_session_schema
+    @idempotent
     def post(self, request):
-        payment_id = request.data.get("payment_id")
+        payment = get_renewable_payment(request.data.get("payment_id"), request.user)
+        success_url, cancel_url = checkout_session_urls(request)
 
-        if not payment_id:
-            return Response(
-                {
-                    "error": "payment_id is required",
-                },
-                status=status.HTTP_400_BAD_REQUEST,
+        try:
+            new_session = create_stripe_cart_session(
+                renewal_line_items(payment), success_url, cancel_url
             )
+        except stripe.error.StripeError as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
 
-        payment = get_object_or_404(Payment, id=payment_id)
-        if payment.status != payment.Status.EXPIRED:
+        try:
+            renew_payment_session(payment, new_session)
+        except Exception:
             return Response(
-                {
-                    "error": "Payment is not expired",
-                    "status": status.HTTP_400_BAD_REQUEST,
-                }
+                {"error": "Failed to update payment session."},
+                status=status.HTTP_500_INTERNAL_SERVER_ERROR,
             )
+        return Response(
+            {
+                "message": "Payment session renewed",
+                "session_url": payment.session_url,
+            },
+            status=status.HTTP_200_OK,
+        )
 
-        if payment.borrowing.user.id != request.user.id and not request.user.is_staff:
-            return Response(
-                {"error": "You don't have permission to view this payment"},
-                status=status.HTTP_403_FORBIDDEN,
-            )
 
-        success_url = (
-            request.build_absolute_uri(reverse("payment_service:payment-success"))
-        ) + "?session_id={CHECKOUT_SESSION_ID}"
-        cancel_url = request.build_absolute_uri(
-            reverse("payment_service:payment-cancel")
+class AsyncRenewStripeSessionView(AsyncAPIView):
+    """
+    RenewStripeSessionView awaiting Stripe instead of blocking a worker,
+    served instead of it when ASYNC_PAYMENT_VIEWS is on.
+    """
+
+    permission_classes = (IsAuthenticated,)
+
+    @renew_stripe_session_schema
+    @aidempotent
+    async def post(self, request):
+        payment = await sync_to_async(get_renewable_payment)(
+            request.data.get("payment_id"), request.user
         )
+        success_url, cancel_url = checkout_session_urls(request)
+
+        line_items = await sync_to_async(renewal_line_items)(payment)
 
         try:
-            new_session = create_stripe_session(
-                f"{payment.type} #{payment.id}",
-                payment.money_to_pay,
-                success_url,
-                cancel_url,
+            new_session = await acreate_stripe_cart_session(
+                line_items, success_url, cancel_url
             )
         except stripe.error.StripeError as e:
             return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
 
         try:
-            with transaction.atomic():
-                payment.session_url = new_session.get("url")
-                payment.session_id = new_session.get("id")
-
-                expires_at_timestamp = new_session.get("expires_at")
-                expires_at_datetime = datetime_from_timestamp(expires_at_timestamp)
-
-                payment.session_expires_at = expires_at_datetime
-
-                payment.status = Payment.Status.PENDING
-
-                payment.save()
+            await sync_to_async(renew_payment_session)(payment, new_session)
         except Exception:
             return Response(
                 {"error": "Failed to update payment session."},
@@ -0,0 +1,133 @@
+import datetime
+import logging
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from core.pruning import delete_in_batches
+from notifications_service.outbox import enqueue_task
+from payment_service.models import Payment, StripeEvent
+
+logger = logging.getLogger(__name__)
+
+PAID_EVENT_TYPES = (
+    StripeEvent.Type.SESSION_COMPLETED,
+    StripeEvent.Type.SESSION_ASYNC_PAYMENT_SUCCEEDED,
+)
+
+
+def record_stripe_event(event) -> None:
+    """
+    Stores a Checkout Session event verified by the webhook view.
+    Events of other types and redeliveries of a stored event are ignored.
+
+    Args:
+        event: stripe.Event built by stripe.Webhook.construct_event
+    """
+    if event["type"] not in StripeEvent.Type.values:
+        return
+
+    session = event["data"]["object"]
+    StripeEvent.objects.bulk_create(
+        [
+            StripeEvent(
+                event_id=event["id"],
+                type=event["type"],
+                session_id=session["id"],
+                payment_status=session.get("payment_status") or "",
+            )
+        ],
+        ignore_conflicts=True,
+    )
+
+
+def apply_stripe_events(batch_size: int = None) -> int:
+    """
+    Apply one batch of unprocessed Stripe events to the payments of their
+    sessions with one UPDATE per resulting status, and mark them processed.
+
+    A paid session wins over an expired one, and an expired session
+    only expires a payment that is still pending, so the order in which
+    Stripe delivered the events doesn't matter.
+
+    Rows are locked with SKIP LOCKED where supported, so several workers
+    can run at once without applying an event twice.
+
+    Returns:
+        int: Number of processed events
+    """
+    batch_size = batch_size or settings.STRIPE_EVENTS_BATCH_SIZE
+
+    with transaction.atomic():
+        events = list(
+            StripeEvent.objects.select_for_update(skip_locked=True).filter(
+                processed_at__isnull=True
+            )[:batch_size]
+        )
+        if not events:
+            return 0
+
+        paid_sessions = {
+            event.session_id
+            for event in events
+            if event.type in PAID_EVENT_TYPES and event.payment_status == "paid"
+        }
+        expired_sessions = {
+            event.session_id
+            for event in events
+            if event.type == StripeEvent.Type.SESSION_EXPIRED
+        }
+        now = timezone.now()
+
+        paid_ids = list(
+            Payment.objects.filter(session_id__in=paid_sessions)
+            .exclude(status=Payment.Status.PAID)
+            .values_list("pk", flat=True)
+        )
+        if paid_ids:
+            Payment.objects.filter(pk__in=paid_ids).update(
+                status=Payment.Status.PAID, updated_at=now
+            )
+            for payment_id in paid_ids:
+                # by name, the payment tasks module imports this one
+                enqueue_task(
+                    "payment_service.tasks.notify_successful_payment", payment_id
+                )
+
+        expired = Payment.objects.filter(
+            session_id__in=expired_sessions - paid_sessions,
+            status=Payment.Status.PENDING,
+        ).update(status=Payment.Status.EXPIRED, updated_at=now)
+
+        StripeEvent.objects.filter(id__in=[event.id for event in events]).update(
+            processed_at=now
+        )
+
+    logger.info(
+        f"Processed {len(events)} Stripe events: "
+        f"{len(paid_ids)} payments paid, {expired} expired"
+    )
+    return len(events)
+
+
+def prune_stripe_events(batch_size: int = None) -> int:
+    """
+    Delete events processed more than STRIPE_EVENTS_RETENTION seconds
+    ago. The retention outlasts Stripe's redelivery window, so a late
+    redelivery still finds its event and is ignored.
+
+    Returns:
+        int: Number of deleted events
+    """
+    cutoff = timezone.now() - datetime.timedelta(
+        seconds=settings.STRIPE_EVENTS_RETENTION
+    )
+    deleted = delete_in_batches(
+        StripeEvent.objects.filter(processed_at__lt=cutoff),
+        batch_size or settings.STRIPE_EVENTS_PRUNE_BATCH_SIZE,
+    )
+
+    if deleted:
+        logger.info(f"Pruned {deleted} processed Stripe events")
+    return deleted
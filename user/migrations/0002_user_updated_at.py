@@ -0,0 +1,18 @@
+# Generated by Django 5.1.6 on 2026-10-17 08:07
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("user", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="user",
+            name="updated_at",
+            field=models.DateTimeField(auto_now=True),
+        ),
+    ]